@@ -0,0 +1,157 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script downloads pages and files from ADS-B Exchange for get_ADS_B_data.py, politely and without giving up on the first error:
+#   - every request has a timeout, so a stalled connection does not hang a download thread
+#   - failed requests (connection errors, timeouts, 429 "too many requests" and 5xx server errors) are tried again after a
+#     wait that doubles with every try, with some randomness (jitter) so the threads do not all retry at the same moment
+#   - a fetch limiter, shared by all the download threads, keeps the requests under a number per second and adapts how many
+#     run at the same time: one more after a round of healthy responses, half as many when the server pushes back (AIMD,
+#     additive increase, multiplicative decrease, like TCP). This keeps the download as fast as the server allows
+#Other errors, like 404 (file not there), are not retried.
+
+import time
+import random
+import threading
+import requests
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#seconds to wait to connect, and then for the server to send data, before a request is given up
+request_timeout_s = (10, 60)
+#number of times a failed request is tried again
+max_retries = 5
+#wait before the first retry, in seconds. It doubles with every retry, up to backoff_max_s
+backoff_base_s = 0.5
+backoff_max_s = 30
+#most requests started per second, over all the download threads. None for no limit
+max_requests_per_s = 20
+#after the number of requests running at the same time is halved, it is not halved again for this many seconds,
+#so one burst of errors only counts once
+concurrency_decrease_cooldown_s = 2.0
+#HTTP status codes where the server is overloaded or having trouble: the request is retried and the concurrency is cut
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Make a fetch limiter, shared by all the threads of a download
+#INPUTS: max_concurrency, int, most requests running at the same time (usually the number of download threads)
+        requests_per_s (optional), float, most requests started per second. None for no limit
+        initial_concurrency (optional), int, requests allowed at the same time at the start. None starts at max_concurrency
+#OUTPUT: dictionary with the limiter's state, to pass to fetch_with_retries
+'''
+def make_fetch_limiter(max_concurrency, requests_per_s = max_requests_per_s, initial_concurrency = None):
+    concurrency_limit = float(initial_concurrency if initial_concurrency != None else max_concurrency)
+    return {"condition": threading.Condition(), #guards everything below, and lets threads wait for a free slot
+            "concurrency_limit": concurrency_limit,
+            "max_concurrency": max_concurrency,
+            "in_flight": 0,
+            "requests_per_s": requests_per_s,
+            "next_request_time": 0.0, #earliest time the next request may start, to keep to requests_per_s
+            "last_decrease_time": 0.0,
+            "stats": {"requests": 0, "retries": 0, "throttled": 0, "errors": 0, "lowest_concurrency_limit": concurrency_limit}}
+
+'''
+Wait for a slot to make a request: until fewer requests than the concurrency limit are running, and until the request rate allows it
+#INPUT: limiter, see make_fetch_limiter
+#OUTPUT: returns when the request can start
+'''
+def acquire_fetch_slot(limiter):
+    with limiter["condition"]:
+        while limiter["in_flight"] >= max(1, int(limiter["concurrency_limit"])):
+            limiter["condition"].wait()
+        limiter["in_flight"] += 1
+        limiter["stats"]["requests"] += 1
+        start_time = time.monotonic()
+        if limiter["requests_per_s"] != None: #book the next free start time, spaced 1/requests_per_s apart
+            start_time = max(start_time, limiter["next_request_time"])
+            limiter["next_request_time"] = start_time + 1.0 / limiter["requests_per_s"]
+    time.sleep(max(0.0, start_time - time.monotonic())) #wait outside the lock so the other threads can book their slots
+
+'''
+Give back a request slot and adapt the concurrency limit to how the server answered
+#INPUTS: limiter, see make_fetch_limiter
+        server_overloaded, boolean, True if the request was throttled, timed out or got a server error
+#OUTPUT: updates the limiter
+'''
+def release_fetch_slot(limiter, server_overloaded):
+    with limiter["condition"]:
+        limiter["in_flight"] -= 1
+        if server_overloaded:
+            limiter["stats"]["throttled"] += 1
+            now = time.monotonic()
+            if now - limiter["last_decrease_time"] > concurrency_decrease_cooldown_s: #multiplicative decrease
+                limiter["concurrency_limit"] = max(1.0, limiter["concurrency_limit"] / 2)
+                limiter["last_decrease_time"] = now
+                limiter["stats"]["lowest_concurrency_limit"] = min(limiter["stats"]["lowest_concurrency_limit"], limiter["concurrency_limit"])
+        else: #additive increase: about one more request at the same time for every full round of healthy responses
+            limiter["concurrency_limit"] = min(limiter["max_concurrency"], limiter["concurrency_limit"] + 1.0 / limiter["concurrency_limit"])
+        limiter["condition"].notify_all()
+
+'''
+Get the wait before a retry: exponential backoff with "full jitter", a random wait between 0 and the doubled wait.
+If the server said how long to wait (the Retry-After header), wait at least that long
+#INPUTS: attempt, int, number of the try that just failed, starting at 0
+        response (optional), the requests Response of the failed try, if there was one
+#OUTPUT: seconds to wait
+'''
+def get_backoff_time(attempt, response = None):
+    backoff_time = random.uniform(0, min(backoff_max_s, backoff_base_s * 2 ** attempt))
+    if response != None and response.headers.get("Retry-After", "").isdigit():
+        backoff_time = max(backoff_time, float(response.headers["Retry-After"]))
+    return backoff_time
+
+'''
+Download a url, with a timeout, retries with backoff, and the limits of the fetch limiter
+#INPUTS: url, string
+        session (optional), a requests.Session to reuse open connections. If None, a one-off request is made
+        limiter (optional), see make_fetch_limiter. If None, there is no limit on the requests
+        missing_ok (optional), boolean, True to return None when the url is not there (404) instead of raising an error
+#OUTPUT: bytes of the response. Raises the requests exception of the last try if all the tries failed, and right away
+        for errors that are not worth trying again (like a 404)
+'''
+def fetch_with_retries(url, session = None, limiter = None, missing_ok = False):
+    http_get = session.get if session != None else requests.get #use the shared connection pool if we were given one
+    for attempt in range(max_retries + 1):
+        if limiter != None:
+            acquire_fetch_slot(limiter)
+        response = None
+        server_overloaded = False
+        try:
+            response = http_get(url, timeout = request_timeout_s)
+            server_overloaded = response.status_code in RETRY_STATUS_CODES
+            if missing_ok and response.status_code == 404:
+                return None
+            if not server_overloaded:
+                response.raise_for_status() #other errors are not retried
+                return response.content
+            error = requests.exceptions.HTTPError(f"{response.status_code} Server Error for url: {url}", response = response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as connection_error:
+            server_overloaded = True
+            error = connection_error
+        finally:
+            if limiter != None:
+                release_fetch_slot(limiter, server_overloaded)
+            if response != None:
+                response.close()
+
+        if attempt < max_retries:
+            if limiter != None:
+                with limiter["condition"]:
+                    limiter["stats"]["retries"] += 1
+            time.sleep(get_backoff_time(attempt, response))
+    if limiter != None:
+        with limiter["condition"]:
+            limiter["stats"]["errors"] += 1
+    raise error
+
+'''
+Make a short summary of what the fetch limiter saw, to print at the end of a download
+#INPUT: limiter, see make_fetch_limiter
+#OUTPUT: string
+'''
+def get_fetch_summary(limiter):
+    with limiter["condition"]:
+        stats = dict(limiter["stats"])
+        concurrency_limit = limiter["concurrency_limit"]
+    return (f"{stats['requests']} requests, {stats['retries']} retries, {stats['throttled']} throttled or server errors, "
+            f"{stats['errors']} given up. Concurrent requests ended at {int(concurrency_limit)} "
+            f"(lowest {int(stats['lowest_concurrency_limit'])})")
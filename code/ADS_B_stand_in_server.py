@@ -0,0 +1,190 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script is a local stand-in for the ADS-B Exchange historical data server, to test and benchmark the download without a network.
+#It serves the same layout as the real server: a page per day at /readsb-hist/YYYY/MM/DD/ with a link to each time slice
+#file, and the time slice files themselves (gzip compressed json, made with synthetic_ADS_B_data.py). Each file is made from
+#its date and time, so the same url always gives the same data.
+#The server can be made slower or less reliable, to see how the download copes:
+#   - latency_s: wait before answering each request
+#   - bandwidth_bytes_per_s: most bytes sent per second on each connection
+#   - error_rate: fraction of the requests answered with an error (one of error_status_codes, such as 503)
+#To use it, run this file on its own (python ADS_B_stand_in_server.py) and set online_data_url at the top of get_ADS_B_data.py
+#to the url it prints, or start it from a script with start_stand_in_server (see benchmark_download.py).
+
+import re
+import gzip
+import time
+import random
+import multiprocessing
+import functools
+import calendar
+import http.server
+
+import synthetic_ADS_B_data
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#address the server listens on. Port 0 picks a free port
+server_host = "127.0.0.1"
+server_port = 8080
+#seconds between the time slices of a day. The real server has one every 5 seconds
+time_slice_interval_s = 5
+#number of aircraft in each time slice
+num_aircraft_per_time_slice = 5000
+#seconds to wait before answering each request
+latency_s = 0.05
+#most bytes sent per second on each connection. None for no limit
+bandwidth_bytes_per_s = None
+#fraction of the requests answered with an error, and the errors to pick from
+error_rate = 0.0
+error_status_codes = (429, 500, 503)
+#number of time slice files kept in memory once made, so the server does not spend its time making the same files again
+num_cached_time_slices = 512
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Make the file names of the time slices of a day, as they are on the real server
+#INPUT: interval_s, int, seconds between the time slices
+#OUTPUT: list of file names. Example for 5 s: ["000000Z.json.gz", "000005Z.json.gz", ...]
+'''
+def get_time_slice_file_names(interval_s):
+    return ["{:02d}{:02d}{:02d}Z.json.gz".format(seconds // 3600, seconds // 60 % 60, seconds % 60) for seconds in range(0, 24 * 3600, interval_s)]
+
+'''
+Make the page of a day, with a link to each time slice file like the real server's folder listing
+#INPUT: interval_s, int, seconds between the time slices
+#OUTPUT: bytes of the html page
+'''
+@functools.lru_cache(maxsize=8)
+def make_day_page(interval_s):
+    links = "\n".join(f'<a href="{file_name}">{file_name}</a>' for file_name in get_time_slice_file_names(interval_s))
+    return f"<html>\n<head><title>Index</title></head>\n<body>\n<pre>\n{links}\n</pre>\n</body>\n</html>\n".encode("utf-8")
+
+'''
+Make the file of a time slice: synthetic aircraft, seeded by the slice's date and time so the same file is made every time
+#INPUTS: year, month, day, hour, minute, second, ints, the time of the slice (UTC)
+        num_aircraft, int, number of aircraft in the slice
+#OUTPUT: bytes of the gzip compressed json
+'''
+@functools.lru_cache(maxsize=num_cached_time_slices)
+def make_time_slice_file(year, month, day, hour, minute, second, num_aircraft):
+    now = calendar.timegm((year, month, day, hour, minute, second))
+    loaded_json = synthetic_ADS_B_data.make_synthetic_time_slice_json(num_aircraft, seed = now, now = float(now))
+    return gzip.compress(loaded_json, compresslevel = 6)
+
+'''
+Get the answer to a request path
+#INPUTS: path, string, path of the url (i.e. "/readsb-hist/2024/01/01/" or "/readsb-hist/2024/01/01/000000Z.json.gz")
+        settings, dictionary of the server settings (see make_server_settings)
+#OUTPUT: (HTTP status code, content type, bytes of the body)
+'''
+def get_response(path, settings):
+    if random.random() < settings["error_rate"]:
+        return random.choice(settings["error_status_codes"]), "text/plain", b"Injected error"
+    match = re.fullmatch(r"/readsb-hist/(\d{4})/(\d{2})/(\d{2})/((\d{2})(\d{2})(\d{2})Z\.json\.gz)?", path)
+    if match == None:
+        return 404, "text/plain", b"Not found"
+    year, month, day = (int(value) for value in match.group(1, 2, 3))
+    if match.group(4) == None: #the day's page
+        return 200, "text/html", make_day_page(settings["time_slice_interval_s"])
+    hour, minute, second = (int(value) for value in match.group(5, 6, 7))
+    if (hour * 3600 + minute * 60 + second) % settings["time_slice_interval_s"] != 0 or hour > 23 or minute > 59 or second > 59:
+        return 404, "text/plain", b"Not found" #no time slice at that time
+    return 200, "application/gzip", make_time_slice_file(year, month, day, hour, minute, second, settings["num_aircraft"])
+
+'''
+Make the settings of a server, with the global variables above as the defaults
+#INPUTS: any of time_slice_interval_s, num_aircraft, latency_s, bandwidth_bytes_per_s, error_rate, error_status_codes
+#OUTPUT: dictionary of the settings
+'''
+def make_server_settings(**settings):
+    server_settings = {"time_slice_interval_s": time_slice_interval_s, "num_aircraft": num_aircraft_per_time_slice, "latency_s": latency_s,
+                       "bandwidth_bytes_per_s": bandwidth_bytes_per_s, "error_rate": error_rate, "error_status_codes": error_status_codes}
+    for setting in settings:
+        if setting not in server_settings:
+            raise ValueError(f"Unknown stand-in server setting: {setting}")
+    server_settings.update(settings)
+    return server_settings
+
+'''
+Answers the requests of one connection. The connections are kept open between requests (HTTP/1.1), like the real server
+'''
+class StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = make_server_settings()
+
+    def do_GET(self):
+        time.sleep(self.settings["latency_s"])
+        status_code, content_type, body = get_response(self.path, self.settings)
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.settings["bandwidth_bytes_per_s"] == None:
+            self.wfile.write(body)
+            return
+        #send the body a piece at a time, waiting so the connection stays under the bandwidth
+        start_time = time.perf_counter()
+        chunk_size = 16 * 1024
+        for chunk_start in range(0, len(body), chunk_size):
+            self.wfile.write(body[chunk_start:chunk_start + chunk_size])
+            sent_bytes = min(chunk_start + chunk_size, len(body))
+            time.sleep(max(0.0, sent_bytes / self.settings["bandwidth_bytes_per_s"] - (time.perf_counter() - start_time)))
+
+    def log_message(self, format, *args): #one line per request would drown the download's own messages
+        pass
+
+'''
+Make a stand-in server (not started yet)
+#INPUTS: host (optional), string, address to listen on
+        port (optional), int, port to listen on. 0 picks a free port
+        settings, see make_server_settings
+#OUTPUT: the http.server.ThreadingHTTPServer, answering each connection in its own thread
+'''
+def make_stand_in_server(host = server_host, port = server_port, **settings):
+    request_handler = type("StandInRequestHandler", (StandInRequestHandler,), {"settings": make_server_settings(**settings)})
+    server = http.server.ThreadingHTTPServer((host, port), request_handler)
+    server.daemon_threads = True
+    return server
+
+'''
+Get the url to set as online_data_url in get_ADS_B_data.py to download from a stand-in server
+#INPUT: server, a server from make_stand_in_server
+#OUTPUT: url as a string. Example: "http://127.0.0.1:8080/readsb-hist"
+'''
+def get_stand_in_server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/readsb-hist"
+
+'''
+Run a stand-in server until the process is stopped, and send its url back through a queue
+#INPUTS: url_queue, a multiprocessing queue the url is put on once the server listens (or None)
+        host, port, settings, see make_stand_in_server
+#OUTPUT: serves requests forever
+'''
+def run_stand_in_server(url_queue = None, host = server_host, port = server_port, **settings):
+    server = make_stand_in_server(host, port, **settings)
+    if url_queue != None:
+        url_queue.put(get_stand_in_server_url(server))
+    server.serve_forever()
+
+'''
+Start a stand-in server in its own process, so making the files does not take CPU time from the download being measured
+#INPUTS: host (optional), port (optional), settings, see make_stand_in_server. The port is free by default
+#OUTPUTS: the process of the server (call .terminate() on it to stop the server), and its url (see get_stand_in_server_url)
+'''
+def start_stand_in_server(host = server_host, port = 0, **settings):
+    make_server_settings(**settings) #check the settings before starting the process
+    process_context = multiprocessing.get_context("spawn") #a fresh process, with none of the caller's threads
+    url_queue = process_context.Queue()
+    server_process = process_context.Process(target = run_stand_in_server, args = (url_queue, host, port), kwargs = settings, daemon = True)
+    server_process.start()
+    return server_process, url_queue.get(timeout = 60)
+
+
+if __name__ == "__main__":
+    stand_in_server = make_stand_in_server()
+    print(f"Stand-in ADS-B Exchange server at {get_stand_in_server_url(stand_in_server)} (Ctrl+C to stop)")
+    try:
+        stand_in_server.serve_forever()
+    except KeyboardInterrupt:
+        stand_in_server.server_close()
@@ -0,0 +1,867 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script reads and writes the downloaded ADS-B data. It is used by both get_ADS_B_data.py and process_ADS_B_data.py
+#Each day is saved as one Parquet file (a columnar format) in the day's folder. The observations are grouped by lat/long tile,
+#with one row group for every tile, and a small index of the tiles (their bounding boxes, countries and custom regions) is kept
+#in the file, so a query over a region only reads the tiles that can have data in it (see get_day_partitions).
+#Within a tile, the observations are sorted by country code (see country_lookup.get_country_codes) and the index keeps the rows
+#of each country, so reading a country only takes those rows out of its tiles, without comparing any names (see read_day).
+#Latitude and longitude are saved as plain numbers; the point geometry is only made when the data is used.
+#The columns are saved (and read back) with compact types, see ADSB_data_schema, which keeps a full day small in memory.
+#Days downloaded with older versions of the tool (one pickled GeoDataFrame per time slice) can still be read, or moved
+#over to the Parquet format with migrate_pkl_archive_to_parquet
+#Next to the day file, a small json manifest records which time slices were downloaded, at what sampling rate, and the size and
+#checksum of each download and of the day file. It lets a download pick up where it left off, and lets the processing check
+#that the days it needs are all there without going through the folders
+#The day file also has a column of bits that tells which custom polygons (maps/custom_polygons) each observation is in, checked
+#once when the data is saved, so a custom region is read like a country. See the Custom regions section below
+
+import os
+import re
+import math
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor #reads the time slices of old days at the same time
+
+#geo data
+import geopandas as gpd
+
+#columnar storage
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import custom_polygons #checks which observations are inside the custom polygons
+import country_lookup #codes of the countries
+
+#Get the directory of this script and the one above it (the main folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#folder that holds all the downloaded data, organized as year/month/day
+ADS_B_data_directory = os.path.join(parent_dir, "ADS_B_Data")
+#name of the file that holds a whole day of data within the day's folder
+day_file_name = "ADS_B_day.parquet"
+
+#column with the time of the time slice each observation came from
+time_slice_header = "Time Slice (UTC)"
+#columns of the saved data, in order, and their types
+ADSB_data_headers = ["Latitude (deg)", "Longitude (deg)", "NIC", "R_C (m)", "Flight Number", "Country Name", time_slice_header]
+#compact types: float32 keeps lat/long to about 1 m, well under the smallest NIC containment radius (7.5 m).
+#NIC is 0 to 11 and R_C is at most a few tens of km. Flight numbers and country names repeat on many rows, so they are
+#dictionary encoded (each distinct string is kept once, rows hold a small integer code) and read back as pandas categoricals
+ADSB_data_schema = pa.schema([
+    ("Latitude (deg)", pa.float32()),
+    ("Longitude (deg)", pa.float32()),
+    ("NIC", pa.uint8()),
+    ("R_C (m)", pa.int32()),
+    ("Flight Number", pa.dictionary(pa.int32(), pa.string())),
+    ("Country Name", pa.dictionary(pa.int16(), pa.string())),
+    (time_slice_header, pa.timestamp("ms", tz="UTC")), #Parquet has no second unit, milliseconds are the coarsest
+])
+#column of the day file with the custom regions (maps/custom_polygons) each observation is in, one bit per region.
+#It is not one of ADSB_data_headers: it is only read to pick out the rows of a region (see get_custom_region_row_filter)
+custom_regions_header = "Custom Regions"
+#column of the day file with the code of the country of each observation (see country_lookup.get_country_codes), -1 for none.
+#Like the custom regions, it is not one of ADSB_data_headers
+country_codes_header = "Country Code"
+#types of the day file: the data, then the custom regions bits (up to 64 regions) and the country codes
+ADSB_day_file_schema = ADSB_data_schema.append(pa.field(custom_regions_header, pa.uint64())).append(pa.field(country_codes_header, pa.int16()))
+#file in the data folder (ADS_B_data_directory, or the folder above the year folders of the day being written) that keeps which bit of the custom regions column is which region, i.e. {"Baltic": 0, "Black Sea": 1}
+custom_region_bits_file_name = "ADS_B_custom_region_bits.json"
+#key in the Parquet file metadata that lists the time slices in the file, i.e. ["000000Z", "003000Z", ...]
+TIME_SLICES_METADATA_KEY = b"time_slices"
+#size of the lat/long tiles the observations of a day file are grouped by, in degrees. Smaller tiles skip more of the data that is
+#not in a region, but make more (smaller) row groups
+day_tile_size_deg = 15
+#key in the Parquet file metadata with the index of the tiles of the day file (see make_day_partitions)
+PARTITIONS_METADATA_KEY = b"partitions"
+#name of the manifest file within the day's folder
+manifest_file_name = "ADS_B_manifest.json"
+#number of time slices of a day in the old pkl format read at the same time
+num_day_reading_workers = os.cpu_count() or 1
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+#--------------------------START Worker Functions---------------------------------
+'''
+Get the folder of a day's data
+#INPUT: date_util, dateutil object of the day
+#OUTPUT: directory path as a string. Example: ".../ADS_B_Data/2024/01/01"
+'''
+def get_day_directory(date_util):
+    return os.path.join(ADS_B_data_directory, str(date_util.year), "{:02}".format(date_util.month), "{:02}".format(date_util.day))
+
+'''
+Get the data folder a day's folder is in (the folder of the year folders), i.e. ADS_B_data_directory
+#INPUT: day_directory, the folder of the day (see get_day_directory)
+#OUTPUT: directory path as a string. Example: ".../ADS_B_Data"
+'''
+def get_data_directory_of_day(day_directory):
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.normpath(day_directory))))
+
+'''
+Get the path of the Parquet file that holds a day's data
+#INPUT: day_directory, the folder of the day (see get_day_directory)
+#OUTPUT: file path as a string
+'''
+def get_day_file_path(day_directory):
+    return os.path.join(day_directory, day_file_name)
+
+'''
+Get the time slice name from the name of a downloaded or saved file
+#INPUT: file_name, string. Example: "140000Z.json.gz" or "140000Z.pkl"
+#OUTPUT: time slice name as a string. Example: "140000Z"
+'''
+def get_time_slice_name(file_name):
+    return os.path.basename(file_name).split(".")[0]
+
+'''
+Get the time of a time slice from the path or url of its file, which always ends in year/month/day/time slice
+#INPUT: file_path, string. Example: ".../2024/01/01/140000Z.json.gz" or "https://.../readsb-hist/2024/01/01/140000Z.json.gz"
+#OUTPUT: pandas Timestamp in UTC. Example: 2024-01-01 14:00:00+00:00
+'''
+def get_time_slice_time(file_path):
+    match = re.search(r"(\d{4})[/\\](\d{2})[/\\](\d{2})[/\\](\d{2})(\d{2})(\d{2})Z[^/\\]*$", file_path)
+    if match == None:
+        raise ValueError("Can't get the time of the time slice from " + file_path)
+    return pd.Timestamp(*map(int, match.groups()), tz="UTC")
+
+'''
+Add the point geometry to the ADS-B data, only when it is needed
+#INPUT: ADSB_data_df, DataFrame with the latitude and longitude columns
+#OUTPUT: GeoDataFrame with a geometry column of points, in EPSG:4326. Note that (x, y) are in the form of (long, lat)
+'''
+def add_geometry(ADSB_data_df):
+    return gpd.GeoDataFrame(ADSB_data_df, geometry=gpd.points_from_xy(ADSB_data_df[ADSB_data_headers[1]], ADSB_data_df[ADSB_data_headers[0]]),
+                            crs="EPSG:4326")
+
+'''
+Get the lat/long tile of each observation. The tiles are day_tile_size_deg wide, starting at -90 deg lat and -180 deg long, and
+numbered row by row (all the tiles at the lowest latitudes first)
+#INPUT: latitudes, longitudes, numpy arrays of the observations, in degrees
+#OUTPUT: int64 numpy array of the tile numbers. Observations without a latitude or longitude all get the number after the last tile
+'''
+def get_tile_numbers(latitudes, longitudes):
+    num_lat_tiles = math.ceil(180 / day_tile_size_deg)
+    num_long_tiles = math.ceil(360 / day_tile_size_deg)
+    has_position = np.isfinite(latitudes) & np.isfinite(longitudes)
+    #points on the last edge (90 deg lat, 180 deg long) go in the last tile
+    lat_tiles = np.clip(np.floor((np.where(has_position, latitudes, 0) + 90) / day_tile_size_deg), 0, num_lat_tiles - 1).astype(np.int64)
+    long_tiles = np.clip(np.floor((np.where(has_position, longitudes, 0) + 180) / day_tile_size_deg), 0, num_long_tiles - 1).astype(np.int64)
+    return np.where(has_position, lat_tiles * num_long_tiles + long_tiles, num_lat_tiles * num_long_tiles)
+#-----------------------------END Worker Functions---------------------
+
+
+#----------------------------Writing------------------------------------
+'''
+Make a Parquet table of one time slice, dropping the geometry (it is made again from the lat/long when reading).
+This is where the data gets its compact types (see ADSB_data_schema)
+#INPUT: time_slice_df, DataFrame or GeoDataFrame of a time slice with the ADSB_data_headers columns, except the time slice column
+        time_slice_time, time of the time slice (see get_time_slice_time), saved on every row
+#OUTPUT: pyarrow Table with the ADSB_data_schema
+'''
+def make_time_slice_table(time_slice_df, time_slice_time):
+    time_slice_df = pd.DataFrame(time_slice_df[ADSB_data_headers[:-1]])
+    time_slice_df[time_slice_header] = pd.Timestamp(time_slice_time)
+    return pa.Table.from_pandas(time_slice_df, schema=ADSB_data_schema, preserve_index=False)
+
+'''
+Save time slices to a day's Parquet file, with the observations grouped by tile, one row group per tile (see make_day_partitions).
+If the day already has a file, its other time slices are kept and slices with the same name are replaced. The file is written next to the old one and then swapped in, so an
+interrupted write never leaves a broken day file
+#INPUT: day_directory, the folder of the day
+        time_slice_tables, dictionary of time slice name (i.e. "140000Z") to the pyarrow Table of that slice (see make_time_slice_table)
+        time_slices_information (optional), dictionary of time slice name to a dictionary of what to record about it in the
+            manifest, i.e. {"sampling_rate_min": 30, "source_bytes": ..., "source_sha256": ...} (see get_download_information)
+#OUTPUT: saves the day file and updates the day's manifest. Returns the list of the time slice names in the file
+'''
+def write_day_time_slices(day_directory, time_slice_tables, time_slices_information = None):
+    all_time_slice_tables = dict(read_day_time_slice_tables(day_directory)) #time slices already saved
+    all_time_slice_tables.update(time_slice_tables)
+    time_slice_names = sorted(all_time_slice_tables)
+    manifest = read_day_manifest(day_directory)
+
+    #find which custom regions the observations are in: every region for the new time slices, and for the ones already saved,
+    #only the regions added or changed since the day file was last written
+    custom_regions = get_custom_regions(get_data_directory_of_day(day_directory))
+    custom_region_bits = {name: custom_region["bit"] for name, custom_region in custom_regions.items()}
+    stale_custom_region_bits = {name: custom_region["bit"] for name, custom_region in custom_regions.items()
+                                if manifest["custom_regions"].get(name) != custom_region}
+    for time_slice_name in time_slice_names:
+        time_slice_table = all_time_slice_tables[time_slice_name]
+        is_checked = time_slice_name not in time_slice_tables and custom_regions_header in time_slice_table.column_names
+        time_slice_table = add_custom_regions_column(time_slice_table, stale_custom_region_bits if is_checked else custom_region_bits)
+        all_time_slice_tables[time_slice_name] = add_country_codes_column(time_slice_table).select(ADSB_day_file_schema.names)
+
+    day_table = pa.concat_tables([all_time_slice_tables[time_slice_name].cast(ADSB_day_file_schema) for time_slice_name in time_slice_names]
+                                 if len(time_slice_names) > 0 else [ADSB_day_file_schema.empty_table()])
+    day_table, day_partitions = make_day_partitions(day_table)
+
+    schema = ADSB_day_file_schema.with_metadata({TIME_SLICES_METADATA_KEY: json.dumps(time_slice_names),
+                                                 PARTITIONS_METADATA_KEY: json.dumps(day_partitions)})
+    os.makedirs(day_directory, exist_ok=True)
+    day_file_path = get_day_file_path(day_directory)
+    temporary_file_path = day_file_path + ".partial"
+    with pq.ParquetWriter(temporary_file_path, schema, compression="zstd") as writer:
+        first_row = 0
+        for day_partition in day_partitions:
+            #every tile is its own row group, so a query over a region only reads the tiles around it
+            writer.write_table(compact_dictionaries(day_table.slice(first_row, day_partition["rows"])), row_group_size=day_partition["rows"])
+            first_row += day_partition["rows"]
+    os.replace(temporary_file_path, day_file_path)
+
+    #record the new time slices, the custom regions checked and the new day file in the manifest
+    for time_slice_name, time_slice_table in time_slice_tables.items():
+        manifest["time_slices"][time_slice_name] = {"rows": time_slice_table.num_rows}
+        if time_slices_information != None and time_slice_name in time_slices_information:
+            manifest["time_slices"][time_slice_name].update(time_slices_information[time_slice_name])
+    manifest["custom_regions"] = custom_regions
+    manifest["day_file"] = get_file_information(day_file_path)
+    manifest["day_data_sha256"] = manifest["day_file"]["sha256"] #the data changed (see get_day_data_stamp)
+    write_day_manifest(day_directory, manifest)
+    return time_slice_names
+
+'''
+Group the observations of a day by lat/long tile (see get_tile_numbers), then by country within each tile, and make the index of the tiles
+#INPUT: day_table, pyarrow Table of the day with the ADSB_day_file_schema columns
+#OUTPUT: the day table with its rows grouped by tile and country (in the same order as before within each country of a tile), and
+        the index: list of the tiles with data, in order, one dictionary per tile (and per row group of the day file) with
+            "row_group", "tile" (see get_tile_numbers), "rows",
+            "bounding_box" (min long, min lat, max long, max lat of its observations, None for the observations without a lat/long),
+            "countries" (list of [country code, first row, number of rows] of each country of its observations, the rows counted
+                from the start of the tile's row group. The observations without a country are left out),
+            "custom_regions" (the custom regions bits of all its observations put together, see add_custom_regions_column)
+'''
+def make_day_partitions(day_table):
+    tile_numbers = get_tile_numbers(day_table.column(ADSB_data_headers[0]).to_numpy(), day_table.column(ADSB_data_headers[1]).to_numpy())
+    country_codes = day_table.column(country_codes_header).to_numpy().astype(np.int64)
+    rows_in_tile_order = np.lexsort((country_codes, tile_numbers)) #by tile, then by country. lexsort is stable
+    day_table = day_table.take(rows_in_tile_order)
+    tile_numbers = tile_numbers[rows_in_tile_order]
+    country_codes = country_codes[rows_in_tile_order]
+
+    latitudes = day_table.column(ADSB_data_headers[0]).to_numpy()
+    longitudes = day_table.column(ADSB_data_headers[1]).to_numpy()
+    custom_regions = day_table.column(custom_regions_header).to_numpy()
+    #the first row of each country of each tile
+    country_starts = np.flatnonzero(np.diff(tile_numbers, prepend=-1) | np.diff(country_codes, prepend=country_lookup.NO_COUNTRY_CODE - 1))
+
+    tile_starts = np.flatnonzero(np.diff(tile_numbers, prepend=-1)) #the first row of each tile
+    tile_ends = np.append(tile_starts[1:], len(tile_numbers))
+    no_position_tile = get_tile_numbers(np.array([np.nan]), np.array([np.nan]))[0]
+    day_partitions = []
+    for row_group, (tile_start, tile_end) in enumerate(zip(tile_starts, tile_ends)):
+        tile_number = int(tile_numbers[tile_start])
+        tile_country_starts = country_starts[np.searchsorted(country_starts, tile_start):np.searchsorted(country_starts, tile_end)]
+        bounding_box = None
+        if tile_number != no_position_tile:
+            bounding_box = [float(longitudes[tile_start:tile_end].min()), float(latitudes[tile_start:tile_end].min()),
+                            float(longitudes[tile_start:tile_end].max()), float(latitudes[tile_start:tile_end].max())]
+        day_partitions.append({"row_group": row_group, "tile": tile_number, "rows": int(tile_end - tile_start), "bounding_box": bounding_box,
+                               "countries": [[int(country_codes[country_start]), int(country_start - tile_start), int(country_end - country_start)]
+                                             for country_start, country_end in zip(tile_country_starts, np.append(tile_country_starts[1:], tile_end))
+                                             if country_codes[country_start] != country_lookup.NO_COUNTRY_CODE],
+                               "custom_regions": int(np.bitwise_or.reduce(custom_regions[tile_start:tile_end]))})
+    return day_table, day_partitions
+
+'''
+Keep only the values that are used in the dictionary columns of a table (the flight numbers and country names). Each row group
+saves its own dictionary, so this keeps the row group of a tile from saving the flight numbers of the whole day
+#INPUT: table, pyarrow Table with the ADSB_day_file_schema columns
+#OUTPUT: pyarrow Table with the ADSB_day_file_schema columns
+'''
+def compact_dictionaries(table):
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field, pc.dictionary_encode(table.column(i).cast(field.type.value_type).combine_chunks()).cast(field.type))
+    return table
+
+'''
+Set the country code of each observation of a time slice from its country name (see country_lookup.get_country_codes)
+#INPUT: time_slice_table, pyarrow Table of a time slice, with or without the country codes column
+#OUTPUT: pyarrow Table with the country codes column last
+'''
+def add_country_codes_column(time_slice_table):
+    if country_codes_header in time_slice_table.column_names: #made again, in case countries_list.pkl changed
+        time_slice_table = time_slice_table.drop_columns([country_codes_header])
+    country_codes = country_lookup.get_country_codes(time_slice_table.column(ADSB_data_headers[5]).to_pandas())
+    return time_slice_table.append_column(ADSB_day_file_schema.field(country_codes_header), pa.array(country_codes, pa.int16()))
+#----------------------------End Writing--------------------------------
+
+
+#----------------------------Reading------------------------------------
+'''
+Get the names of the time slices saved for a day, in either the Parquet or the old pkl format
+#INPUT: day_directory, the folder of the day
+#OUTPUT: sorted list of time slice names, i.e. ["000000Z", "003000Z", ...]. Empty if nothing is saved
+'''
+def get_day_time_slice_names(day_directory):
+    day_file_path = get_day_file_path(day_directory)
+    if os.path.exists(day_file_path):
+        return json.loads(pq.read_schema(day_file_path).metadata[TIME_SLICES_METADATA_KEY])
+    if os.path.isdir(day_directory):
+        return sorted(get_time_slice_name(f) for f in os.listdir(day_directory) if f.endswith(".pkl"))
+    return []
+
+'''
+Read a day's Parquet file as one table per time slice
+#INPUT: day_directory, the folder of the day
+        columns (optional), list of the columns to read. None reads all of them
+#OUTPUT: list of (time slice name, pyarrow Table) tuples. Empty if there is no day file
+'''
+def read_day_time_slice_tables(day_directory, columns = None):
+    day_file_path = get_day_file_path(day_directory)
+    if not os.path.exists(day_file_path):
+        return []
+    day_file = pq.ParquetFile(day_file_path)
+    day_file_metadata = day_file.schema_arrow.metadata
+    time_slice_names = json.loads(day_file_metadata[TIME_SLICES_METADATA_KEY])
+    if PARTITIONS_METADATA_KEY not in day_file_metadata: #day file saved before the tiles, with one row group per time slice
+        return [(time_slice_name, day_file.read_row_group(i, columns=columns)) for i, time_slice_name in enumerate(time_slice_names)]
+
+    #the rows are grouped by tile, so put the rows of each time slice back together from their time (they stay in tile order)
+    day_table = day_file.read(columns=columns if columns == None or time_slice_header in columns else columns + [time_slice_header])
+    row_times_ms = day_table.column(time_slice_header).cast(pa.int64()).to_numpy()
+    rows_in_time_order = np.argsort(row_times_ms, kind="stable")
+    sorted_row_times_ms = row_times_ms[rows_in_time_order]
+    if columns != None:
+        day_table = day_table.select(columns)
+    time_slice_tables = []
+    for time_slice_name in time_slice_names:
+        time_slice_time_ms = get_time_slice_time(os.path.join(day_directory, time_slice_name)).value // 10**6
+        first_row, end_row = np.searchsorted(sorted_row_times_ms, [time_slice_time_ms, time_slice_time_ms + 1])
+        time_slice_tables.append((time_slice_name, day_table.take(rows_in_time_order[first_row:end_row])))
+    return time_slice_tables
+
+'''
+Get the index of the tiles of a day file
+#INPUT: day_directory, the folder of the day
+#OUTPUT: list of one dictionary per tile, see make_day_partitions. None if the day has no day file, or it was saved before the tiles
+        or before the country codes (its tiles are grouped again by backfill_custom_regions)
+'''
+def get_day_partitions(day_directory):
+    day_file_path = get_day_file_path(day_directory)
+    if not os.path.exists(day_file_path):
+        return None
+    day_file_schema = pq.read_schema(day_file_path)
+    day_file_metadata = day_file_schema.metadata
+    if PARTITIONS_METADATA_KEY not in day_file_metadata or country_codes_header not in day_file_schema.names:
+        return None
+    return json.loads(day_file_metadata[PARTITIONS_METADATA_KEY])
+
+'''
+Read one time slice saved in the old format, a pickled GeoDataFrame
+#INPUT: pkl_file_path, path to the .pkl file
+        columns (optional), list of the columns to keep. None keeps all of ADSB_data_headers
+        row_filter (optional), rows to keep (see read_day)
+#OUTPUT: pyarrow Table of the time slice with the ADSB_data_schema types, without the geometry
+'''
+def read_pkl_time_slice(pkl_file_path, columns = None, row_filter = None):
+    time_slice_table = make_time_slice_table(pd.read_pickle(pkl_file_path), get_time_slice_time(pkl_file_path))
+    if row_filter is not None:
+        time_slice_table = time_slice_table.filter(row_filter)
+    return time_slice_table.select(columns if columns != None else ADSB_data_headers)
+
+'''
+Read a whole day of data. Only the asked-for columns are read from the Parquet file.
+Rows can be filtered while they are read (i.e. one custom region, see get_custom_region_row_filter): the time slices are read and
+filtered on all the cores at once, and only the rows kept are put together into the DataFrame, once. With partition filters, only
+the tiles of the day file they keep are read at all (i.e. the tiles over the region, see get_custom_region_partition_filter).
+With a country, only the tiles of the country are read, and its rows are taken out of them from the index of the day file,
+without comparing names (days without the index, i.e. in the old pkl format, are filtered on the country name).
+The rows of a day file come back grouped by tile and country, NOT in time order or in the order they were written (see the time
+slice column): sort them before comparing two days row by row.
+Falls back to the old one-pkl-per-time-slice format if the day has not been moved over to Parquet yet
+#INPUT: date_util, dateutil object of the day
+        columns (optional), list of the columns to read. None reads all of ADSB_data_headers
+        row_filter (optional), pyarrow compute expression of the rows to keep. None keeps all of them
+        partition_filters (optional), list of functions that take the index of a tile (see make_day_partitions) and return True if the
+            tile can have rows to keep. Only the tiles all of them keep are read. None reads all the tiles
+        country_name (optional), string, a name from countries_list.pkl. Only the observations over that country are kept. None keeps all of them
+#OUTPUT: DataFrame (no geometry, see add_geometry) of all the time slices of the day, with the compact ADSB_data_schema types
+        raises FileNotFoundError if no data has been downloaded for the day
+'''
+def read_day(date_util, columns = None, row_filter = None, partition_filters = None, country_name = None):
+    day_directory = get_day_directory(date_util)
+    if not os.path.isdir(day_directory):
+        raise FileNotFoundError("No ADS-B data downloaded for " + date_util.strftime('%Y-%m-%d') + ". Looked in " + day_directory)
+    return read_day_directory(day_directory, columns = columns, row_filter = row_filter, partition_filters = partition_filters, country_name = country_name)
+
+'''
+Make the row filter that keeps the observations over one country, from their names (for the days without the index of the countries)
+#INPUT: country_name, string, a name from countries_list.pkl
+#OUTPUT: pyarrow compute expression
+'''
+def get_country_row_filter(country_name):
+    country_code = country_lookup.get_country_code(country_name)
+    if country_code != None: #the name saved with the observations, the same as the country map's
+        country_name = country_lookup.get_country_names()[country_code]
+    return pc.field("Country Name") == country_name
+
+'''
+Make the partition filter of read_day that keeps the tiles with observations in some bounding boxes (i.e. the shapes of a custom polygon)
+#INPUT: bounding_boxes, list or numpy array of (min long, min lat, max long, max lat), in degrees
+#OUTPUT: function of the index of a tile, see read_day
+'''
+def get_bounding_box_partition_filter(bounding_boxes):
+    return lambda day_partition: (day_partition["bounding_box"] != None
+                                  and any(min_long <= day_partition["bounding_box"][2] and day_partition["bounding_box"][0] <= max_long
+                                          and min_lat <= day_partition["bounding_box"][3] and day_partition["bounding_box"][1] <= max_lat
+                                          for min_long, min_lat, max_long, max_lat in bounding_boxes))
+
+'''
+Read a whole day of data from the day's folder, see read_day
+#INPUT: day_directory, the folder of the day
+        columns (optional), list of the columns to read. None reads all of ADSB_data_headers
+        row_filter (optional), pyarrow compute expression of the rows to keep. None keeps all of them
+        partition_filters (optional), list of functions of the index of a tile, see read_day
+        country_name (optional), string, the country to keep, see read_day
+#OUTPUT: DataFrame (no geometry) of all the time slices of the day, with the compact ADSB_data_schema types.
+        The rows of a day file are in tile and country order, not in time slice order (see read_day)
+'''
+def read_day_directory(day_directory, columns = None, row_filter = None, partition_filters = None, country_name = None):
+    day_file_path = get_day_file_path(day_directory)
+    day_partitions = get_day_partitions(day_directory) if partition_filters != None or country_name != None else None
+    country_code = country_lookup.get_country_code(country_name) if country_name != None else None
+    if country_name != None and day_partitions != None and country_code != None:
+        return read_day_file_country(day_file_path, day_partitions, country_code, columns, row_filter, partition_filters)
+    if country_name != None: #no index of the countries, or a country that is not in countries_list.pkl
+        country_row_filter = get_country_row_filter(country_name)
+        row_filter = country_row_filter if row_filter is None else row_filter & country_row_filter
+    if day_partitions != None and partition_filters != None:
+        #only read the row groups of the tiles that can have rows to keep
+        row_groups = [day_partition["row_group"] for day_partition in day_partitions
+                      if all(partition_filter(day_partition) for partition_filter in partition_filters)]
+        day_file_fragment = next(iter(ds.dataset(day_file_path, format="parquet").get_fragments())).subset(row_group_ids=row_groups)
+        return day_file_fragment.to_table(columns=columns if columns != None else ADSB_data_headers, filter=row_filter, use_threads=True).to_pandas()
+    if os.path.exists(day_file_path): #all the tiles
+        #pyarrow reads the row groups (tiles) and filters them on its own threads, one per core
+        return pq.read_table(day_file_path, columns=columns if columns != None else ADSB_data_headers, filters=row_filter, use_threads=True).to_pandas()
+
+    #old format: one pkl per time slice, read and filtered by a pool of threads. Most of the reading and the filtering lets go of the GIL
+    pkl_file_names = sorted(f for f in os.listdir(day_directory) if f.endswith(".pkl"))
+    with ThreadPoolExecutor(max_workers=max(1, min(num_day_reading_workers, len(pkl_file_names)))) as executor:
+        time_slice_tables = list(executor.map(lambda f: read_pkl_time_slice(os.path.join(day_directory, f), columns, row_filter), pkl_file_names))
+    if len(time_slice_tables) == 0:
+        return ADSB_data_schema.empty_table().select(columns if columns != None else ADSB_data_headers).to_pandas()
+    #concatenate as tables so the flight and country categories of all the slices are merged into one categorical
+    return pa.concat_tables(time_slice_tables).to_pandas()
+
+'''
+Read the observations over one country from a day file, from the index of its tiles: only the row groups of the tiles with the
+country are read, and the country's rows (next to each other, see make_day_partitions) are sliced out of them
+#INPUTS: day_file_path, path to the day file
+        day_partitions, the index of the tiles of the day file (see get_day_partitions)
+        country_code, int, see country_lookup.get_country_code
+        columns, row_filter, partition_filters, see read_day (None for the defaults)
+#OUTPUT: DataFrame (no geometry) of the country's observations, with the compact ADSB_data_schema types
+'''
+def read_day_file_country(day_file_path, day_partitions, country_code, columns, row_filter, partition_filters):
+    columns = columns if columns != None else ADSB_data_headers
+    row_groups = []
+    country_row_ranges = [] #(first row, number of rows) of the country in each row group read
+    for day_partition in day_partitions:
+        if partition_filters != None and not all(partition_filter(day_partition) for partition_filter in partition_filters):
+            continue
+        for code, first_row, num_rows in day_partition["countries"]:
+            if code == country_code:
+                row_groups.append(day_partition["row_group"])
+                country_row_ranges.append((first_row, num_rows))
+    if len(row_groups) == 0:
+        return ADSB_data_schema.empty_table().select(columns).to_pandas()
+
+    #a row filter can be on any column of the day file (i.e. the custom regions), so all of them are read for it
+    day_file = pq.ParquetFile(day_file_path)
+    tiles_table = day_file.read_row_groups(row_groups, columns=columns if row_filter is None else None, use_threads=True)
+    row_group_starts = np.cumsum([0] + [day_file.metadata.row_group(row_group).num_rows for row_group in row_groups])
+    country_table = pa.concat_tables([tiles_table.slice(row_group_start + first_row, num_rows)
+                                      for row_group_start, (first_row, num_rows) in zip(row_group_starts, country_row_ranges)])
+    if row_filter is not None:
+        country_table = country_table.filter(row_filter).select(columns)
+    return country_table.to_pandas()
+#----------------------------End Reading--------------------------------
+
+
+#----------------------------Manifest------------------------------------
+'''
+Get the size and the SHA-256 checksum of some downloaded bytes, to record in the manifest
+#INPUT: payload_bytes, bytes of the downloaded time slice file
+#OUTPUT: dictionary with "source_bytes" and "source_sha256"
+'''
+def get_download_information(payload_bytes):
+    return {"source_bytes": len(payload_bytes), "source_sha256": hashlib.sha256(payload_bytes).hexdigest()}
+
+'''
+Get the size and the SHA-256 checksum of a file, read in chunks so big files are not loaded all at once
+#INPUT: file_path, path to the file
+#OUTPUT: dictionary with "bytes" and "sha256"
+'''
+def get_file_information(file_path):
+    checksum = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            checksum.update(chunk)
+    return {"bytes": os.path.getsize(file_path), "sha256": checksum.hexdigest()}
+
+'''
+Get the path of the manifest of a day
+#INPUT: day_directory, the folder of the day
+#OUTPUT: file path as a string
+'''
+def get_manifest_file_path(day_directory):
+    return os.path.join(day_directory, manifest_file_name)
+
+'''
+Read the manifest of a day
+#INPUT: day_directory, the folder of the day
+#OUTPUT: dictionary with
+            "time_slices": time slice name to what was recorded about it ("rows", and for downloads "sampling_rate_min",
+                           "source_bytes" and "source_sha256")
+            "complete_sampling_rates_min": sampling rates, in minutes, at which every time slice of the day has been downloaded
+            "day_file": "bytes" and "sha256" of the day file when it was last written, or None
+            "custom_regions": custom polygon name to the "bit" and "sha256" it was checked with, for the regions that are
+                              up to date in the day file's custom regions column (see get_custom_regions)
+        An empty manifest if the day has none (or it can't be read)
+'''
+def read_day_manifest(day_directory):
+    manifest = {"time_slices": {}, "complete_sampling_rates_min": [], "day_file": None, "day_data_sha256": None, "custom_regions": {}}
+    try:
+        with open(get_manifest_file_path(day_directory), "r") as file:
+            manifest.update(json.load(file))
+    except (OSError, ValueError): #no manifest yet, or a broken one. Either way, nothing is known about the day
+        pass
+    return manifest
+
+'''
+Save the manifest of a day. Like the day file, it is written next to the old one and then swapped in
+#INPUT: day_directory, the folder of the day
+        manifest, dictionary of the manifest (see read_day_manifest)
+#OUTPUT: saves the manifest file
+'''
+def write_day_manifest(day_directory, manifest):
+    manifest_file_path = get_manifest_file_path(day_directory)
+    with open(manifest_file_path + ".partial", "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(manifest_file_path + ".partial", manifest_file_path)
+
+'''
+Check the day file against the manifest before adding to it, and clean up after an interrupted download:
+left over .partial files are deleted. If the day file is not the one the manifest recorded, the time slices in the file are
+recorded again (the day is no longer marked complete), and if the file can't be read at all it is deleted so it is downloaded again
+#INPUT: day_directory, the folder of the day
+#OUTPUT: sorted list of the names of the time slices that are saved and do not need to be downloaded again
+'''
+def verify_day_file(day_directory):
+    day_file_path = get_day_file_path(day_directory)
+    for file_path in [day_file_path + ".partial", get_manifest_file_path(day_directory) + ".partial"]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    manifest = read_day_manifest(day_directory)
+    if not os.path.exists(day_file_path):
+        if len(manifest["time_slices"]) > 0: #the manifest lists slices whose file is gone
+            write_day_manifest(day_directory, {"time_slices": {}, "complete_sampling_rates_min": [], "day_file": None})
+        return []
+    day_file_information = get_file_information(day_file_path)
+    if day_file_information == manifest["day_file"]:
+        return sorted(manifest["time_slices"])
+
+    #the day file changed since the manifest was written (or there is no manifest), so see what it really holds
+    try:
+        time_slices = {name: manifest["time_slices"].get(name, {"rows": time_slice_table.num_rows})
+                       for name, time_slice_table in read_day_time_slice_tables(day_directory, columns = [time_slice_header])}
+    except Exception as error: #not a readable day file
+        print(f"Day file {day_file_path} can't be read ({error}). It will be downloaded again.")
+        os.remove(day_file_path)
+        time_slices = {}
+        day_file_information = None
+    write_day_manifest(day_directory, {"time_slices": time_slices, "complete_sampling_rates_min": [], "day_file": day_file_information})
+    return sorted(time_slices)
+
+'''
+Check if a sampling rate is covered by one of the sampling rates a day was completely downloaded at:
+every time slice on the sampling rate is also on a rate that divides it (i.e. 30 min slices are all in a 15 min download)
+#INPUT: sampling_rate_min, float or int, sampling rate in minutes
+        complete_sampling_rates_min, list of the sampling rates the day is complete at (see read_day_manifest)
+#OUTPUT: True if all the time slices on sampling_rate_min have been downloaded, False otherwise
+'''
+def is_sampling_rate_complete(sampling_rate_min, complete_sampling_rates_min):
+    return any(sampling_rate_min % complete_rate == 0 for complete_rate in complete_sampling_rates_min)
+
+'''
+Mark a day as completely downloaded at a sampling rate, once every time slice on that rate has been saved
+#INPUT: day_directory, the folder of the day
+        sampling_rate_min, float or int, sampling rate in minutes
+#OUTPUT: updates the day's manifest
+'''
+def mark_day_complete(day_directory, sampling_rate_min):
+    manifest = read_day_manifest(day_directory)
+    if not is_sampling_rate_complete(sampling_rate_min, manifest["complete_sampling_rates_min"]):
+        manifest["complete_sampling_rates_min"] = sorted(manifest["complete_sampling_rates_min"] + [sampling_rate_min])
+        write_day_manifest(day_directory, manifest)
+
+'''
+Check if a day has been completely downloaded, from its manifest alone
+#INPUT: day_directory, the folder of the day
+        sampling_rate_min (optional), float or int, sampling rate in minutes. None accepts any sampling rate
+#OUTPUT: True if the day was completely downloaded (at the sampling rate, if given), False otherwise
+'''
+def is_day_complete(day_directory, sampling_rate_min = None):
+    complete_sampling_rates_min = read_day_manifest(day_directory)["complete_sampling_rates_min"]
+    if sampling_rate_min == None:
+        return len(complete_sampling_rates_min) > 0
+    return is_sampling_rate_complete(sampling_rate_min, complete_sampling_rates_min)
+
+'''
+Find the dates of a list that have not been completely downloaded, using only the manifest of each day (no folder listing)
+#INPUT: dates_list, list of dateutil objects
+        sampling_rate_min (optional), float or int, sampling rate in minutes. None accepts any sampling rate
+#OUTPUT: list of the dates that are missing or only partly downloaded. Empty if the whole list is there
+'''
+def get_incomplete_dates(dates_list, sampling_rate_min = None):
+    return [date_util for date_util in dates_list if not is_day_complete(get_day_directory(date_util), sampling_rate_min)]
+
+'''
+Get a stamp of the data saved for a day, that changes whenever the data changes. Anything made from the day (like its grid cube)
+is saved with the stamp, and is only used again while the stamp is the same. Checking the day against a custom polygon
+(see update_day_custom_regions_column) does not change the observations, so it does not change the stamp either
+#INPUT: day_directory, the folder of the day
+#OUTPUT: string: the checksum the day file had when its data was last written (from the manifest), or if the file does not match
+        the manifest, its checksum with the file's size and modification time. For days still in .pkl files, the name,
+        size and modification time of each file. None if the day has no data
+'''
+def get_day_data_stamp(day_directory):
+    day_file_path = get_day_file_path(day_directory)
+    if os.path.exists(day_file_path):
+        manifest = read_day_manifest(day_directory)
+        day_file_information = manifest["day_file"] or {}
+        file_status = os.stat(day_file_path)
+        if manifest["day_data_sha256"] != None and day_file_information.get("bytes") == file_status.st_size:
+            return "data:" + manifest["day_data_sha256"]
+        return f"{day_file_information.get('sha256')}:{file_status.st_size}:{file_status.st_mtime_ns}"
+    if not os.path.isdir(day_directory):
+        return None
+    pkl_file_names = sorted(f for f in os.listdir(day_directory) if f.endswith(".pkl"))
+    if len(pkl_file_names) == 0:
+        return None
+    pkl_files_description = ";".join(f"{f}:{os.stat(os.path.join(day_directory, f)).st_size}:{os.stat(os.path.join(day_directory, f)).st_mtime_ns}"
+                                     for f in pkl_file_names)
+    return "pkl:" + hashlib.sha256(pkl_files_description.encode("utf-8")).hexdigest()
+#----------------------------End Manifest--------------------------------
+
+
+#----------------------------Custom regions------------------------------------
+'''
+Get the path of the file that keeps the bit of each custom region
+#INPUT: data_directory (optional), the data folder the bits are for (see get_data_directory_of_day). None is ADS_B_data_directory
+#OUTPUT: file path as a string
+'''
+def get_custom_region_bits_file_path(data_directory = None):
+    return os.path.join(data_directory if data_directory != None else ADS_B_data_directory, custom_region_bits_file_name)
+
+'''
+Get the bit of each custom region in the custom regions column. A region seen for the first time gets the lowest free bit,
+and keeps it from then on (the bit of a deleted region is not given to another one)
+#INPUTS: custom_polygon_names, list of names of custom polygons (see custom_polygons.get_custom_polygon_names)
+        data_directory (optional), the data folder whose bits these are, see get_custom_region_bits_file_path
+#OUTPUT: dictionary of each name to its bit
+        raises ValueError if there are more regions than bits in the column
+'''
+def get_custom_region_bits(custom_polygon_names, data_directory = None):
+    custom_region_bits_file_path = get_custom_region_bits_file_path(data_directory)
+    all_custom_region_bits = {}
+    if os.path.exists(custom_region_bits_file_path):
+        with open(custom_region_bits_file_path, "r") as file:
+            all_custom_region_bits = json.load(file)
+
+    new_custom_polygon_names = sorted(set(custom_polygon_names) - set(all_custom_region_bits))
+    if len(new_custom_polygon_names) > 0:
+        num_bits = ADSB_day_file_schema.field(custom_regions_header).type.bit_width
+        free_bits = [bit for bit in range(num_bits) if bit not in all_custom_region_bits.values()]
+        if len(new_custom_polygon_names) > len(free_bits):
+            raise ValueError(f"Only {num_bits} custom regions can be saved in the {custom_regions_header} column. "
+                             f"Remove some from {custom_region_bits_file_path}")
+        all_custom_region_bits.update(zip(new_custom_polygon_names, free_bits))
+        os.makedirs(os.path.dirname(custom_region_bits_file_path), exist_ok=True)
+        with open(custom_region_bits_file_path + ".partial", "w") as file:
+            json.dump(all_custom_region_bits, file, indent=1, sort_keys=True)
+        os.replace(custom_region_bits_file_path + ".partial", custom_region_bits_file_path)
+    return {name: all_custom_region_bits[name] for name in custom_polygon_names}
+
+'''
+Get the custom regions the day files should have in their custom regions column, as they are now
+#INPUT: data_directory (optional), the data folder of the day files, see get_custom_region_bits_file_path
+#OUTPUT: dictionary of each custom polygon name to a dictionary of its "bit" and the "sha256" checksum of its files.
+        A day's manifest records the same for the regions it was checked for, so a region added or changed since is found
+'''
+def get_custom_regions(data_directory = None):
+    custom_polygon_names = custom_polygons.get_custom_polygon_names()
+    custom_region_bits = get_custom_region_bits(custom_polygon_names, data_directory)
+    return {name: {"bit": custom_region_bits[name], "sha256": custom_polygons.get_custom_polygon_sha256(name)} for name in custom_polygon_names}
+
+'''
+Check which custom regions the observations of a time slice are in, and set their bits in the custom regions column
+#INPUT: time_slice_table, pyarrow Table of a time slice, with or without the custom regions column
+        custom_region_bits, dictionary of the name of each custom polygon to check to its bit (see get_custom_region_bits).
+            The bits of the other regions are kept as they are (they are 0 if the table has no custom regions column yet)
+#OUTPUT: pyarrow Table with the ADSB_day_file_schema columns
+'''
+def add_custom_regions_column(time_slice_table, custom_region_bits):
+    if custom_regions_header in time_slice_table.column_names:
+        if len(custom_region_bits) == 0: #nothing to check
+            return time_slice_table
+        custom_regions = time_slice_table.column(custom_regions_header).to_numpy().astype(np.uint64) #a copy that can be changed
+        time_slice_table = time_slice_table.drop_columns([custom_regions_header])
+    else:
+        custom_regions = np.zeros(time_slice_table.num_rows, dtype=np.uint64)
+
+    latitudes = time_slice_table.column(ADSB_data_headers[0]).to_numpy()
+    longitudes = time_slice_table.column(ADSB_data_headers[1]).to_numpy()
+    for name, bit in custom_region_bits.items():
+        is_in_region = custom_polygons.get_points_in_custom_polygon(latitudes, longitudes, name)
+        custom_regions = (custom_regions & ~np.uint64(1 << bit)) | (is_in_region.astype(np.uint64) << np.uint64(bit))
+    return time_slice_table.append_column(ADSB_day_file_schema.field(custom_regions_header), pa.array(custom_regions, pa.uint64()))
+
+'''
+Get the bit of a custom region in a day file, if the day file is up to date for the region (it was checked with the polygon as it is now)
+#INPUT: day_directory, the folder of the day
+        custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: the bit as an int, or None if the day's observations have to be checked against the polygon (see backfill_custom_regions)
+'''
+def get_saved_custom_region_bit(day_directory, custom_polygon):
+    saved_custom_region = read_day_manifest(day_directory)["custom_regions"].get(custom_polygon)
+    if (saved_custom_region == None or not os.path.exists(get_day_file_path(day_directory))
+            or saved_custom_region["sha256"] != custom_polygons.get_custom_polygon_sha256(custom_polygon)):
+        return None
+    return saved_custom_region["bit"]
+
+'''
+Make the row filter of read_day that keeps the observations in a custom region
+#INPUT: custom_region_bit, int, the bit of the region in the day file (see get_saved_custom_region_bit)
+#OUTPUT: pyarrow compute expression
+'''
+def get_custom_region_row_filter(custom_region_bit):
+    return pc.bit_wise_and(pc.field(custom_regions_header), pa.scalar(1 << custom_region_bit, pa.uint64())) != pa.scalar(0, pa.uint64())
+
+'''
+Make the partition filter of read_day that keeps the tiles with observations in a custom region
+#INPUT: custom_region_bit, int, the bit of the region in the day file (see get_saved_custom_region_bit)
+#OUTPUT: function of the index of a tile, see read_day
+'''
+def get_custom_region_partition_filter(custom_region_bit):
+    return lambda day_partition: (day_partition["custom_regions"] >> custom_region_bit) & 1 == 1
+
+'''
+Check the observations of a day file against some custom regions and save their bits in the custom regions column. Only that
+column (and the custom regions of the index of the tiles) changes: the other columns are copied over one tile at a time as they
+are, and the day's data stamp stays the same (see get_day_data_stamp), so the results cached for the day are still used
+#INPUTS: day_directory, the folder of the day. Its day file must be grouped by tile (see get_day_partitions)
+        custom_region_bits, dictionary of the name of each custom polygon to check to its bit (see add_custom_regions_column)
+        custom_regions, the custom regions the day file is then up to date for, recorded in the manifest (see get_custom_regions)
+#OUTPUT: saves the day file (written next to the old one, then swapped in) and updates the day's manifest
+'''
+def update_day_custom_regions_column(day_directory, custom_region_bits, custom_regions):
+    day_file_path = get_day_file_path(day_directory)
+    temporary_file_path = day_file_path + ".partial"
+    with pq.ParquetFile(day_file_path) as day_file:
+        day_file_schema = day_file.schema_arrow
+        day_partitions = json.loads(day_file_schema.metadata[PARTITIONS_METADATA_KEY])
+        #check the positions of every tile first: the index of the tiles, with their custom regions, goes in the schema of the new file
+        custom_regions_columns = []
+        for day_partition in day_partitions:
+            tile_table = day_file.read_row_group(day_partition["row_group"], columns=ADSB_data_headers[0:2] + [custom_regions_header])
+            custom_regions_column = add_custom_regions_column(tile_table, custom_region_bits).column(custom_regions_header)
+            custom_regions_columns.append(custom_regions_column)
+            day_partition["custom_regions"] = int(np.bitwise_or.reduce(custom_regions_column.to_numpy()))
+
+        schema = day_file_schema.with_metadata({**day_file_schema.metadata, PARTITIONS_METADATA_KEY: json.dumps(day_partitions)})
+        with pq.ParquetWriter(temporary_file_path, schema, compression="zstd") as writer:
+            for day_partition, custom_regions_column in zip(day_partitions, custom_regions_columns):
+                tile_table = day_file.read_row_group(day_partition["row_group"])
+                tile_table = tile_table.set_column(tile_table.schema.get_field_index(custom_regions_header), schema.field(custom_regions_header),
+                                                   custom_regions_column)
+                writer.write_table(tile_table, row_group_size=day_partition["rows"])
+    os.replace(temporary_file_path, day_file_path)
+
+    manifest = read_day_manifest(day_directory)
+    manifest["custom_regions"] = custom_regions
+    manifest["day_file"] = get_file_information(day_file_path)
+    write_day_manifest(day_directory, manifest)
+
+'''
+Bring the custom regions column of a day file up to date: only the regions added or changed since the day was last checked
+are checked, the bits of the other regions are kept, and only the custom regions column is written again (see
+update_day_custom_regions_column). A day file saved before the tiles (or the country codes) is also grouped by tile (see make_day_partitions)
+#INPUT: day_directory, the folder of the day
+#OUTPUT: sorted list of the names of the regions checked. Empty if the day was up to date (the day file is then not written again,
+        unless it had no tiles yet)
+'''
+def backfill_day_custom_regions(day_directory):
+    if not os.path.exists(get_day_file_path(day_directory)): #no data, or a day still in pkl files (see migrate_pkl_archive_to_parquet)
+        return []
+    saved_custom_regions = read_day_manifest(day_directory)["custom_regions"]
+    custom_regions = get_custom_regions(get_data_directory_of_day(day_directory))
+    stale_custom_region_bits = {name: custom_region["bit"] for name, custom_region in custom_regions.items() if saved_custom_regions.get(name) != custom_region}
+    if get_day_partitions(day_directory) == None: #saved before the tiles: the whole day is written again, grouped by tile
+        write_day_time_slices(day_directory, {})
+    elif len(stale_custom_region_bits) > 0:
+        update_day_custom_regions_column(day_directory, stale_custom_region_bits, custom_regions)
+    return sorted(stale_custom_region_bits)
+
+'''
+Backfill command: bring the custom regions column of the saved days up to date, i.e. after a custom polygon is added or changed.
+Only the bit of the new or changed polygon is checked. It is not part of the processing: until a day is backfilled, its
+observations are checked against the polygon each time it is processed over the polygon (see process_ADS_B_data.get_full_day_gdf)
+#INPUT: dates_list (optional), list of dateutil objects. None goes through every day in the ADS_B_Data folder
+#OUTPUT: updates the day files and prints the days that were updated
+'''
+def backfill_custom_regions(dates_list = None):
+    if dates_list == None:
+        day_directories = []
+        for directory, sub_directories, file_names in os.walk(ADS_B_data_directory):
+            sub_directories.sort()
+            if day_file_name in file_names:
+                day_directories.append(directory)
+    else:
+        day_directories = [get_day_directory(date_util) for date_util in dates_list]
+    for day_directory in day_directories:
+        custom_region_names = backfill_day_custom_regions(day_directory)
+        if len(custom_region_names) > 0:
+            print(f"Checked the custom regions {', '.join(custom_region_names)} in {os.path.relpath(day_directory, ADS_B_data_directory)}")
+#----------------------------End Custom regions--------------------------------
+
+
+#----------------------------Migrating old data------------------------------------
+'''
+Move a day saved in the old format (one pickled GeoDataFrame per time slice) to a day Parquet file
+#INPUT: day_directory, the folder of the day
+        delete_pkl_files (optional), boolean, True to delete the pkl files once the Parquet file is written
+#OUTPUT: number of time slices moved over
+'''
+def migrate_pkl_day_to_parquet(day_directory, delete_pkl_files = False):
+    pkl_file_names = sorted(f for f in os.listdir(day_directory) if f.endswith(".pkl"))
+    if len(pkl_file_names) == 0:
+        return 0
+    time_slice_tables = {get_time_slice_name(f): read_pkl_time_slice(os.path.join(day_directory, f)) for f in pkl_file_names}
+    write_day_time_slices(day_directory, time_slice_tables)
+    if delete_pkl_files: #only delete once the day file has been written
+        for pkl_file_name in pkl_file_names:
+            os.remove(os.path.join(day_directory, pkl_file_name))
+    return len(pkl_file_names)
+
+'''
+One-shot migration of every day in the ADS_B_Data folder from the old pkl format to the Parquet format
+#INPUT: delete_pkl_files (optional), boolean, True to delete the pkl files of each day once its Parquet file is written
+#OUTPUT: moves the data over and prints the days that were moved
+'''
+def migrate_pkl_archive_to_parquet(delete_pkl_files = False):
+    for directory, sub_directories, file_names in os.walk(ADS_B_data_directory):
+        sub_directories.sort()
+        if any(f.endswith(".pkl") for f in file_names):
+            num_time_slices = migrate_pkl_day_to_parquet(directory, delete_pkl_files = delete_pkl_files)
+            print(f"Moved {num_time_slices} time slices to Parquet in {os.path.relpath(directory, ADS_B_data_directory)}")
+#----------------------------End Migrating old data--------------------------------
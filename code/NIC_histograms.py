@@ -0,0 +1,181 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script sums up a day of ADS-B observations (over a region) into a "NIC histogram" that does not depend on the NIC bins:
+#the number of observations at each NIC value (0 to 11), and for each flight, which NIC values it was seen at (a 12 bit mask).
+#NIC is always a whole number from 0 to 11, so the observation counts and the unique flight counts of ANY bins the user picks
+#come from the histogram alone, without going back to the observations: a bin's count is the sum of the counts of its NIC values,
+#and its flights are the flights whose mask has one of its NIC values. Changing the bins never reads the data again.
+#A histogram can be saved to a small Parquet file (one row per flight) and read back (see write_NIC_histogram).
+#The histograms of many groups of observations (i.e. of every country) can also be made together, in one pass over the
+#observations (see make_NIC_histograms_by_group).
+
+import json
+import numpy as np
+import pandas as pd
+
+#columnar storage
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#NIC values go from 0 to 11
+num_NIC_values = 12
+#key in the Parquet file metadata that keeps the NIC counts of a saved histogram
+NIC_HISTOGRAM_METADATA_KEY = b"NIC_histogram"
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Make the NIC histogram of a set of observations. Observations with a NIC outside 0 to 11 are left out
+#INPUT: NIC_data_frame, DataFrame or GeoDataFrame with the NIC in its third column and the flight numbers in its fifth column
+            (as saved, see ADS_B_storage.ADSB_data_headers)
+#OUTPUT: dictionary: "NIC_counts" (int64 array of the number of observations at each NIC 0 to 11),
+        "flights" (array of the flight numbers seen), "flight_NIC_masks" (uint16 array, for each flight, bit n is set if it was seen at NIC n)
+'''
+def make_NIC_histogram(NIC_data_frame):
+    headers = NIC_data_frame.columns
+    NIC_values = NIC_data_frame[headers[2]].to_numpy(dtype=np.int64)
+    is_valid_NIC = (NIC_values >= 0) & (NIC_values < num_NIC_values)
+    NIC_values = NIC_values[is_valid_NIC]
+    NIC_counts = np.bincount(NIC_values, minlength=num_NIC_values)
+
+    #number the flights (a missing flight number counts as one flight, like any other), then keep one of each (flight, NIC) pair
+    #and set the bit of its NIC in the flight's mask
+    flight_codes, flights = pd.factorize(NIC_data_frame[headers[4]].to_numpy()[is_valid_NIC], sort=False, use_na_sentinel=False)
+    flight_NIC_pairs = pd.unique(flight_codes.astype(np.int64) * num_NIC_values + NIC_values)
+    flight_NIC_masks = np.zeros(len(flights), dtype=np.uint16)
+    np.bitwise_or.at(flight_NIC_masks, flight_NIC_pairs // num_NIC_values, (1 << (flight_NIC_pairs % num_NIC_values)).astype(np.uint16))
+    return {"NIC_counts": NIC_counts, "flights": np.asarray(flights, dtype=object), "flight_NIC_masks": flight_NIC_masks}
+
+'''
+Get the NIC values of each bin as a bit mask: bin i holds the NIC values in (NIC_bin_edges[i], NIC_bin_edges[i+1]]
+#INPUT: NIC_bin_edges, list of the edges of the bins
+#OUTPUT: numpy array of one mask per bin, bit n is set if NIC n is in the bin
+'''
+def get_NIC_bin_masks(NIC_bin_edges):
+    num_bins = len(NIC_bin_edges) - 1
+    #right=True gives the bins that are inclusive on the right, so a NIC equal to an edge falls in the bin below it
+    bin_of_each_NIC = np.digitize(np.arange(num_NIC_values), NIC_bin_edges, right=True) - 1
+    return np.array([sum(1 << NIC_value for NIC_value in range(num_NIC_values) if bin_of_each_NIC[NIC_value] == i) for i in range(num_bins)],
+                    dtype=np.uint16)
+
+'''
+Get the number of observations in each NIC bin
+#INPUTS: NIC_histogram, see make_NIC_histogram
+        NIC_bin_edges, list of the edges of the bins
+#OUTPUT: numpy array of the count of each bin
+'''
+def get_bin_counts(NIC_histogram, NIC_bin_edges):
+    bin_masks = get_NIC_bin_masks(NIC_bin_edges)
+    NIC_is_in_bin = (bin_masks[:, None] >> np.arange(num_NIC_values)) & 1 #one row per bin, one column per NIC value
+    return NIC_is_in_bin @ NIC_histogram["NIC_counts"]
+
+'''
+Get the number of UNIQUE flights in each NIC bin. A flight is counted in every bin it was seen in
+#INPUTS: NIC_histogram, see make_NIC_histogram
+        NIC_bin_edges, list of the edges of the bins
+#OUTPUT: numpy array of the number of flights of each bin
+'''
+def get_bin_flights(NIC_histogram, NIC_bin_edges):
+    bin_masks = get_NIC_bin_masks(NIC_bin_edges)
+    return np.array([np.count_nonzero(NIC_histogram["flight_NIC_masks"] & bin_mask) for bin_mask in bin_masks], dtype=np.int64)
+
+'''
+Save a NIC histogram to a Parquet file: one row per flight with its mask, and the NIC counts in the file's metadata
+#INPUTS: NIC_histogram, see make_NIC_histogram
+        file_path, string, where to save it
+#OUTPUT: saves the file
+'''
+def write_NIC_histogram(NIC_histogram, file_path):
+    flights = [None if pd.isna(flight) else str(flight) for flight in NIC_histogram["flights"]]
+    table = pa.table({"Flight Number": pa.array(flights, pa.string()), "NIC mask": pa.array(NIC_histogram["flight_NIC_masks"], pa.uint16())})
+    table = table.replace_schema_metadata({NIC_HISTOGRAM_METADATA_KEY: json.dumps({"NIC_counts": [int(count) for count in NIC_histogram["NIC_counts"]]})})
+    pq.write_table(table, file_path, compression="zstd")
+
+'''
+Read a NIC histogram saved with write_NIC_histogram
+#INPUT: file_path, string
+#OUTPUT: the NIC histogram dictionary (see make_NIC_histogram)
+'''
+def read_NIC_histogram(file_path):
+    table = pq.read_table(file_path)
+    histogram_information = json.loads(table.schema.metadata[NIC_HISTOGRAM_METADATA_KEY])
+    return {"NIC_counts": np.array(histogram_information["NIC_counts"], dtype=np.int64),
+            "flights": np.array(table.column("Flight Number").to_pylist(), dtype=object),
+            "flight_NIC_masks": table.column("NIC mask").to_numpy().astype(np.uint16)}
+
+'''
+Make the NIC histograms of many groups of observations at once (i.e. one per country), in one pass over the observations
+#INPUTS: NIC_data_frame, DataFrame or GeoDataFrame like in make_NIC_histogram
+        group_codes, int numpy array of the group of each observation, 0 to num_groups - 1. Observations with a negative code are left out
+        num_groups, int, number of groups
+#OUTPUT: dictionary: "NIC_counts" (int64 array, one row per group, of the number of observations at each NIC 0 to 11),
+        and one entry per group and flight seen in it: "groups" (int32 array of the group), "flights" (array of the flight number)
+        and "flight_NIC_masks" (uint16 array, bit n is set if the flight was seen at NIC n in the group)
+'''
+def make_NIC_histograms_by_group(NIC_data_frame, group_codes, num_groups):
+    headers = NIC_data_frame.columns
+    NIC_values = NIC_data_frame[headers[2]].to_numpy(dtype=np.int64)
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    is_valid = (NIC_values >= 0) & (NIC_values < num_NIC_values) & (group_codes >= 0) & (group_codes < num_groups)
+    NIC_values = NIC_values[is_valid]
+    group_codes = group_codes[is_valid]
+    NIC_counts = np.bincount(group_codes * num_NIC_values + NIC_values, minlength=num_groups * num_NIC_values).reshape(num_groups, num_NIC_values)
+
+    #number the flights, then each (group, flight) pair, in the order of the groups, and set the NIC bits like make_NIC_histogram
+    flight_codes, flights = pd.factorize(NIC_data_frame[headers[4]].to_numpy()[is_valid], sort=False, use_na_sentinel=False)
+    num_flights = max(1, len(flights))
+    group_flight_codes, group_flight_pairs = pd.factorize(group_codes * num_flights + flight_codes, sort=True)
+    group_flight_NIC_pairs = pd.unique(group_flight_codes.astype(np.int64) * num_NIC_values + NIC_values)
+    flight_NIC_masks = np.zeros(len(group_flight_pairs), dtype=np.uint16)
+    np.bitwise_or.at(flight_NIC_masks, group_flight_NIC_pairs // num_NIC_values, (1 << (group_flight_NIC_pairs % num_NIC_values)).astype(np.uint16))
+    return {"NIC_counts": NIC_counts, "groups": (group_flight_pairs // num_flights).astype(np.int32),
+            "flights": np.asarray(flights, dtype=object)[group_flight_pairs % num_flights], "flight_NIC_masks": flight_NIC_masks}
+
+'''
+Get the number of observations in each NIC bin, for every group
+#INPUTS: NIC_histograms, see make_NIC_histograms_by_group
+        NIC_bin_edges, list of the edges of the bins
+#OUTPUT: numpy array of the counts, one row per group and one column per bin
+'''
+def get_bin_counts_by_group(NIC_histograms, NIC_bin_edges):
+    bin_masks = get_NIC_bin_masks(NIC_bin_edges)
+    NIC_is_in_bin = (bin_masks[:, None] >> np.arange(num_NIC_values)) & 1 #one row per bin, one column per NIC value
+    return NIC_histograms["NIC_counts"] @ NIC_is_in_bin.T
+
+'''
+Get the number of UNIQUE flights in each NIC bin, for every group. A flight is counted in every bin (and group) it was seen in
+#INPUTS: NIC_histograms, see make_NIC_histograms_by_group
+        NIC_bin_edges, list of the edges of the bins
+#OUTPUT: numpy array of the number of flights, one row per group and one column per bin
+'''
+def get_bin_flights_by_group(NIC_histograms, NIC_bin_edges):
+    num_groups = len(NIC_histograms["NIC_counts"])
+    bin_masks = get_NIC_bin_masks(NIC_bin_edges)
+    return np.stack([np.bincount(NIC_histograms["groups"][(NIC_histograms["flight_NIC_masks"] & bin_mask) != 0], minlength=num_groups)
+                     for bin_mask in bin_masks], axis=1).astype(np.int64)
+
+'''
+Save the NIC histograms of many groups to a Parquet file: one row per group and flight, and the NIC counts in the file's metadata
+#INPUTS: NIC_histograms, see make_NIC_histograms_by_group
+        file_path, string, where to save it
+#OUTPUT: saves the file
+'''
+def write_NIC_histograms_by_group(NIC_histograms, file_path):
+    flights = [None if pd.isna(flight) else str(flight) for flight in NIC_histograms["flights"]]
+    table = pa.table({"Group": pa.array(NIC_histograms["groups"], pa.int32()), "Flight Number": pa.array(flights, pa.string()),
+                      "NIC mask": pa.array(NIC_histograms["flight_NIC_masks"], pa.uint16())})
+    table = table.replace_schema_metadata({NIC_HISTOGRAM_METADATA_KEY: json.dumps({"NIC_counts": NIC_histograms["NIC_counts"].tolist()})})
+    pq.write_table(table, file_path, compression="zstd")
+
+'''
+Read the NIC histograms of many groups saved with write_NIC_histograms_by_group
+#INPUT: file_path, string
+#OUTPUT: the NIC histograms dictionary (see make_NIC_histograms_by_group)
+'''
+def read_NIC_histograms_by_group(file_path):
+    table = pq.read_table(file_path)
+    histogram_information = json.loads(table.schema.metadata[NIC_HISTOGRAM_METADATA_KEY])
+    return {"NIC_counts": np.array(histogram_information["NIC_counts"], dtype=np.int64).reshape(-1, num_NIC_values),
+            "groups": table.column("Group").to_numpy().astype(np.int32),
+            "flights": np.array(table.column("Flight Number").to_pylist(), dtype=object),
+            "flight_NIC_masks": table.column("NIC mask").to_numpy().astype(np.uint16)}
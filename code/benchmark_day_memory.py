@@ -0,0 +1,102 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script measures how much memory a full day of ADS-B data takes once it is loaded, with the compact column types
+#of ADS_B_storage.py, against the column types used before (float64 lat/long, int64 NIC and R_C, Python strings).
+#It uses synthetic data, so nothing has to be downloaded. Run this file on its own: python benchmark_day_memory.py
+
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+import get_ADS_B_data
+import ADS_B_storage
+import synthetic_ADS_B_data
+
+#Get the directory of this script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+'''
+Make the time slices of a synthetic day, with the columns the downloader keeps. The countries are picked at random from
+the saved country list (about a third of the points are over water, with no country), so the country borders are not needed
+#INPUTS: num_time_slices, int, number of time slices in the day (96 is a 15 min sampling rate)
+        num_aircraft, int, number of aircraft in each time slice
+#OUTPUTS: dictionary of time slice name (i.e. "001500Z") to the DataFrame of the slice, with the original column types
+'''
+def make_synthetic_day(num_time_slices, num_aircraft):
+    country_names = pd.read_pickle(os.path.join(script_dir, "countries_list.pkl"))
+    random_generator = np.random.default_rng(0)
+    time_slice_dfs = {}
+    for i in range(num_time_slices):
+        minutes = i * 24 * 60 // num_time_slices
+        time_slice_name = "{:02d}{:02d}00Z".format(minutes // 60, minutes % 60)
+        loaded_tracking_data = synthetic_ADS_B_data.make_synthetic_time_slice(num_aircraft, seed = i)
+        time_slice_df = pd.DataFrame(get_ADS_B_data.get_ADSB_columns_from_json_data(loaded_tracking_data), columns = get_ADS_B_data.ADSB_data_headers)
+        time_slice_df["Country Name"] = pd.Series(random_generator.choice(country_names, size=len(time_slice_df)), dtype=object)
+        time_slice_df.loc[random_generator.uniform(0, 1, len(time_slice_df)) < 0.3, "Country Name"] = np.nan
+        time_slice_dfs[time_slice_name] = time_slice_df
+    return time_slice_dfs
+
+'''
+Put the rows of a day in a fixed order, by time slice, flight number, latitude and longitude, so two copies of a day can be
+compared row by row. The day file does not keep the order the rows were written in (they are grouped by tile and country)
+#INPUTS: day_df, DataFrame of the day with the ADSB_data_headers columns (except the time slice column)
+        time_slice_times, the time slice of each row
+#OUTPUTS: the DataFrame sorted, with a new index
+'''
+def sort_day_rows(day_df, time_slice_times):
+    #the flight numbers as strings and the positions as float32, so the original and the compact day sort the same way
+    sort_keys = pd.DataFrame({"time slice": pd.to_datetime(np.asarray(time_slice_times), utc=True).as_unit("ms"), "flight": day_df["Flight Number"].astype(object).astype(str).to_numpy(),
+                              "latitude": day_df["Latitude (deg)"].to_numpy(dtype=np.float32), "longitude": day_df["Longitude (deg)"].to_numpy(dtype=np.float32)})
+    rows_in_order = sort_keys.sort_values(list(sort_keys.columns), kind="stable").index
+    return day_df.iloc[rows_in_order].reset_index(drop=True)
+
+'''
+Compare the memory of a loaded day with the original and the compact column types
+#INPUTS: num_time_slices (optional), int, number of time slices in the day
+        num_aircraft (optional), int, number of aircraft in each time slice
+#OUTPUTS: DataFrame of the memory of each column in MB, for both types, and prints it
+'''
+def run_benchmark(num_time_slices = 96, num_aircraft = 10000):
+    time_slice_dfs = make_synthetic_day(num_time_slices, num_aircraft)
+    #the day as it was loaded before: every slice concatenated with the original types (and no time slice column)
+    original_day_df = pd.concat(time_slice_dfs.values(), ignore_index=True)
+    for header in ["Flight Number", "Country Name"]: #strings were Python objects in the pkl files
+        original_day_df[header] = original_day_df[header].astype(object)
+
+    #the day saved and loaded with the storage layer
+    #in a temporary data folder, so nothing is saved in ADS_B_Data (the day, or the bits of the custom regions)
+    original_data_directory = ADS_B_storage.ADS_B_data_directory
+    with tempfile.TemporaryDirectory() as data_directory:
+        ADS_B_storage.ADS_B_data_directory = data_directory
+        try:
+            day_directory = os.path.join(data_directory, "2024", "01", "01")
+            time_slice_times = {name: ADS_B_storage.get_time_slice_time(os.path.join(day_directory, name)) for name in time_slice_dfs}
+            time_slice_tables = {name: ADS_B_storage.make_time_slice_table(df, time_slice_times[name]) for name, df in time_slice_dfs.items()}
+            ADS_B_storage.write_day_time_slices(day_directory, time_slice_tables)
+            compact_day_df = ADS_B_storage.read_day_directory(day_directory)
+            day_file_MB = os.path.getsize(ADS_B_storage.get_day_file_path(day_directory)) / 1e6
+        finally:
+            ADS_B_storage.ADS_B_data_directory = original_data_directory
+
+    #the compact day must hold the same data (in another order, see sort_day_rows)
+    original_time_slice_times = np.concatenate([np.full(len(df), time_slice_times[name]) for name, df in time_slice_dfs.items()])
+    sorted_original_day_df = sort_day_rows(original_day_df, original_time_slice_times)
+    sorted_compact_day_df = sort_day_rows(compact_day_df, compact_day_df[ADS_B_storage.time_slice_header])
+    for header in get_ADS_B_data.ADSB_data_headers + ["Country Name"]:
+        pd.testing.assert_series_equal(sorted_original_day_df[header], sorted_compact_day_df[header], check_dtype=False, check_categorical=False,
+                                       check_exact=False, rtol=1e-6)
+
+    results_df = pd.DataFrame({"original MB": original_day_df.memory_usage(deep=True, index=False) / 1e6,
+                               "original type": original_day_df.dtypes.astype(str),
+                               "compact MB": compact_day_df.memory_usage(deep=True, index=False) / 1e6,
+                               "compact type": compact_day_df.dtypes.astype(str)})
+    results_df.loc["total"] = [results_df["original MB"].sum(), "", results_df["compact MB"].sum(), ""]
+    print(f"Memory of one loaded day: {num_time_slices} time slices, {len(compact_day_df)} rows. Day file on disk: {day_file_MB:.1f} MB")
+    print(results_df.round(2).fillna("").to_string())
+    print("Memory reduction: {:.1f}x".format(results_df.loc["total", "original MB"] / results_df.loc["total", "compact MB"]))
+    return results_df
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,110 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script measures how fast get_ADS_B_data.py downloads, against the local stand-in server (see ADS_B_stand_in_server.py),
+#so changes to the download can be measured on a machine with no network, with the same server every time.
+#For each download mode it reports the time slices and megabytes downloaded per second, and the CPU time used (by the download
+#and its conversion processes, the stand-in server runs in its own process and is not counted).
+#The data is saved to a temporary folder, not to ADS_B_Data. Run this file on its own: python benchmark_download.py
+
+import os
+import io
+import time
+import json
+import tempfile
+import contextlib
+import pandas as pd
+from datetime import timedelta
+
+import get_ADS_B_data
+import ADS_B_storage
+import ADS_B_stand_in_server
+
+#Get the directory of this script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+'''
+Add up what was downloaded over the days of a download, from the days' manifests
+#INPUT: dates_list, date util list of the dates of the download
+#OUTPUTS: number of time slices and number of bytes downloaded
+'''
+def get_downloaded_totals(dates_list):
+    num_time_slices = 0
+    num_bytes = 0
+    for date in dates_list:
+        day_manifest = ADS_B_storage.read_day_manifest(ADS_B_storage.get_day_directory(date))
+        num_time_slices += len(day_manifest["time_slices"])
+        num_bytes += sum(time_slice_information.get("source_bytes", 0) for time_slice_information in day_manifest["time_slices"].values())
+    return num_time_slices, num_bytes
+
+'''
+Time one download with get_ADS_B_data.main, into an empty temporary folder
+#INPUTS: server_url, url of the stand-in server (see ADS_B_stand_in_server.get_stand_in_server_url)
+        start, end, dateutil objects of the first and last day
+        sampling_rate, int or float, sampling rate in minutes
+        num_workers, int, number of time slices downloaded at the same time
+        mode, string, "threads" or "pipeline"
+#OUTPUT: dictionary of the results
+'''
+def time_download(server_url, start, end, sampling_rate, num_workers, mode):
+    original_online_data_url = get_ADS_B_data.online_data_url
+    original_data_directory = ADS_B_storage.ADS_B_data_directory
+    with tempfile.TemporaryDirectory() as data_directory:
+        get_ADS_B_data.online_data_url = server_url
+        ADS_B_storage.ADS_B_data_directory = data_directory
+        try:
+            start_times = os.times()
+            start_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()): #the download's messages would hide the results
+                get_ADS_B_data.main(start, end, None, sampling_rate, num_workers = num_workers, mode = mode)
+            wall_time_s = time.perf_counter() - start_time
+            end_times = os.times()
+            num_time_slices, num_bytes = get_downloaded_totals(get_ADS_B_data.make_date_list(start, end) if end != None else [start])
+        finally:
+            get_ADS_B_data.online_data_url = original_online_data_url
+            ADS_B_storage.ADS_B_data_directory = original_data_directory
+
+    #CPU time of this process (all its threads) and of the conversion processes, which are finished by now
+    #(the time of finished child processes is only counted on Unix)
+    process_cpu_s = (end_times.user - start_times.user) + (end_times.system - start_times.system)
+    children_cpu_s = (end_times.children_user - start_times.children_user) + (end_times.children_system - start_times.children_system)
+    return {"mode": mode, "workers": num_workers, "slices": num_time_slices, "MB": round(num_bytes / 1e6, 1), "time (s)": round(wall_time_s, 2),
+            "slices/s": round(num_time_slices / wall_time_s, 2), "MB/s": round(num_bytes / 1e6 / wall_time_s, 2),
+            "CPU (s)": round(process_cpu_s + children_cpu_s, 2), "CPU % of a core": round(100 * (process_cpu_s + children_cpu_s) / wall_time_s, 1),
+            "CPU ms/slice": round(1000 * (process_cpu_s + children_cpu_s) / max(num_time_slices, 1), 1)}
+
+'''
+Benchmark the download modes against a stand-in server
+#INPUTS: num_days (optional), int, number of days downloaded in each run
+        sampling_rate (optional), int or float, sampling rate in minutes
+        num_workers (optional), int, number of time slices downloaded at the same time
+        modes (optional), list of the download modes to run ("threads" and/or "pipeline")
+        results_file_path (optional), string, json file to save the results to. None to only print them
+        server_settings, settings of the stand-in server (see ADS_B_stand_in_server.make_server_settings), such as latency_s = 0.1,
+            bandwidth_bytes_per_s = 5e6 or error_rate = 0.05
+#OUTPUT: DataFrame of the results, one row per mode, and prints it
+'''
+def run_benchmark(num_days = 2, sampling_rate = 15, num_workers = get_ADS_B_data.num_download_workers, modes = ["threads", "pipeline"],
+                  results_file_path = None, **server_settings):
+    server_process, server_url = ADS_B_stand_in_server.start_stand_in_server(**server_settings)
+    start = get_ADS_B_data.convert_to_datetime("2024-01-01")
+    end = start + timedelta(days = num_days - 1) if num_days > 1 else None #main takes a single day as a start date alone
+    try:
+        #one download first, not timed, so the server has made all the files and every mode is measured against the same server
+        #(the server keeps ADS_B_stand_in_server.num_cached_time_slices files)
+        time_download(server_url, start, end, sampling_rate, num_workers, modes[0])
+        results = [time_download(server_url, start, end, sampling_rate, num_workers, mode) for mode in modes]
+    finally:
+        server_process.terminate()
+        server_process.join()
+
+    results_df = pd.DataFrame(results)
+    print(f"Download of {num_days} day(s) at a sampling rate of {sampling_rate} min from the stand-in server {server_settings}:")
+    print(results_df.to_string(index=False))
+    if results_file_path != None:
+        with open(results_file_path, "w") as file:
+            json.dump({"num_days": num_days, "sampling_rate_min": sampling_rate, "server_settings": server_settings, "results": results}, file, indent=1)
+    return results_df
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,89 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script benchmarks how fast the flights are pulled out of an ADS-B time slice json, in rows per second.
+#It compares the column extraction in get_ADS_B_data.py against the original per-aircraft try/except loop.
+#Run this file on its own: python benchmark_json_extraction.py
+
+import json
+import time
+import pandas as pd
+
+import get_ADS_B_data
+import synthetic_ADS_B_data
+
+
+'''
+The original extraction loop from get_GeoDataFrame_from_json, kept here as the reference to benchmark against
+#INPUTS: loaded_tracking_data, the dictionary of the time slice json
+#OUTPUTS: DataFrame with the ADS-B data headers
+'''
+def get_ADSB_data_frame_reference(loaded_tracking_data):
+    time_df_rows = []
+    for aircraft in loaded_tracking_data.get("aircraft", []):
+        try:
+            time_df_rows.append([aircraft["lat"], aircraft["lon"], aircraft["nic"], aircraft["rc"], aircraft["flight"]])
+        except KeyError:
+            try:
+                time_df_rows.append([aircraft["lastPosition"]["lat"], aircraft["lastPosition"]["lon"], aircraft["lastPosition"]["nic"],
+                                     aircraft["lastPosition"]["rc"], aircraft["lastPosition"]["flight"]])
+            except KeyError:
+                continue
+    return pd.DataFrame(time_df_rows, columns = get_ADS_B_data.ADSB_data_headers)
+
+'''
+Get the DataFrame with the column extraction used by get_GeoDataFrame_from_json
+#INPUTS: loaded_tracking_data, the dictionary of the time slice json
+#OUTPUTS: DataFrame with the ADS-B data headers
+'''
+def get_ADSB_data_frame_columns(loaded_tracking_data):
+    return pd.DataFrame(get_ADS_B_data.get_ADSB_columns_from_json_data(loaded_tracking_data), columns = get_ADS_B_data.ADSB_data_headers)
+
+'''
+Time a function on a json slice, including parsing the json text, and keep the best of a few repeats
+#INPUTS: parse_function, function that parses the json bytes
+        extraction_function, function that takes the loaded json dictionary and returns a DataFrame
+        slice_json_bytes, bytes of the time slice json (or anything parse_function takes)
+        repeats (optional), int, number of times to run
+#OUTPUTS: [best time in seconds, the DataFrame]
+'''
+def time_extraction(parse_function, extraction_function, slice_json_bytes, repeats = 5):
+    best_time = float("inf")
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        data_frame = extraction_function(parse_function(slice_json_bytes))
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return [best_time, data_frame]
+
+'''
+Run the benchmark for slices of different sizes and print rows per second for both methods.
+Also checks that both methods give the same DataFrame
+#INPUTS: aircraft_counts (optional), list of the number of aircraft per slice to test
+#OUTPUTS: DataFrame of the results, one row per slice size
+'''
+def run_benchmark(aircraft_counts = [1000, 10000, 50000]):
+    results = []
+    for num_aircraft in aircraft_counts:
+        slice_json_bytes = synthetic_ADS_B_data.make_synthetic_time_slice_json(num_aircraft, seed = num_aircraft)
+        #the original function parsed with json.load, the new one with load_json (orjson if installed)
+        reference_time, reference_df = time_extraction(json.loads, get_ADSB_data_frame_reference, slice_json_bytes)
+        columns_time, columns_df = time_extraction(get_ADS_B_data.load_json, get_ADSB_data_frame_columns, slice_json_bytes)
+        pd.testing.assert_frame_equal(reference_df, columns_df) #both methods must keep exactly the same flights
+        #and without the parsing, to see the extraction on its own
+        loaded_tracking_data = json.loads(slice_json_bytes)
+        reference_extract_time = time_extraction(lambda data: data, get_ADSB_data_frame_reference, loaded_tracking_data)[0]
+        columns_extract_time = time_extraction(lambda data: data, get_ADSB_data_frame_columns, loaded_tracking_data)[0]
+
+        num_rows = len(columns_df)
+        results.append({"aircraft in slice": num_aircraft, "rows kept": num_rows,
+                        "reference rows/s": round(num_rows / reference_time), "columns rows/s": round(num_rows / columns_time),
+                        "speedup": round(reference_time / columns_time, 2),
+                        "reference extract-only rows/s": round(num_rows / reference_extract_time),
+                        "columns extract-only rows/s": round(num_rows / columns_extract_time),
+                        "extract-only speedup": round(reference_extract_time / columns_extract_time, 2)})
+    results_df = pd.DataFrame(results)
+    print("Rows per second, with and without json parsing (orjson installed: " + str(get_ADS_B_data.orjson != None) + "):")
+    print(results_df.to_string(index=False))
+    return results_df
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,225 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script times the steps of process_ADS_B_data.py on synthetic days (see synthetic_ADS_B_data.py) at several data scales:
+#loading a day, filtering it to a custom polygon and to a country, the grid averages, the statistics over the dates and the maps.
+#1x is about a day of traffic at a 30 min sampling rate, 10x and 100x have 10 and 100 times the flights.
+#The results are saved as json in outputs/benchmarks, with the version of the code, so a slower step shows up when two runs are
+#compared with compare_benchmark_results. The synthetic days (and the cached results) are saved to a temporary folder, not to ADS_B_Data.
+#Run this file on its own: python benchmark_processing.py
+
+import os
+import io
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import contextlib
+import pandas as pd
+from datetime import datetime, timezone
+
+import process_ADS_B_data
+import ADS_B_storage
+import result_cache
+import synthetic_ADS_B_data
+
+#Get the directory of this script and the one above it (the main folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#data scales to run, as multiples of base_num_flights
+benchmark_scales = [1, 10, 100]
+#flights in a 1x day, the number of days, and their sampling rate
+base_num_flights = 3000
+benchmark_num_days = 2
+benchmark_sampling_rate_min = 30
+#first day of the synthetic data (any date works, the data is in a temporary folder)
+benchmark_start_date = "2000-01-01"
+#custom polygon (in maps/custom_polygons) the polygon filtering is timed with
+benchmark_custom_polygon = "Baltic"
+#NIC bins and their colors, as picked in the dashboard
+benchmark_NIC_bin_edges = [-1, 0, 3, 6, 11]
+benchmark_NIC_colors = ["#000000", "#d7191c", "#fdae61", "#1a9641"]
+#other NIC bins, to time changing the bins once the days have been processed
+benchmark_rebinned_NIC_bin_edges = [-1, 4, 7, 11]
+#steps that go row by row are skipped when their input has more rows than this, so the 100x scale finishes in a sensible time
+step_row_limits = {"map (raw)": 50000, "map (averaged)": 50000}
+#folder the results are saved to
+benchmark_results_directory = os.path.join(parent_dir, "outputs", "benchmarks")
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Set the NIC bins process_ADS_B_data.py works with, as its main function does
+#INPUTS: NIC_bin_edges, list of the edges of the bins
+        NIC_colors_hex_list, list of the hex color of each bin
+#OUTPUT: sets the NIC globals of process_ADS_B_data
+'''
+def set_NIC_bins(NIC_bin_edges, NIC_colors_hex_list):
+    process_ADS_B_data.NIC_bin_edges_to_process = NIC_bin_edges
+    process_ADS_B_data.NIC_colors = NIC_colors_hex_list
+    process_ADS_B_data.NIC_labels = ["NIC = (" + str(NIC_bin_edges[i]) + ", " + str(NIC_bin_edges[i+1]) + "]" for i in range(len(NIC_bin_edges) - 1)]
+
+'''
+Get the version of the code the benchmark runs on: the git commit, with "-modified" if there are changes that are not committed
+#INPUT: none
+#OUTPUT: string, or None if the code is not in a git repository
+'''
+def get_code_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=script_dir, capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=script_dir, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-modified" if changes.strip() != "" else "")
+
+'''
+Time one step, without its printed messages
+#INPUTS: step_function, function to call with no inputs
+#OUTPUTS: what the function returned, and the time it took in seconds
+'''
+def time_step(step_function):
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        step_output = step_function()
+    return step_output, time.perf_counter() - start_time
+
+'''
+Time the processing steps at one data scale, on synthetic days made in a temporary folder
+#INPUTS: scale, int, multiple of base_num_flights
+        dates_list, list of date util objects of the days
+#OUTPUT: list of dictionaries, one per step: scale, step, input rows and seconds (None if the step was skipped)
+'''
+def run_scale(scale, dates_list):
+    results = []
+    def add_result(step, num_rows, step_time_s):
+        results.append({"scale": scale, "step": step, "rows": int(num_rows), "seconds": None if step_time_s == None else round(step_time_s, 4)})
+        print(f"{scale:>4}x  {step:<28} {num_rows:>10} rows  " + ("skipped" if step_time_s == None else f"{step_time_s:.3f} s"))
+
+    num_rows, step_time_s = time_step(lambda: synthetic_ADS_B_data.write_synthetic_days(dates_list, num_flights = base_num_flights * scale,
+                                                                                       delta_t_min = benchmark_sampling_rate_min, use_country_raster = True))
+    add_result("make synthetic days", num_rows, step_time_s)
+
+    first_date = dates_list[0]
+    full_day_gdf, step_time_s = time_step(lambda: process_ADS_B_data.get_full_day_gdf(first_date))
+    add_result("get_full_day_gdf", len(full_day_gdf), step_time_s)
+    #the filters report the number of rows they kept
+    region_gdf, step_time_s = time_step(lambda: process_ADS_B_data.get_full_day_gdf(first_date, custom_polygon = benchmark_custom_polygon))
+    add_result("custom polygon filter", len(region_gdf), step_time_s)
+    #the same region, checking the points against the polygon (what a day saved before the polygon was added goes through)
+    region_gdf, step_time_s = time_step(lambda: process_ADS_B_data.get_gdf_in_custom_polygon(ADS_B_storage.read_day(first_date), benchmark_custom_polygon))
+    add_result("custom polygon point check", len(region_gdf), step_time_s)
+    busiest_country = full_day_gdf["Country Name"].value_counts().index[0]
+    region_gdf, step_time_s = time_step(lambda: process_ADS_B_data.get_full_day_gdf(first_date, specified_country = busiest_country))
+    add_result("country filter", len(region_gdf), step_time_s)
+    del region_gdf
+
+    averaged_gdf, step_time_s = time_step(lambda: process_ADS_B_data.get_NIC_data_boxed_averages(full_day_gdf.copy()))
+    add_result("grid averages", len(full_day_gdf), step_time_s)
+    #the grid of all the days: the first time each day is gridded and cached, the second time the whole grid is in the cache
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_date_range_grid_cube(dates_list))
+    add_result("date range grid", num_rows, step_time_s)
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_date_range_grid_cube(dates_list))
+    add_result("date range grid (cached)", num_rows, step_time_s)
+
+    total_rows = num_rows
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_stats_date_range("flights", dates_list))
+    add_result("stats (flights)", total_rows, step_time_s)
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_stats_date_range("counts", dates_list))
+    add_result("stats (counts)", total_rows, step_time_s)
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_stats_date_range("counts", dates_list, custom_polygon = benchmark_custom_polygon))
+    add_result("stats (counts, polygon)", total_rows, step_time_s)
+    #the statistics of every country, from one pass over each day
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_all_countries_stats_date_range("counts", dates_list))
+    add_result("stats (all countries)", total_rows, step_time_s)
+    #what main uses: one read of each day for both statistics and the grid
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_date_range_statistics(dates_list))
+    add_result("stats (one pass, all)", total_rows, step_time_s)
+    #the same again with other NIC bins: the days' cached NIC histograms give the new bins without reading the data again
+    set_NIC_bins(benchmark_rebinned_NIC_bin_edges, benchmark_NIC_colors[:len(benchmark_rebinned_NIC_bin_edges) - 1])
+    _, step_time_s = time_step(lambda: process_ADS_B_data.get_date_range_statistics(dates_list))
+    add_result("stats (new NIC bins)", total_rows, step_time_s)
+    set_NIC_bins(benchmark_NIC_bin_edges, benchmark_NIC_colors)
+
+    #the maps are saved in a temporary outputs folder, so the user's maps are not replaced
+    with tempfile.TemporaryDirectory() as maps_parent_directory:
+        os.makedirs(os.path.join(maps_parent_directory, "outputs"))
+        original_parent_dir = process_ADS_B_data.parent_dir
+        process_ADS_B_data.parent_dir = maps_parent_directory
+        try:
+            if len(full_day_gdf) <= step_row_limits["map (raw)"]:
+                _, step_time_s = time_step(lambda: process_ADS_B_data.plot_gdf_folium_map(full_day_gdf.copy(), key = "raw"))
+                add_result("map (raw)", len(full_day_gdf), step_time_s)
+            else:
+                add_result("map (raw)", len(full_day_gdf), None)
+            if len(averaged_gdf) <= step_row_limits["map (averaged)"]:
+                _, step_time_s = time_step(lambda: process_ADS_B_data.plot_gdf_folium_map(averaged_gdf.copy(), key = "averaged"))
+                add_result("map (averaged)", len(averaged_gdf), step_time_s)
+            else:
+                add_result("map (averaged)", len(averaged_gdf), None)
+        finally:
+            process_ADS_B_data.parent_dir = original_parent_dir
+    return results
+
+'''
+Run the processing benchmark at each scale and save the results
+#INPUTS: scales (optional), list of ints, data scales to run (multiples of base_num_flights)
+        results_file_path (optional), string, json file to save the results to. None saves them in benchmark_results_directory,
+            named after the time of the run
+#OUTPUT: dictionary of the results (as saved), and prints each step as it finishes
+'''
+def run_benchmark(scales = benchmark_scales, results_file_path = None):
+    set_NIC_bins(benchmark_NIC_bin_edges, benchmark_NIC_colors)
+    start_date = process_ADS_B_data.convert_to_datetime(benchmark_start_date)
+    dates_list = process_ADS_B_data.make_date_list(start_date, start_date + pd.Timedelta(days = benchmark_num_days - 1))
+    run_time = datetime.now(timezone.utc)
+    benchmark_results = {"code version": get_code_version(), "run time (UTC)": run_time.isoformat(timespec="seconds"),
+                         "python": sys.version.split()[0], "platform": platform.platform(), "num CPUs": os.cpu_count(),
+                         "settings": {"base_num_flights": base_num_flights, "num_days": benchmark_num_days,
+                                      "sampling_rate_min": benchmark_sampling_rate_min, "step_row_limits": step_row_limits},
+                         "results": []}
+
+    original_data_directory = ADS_B_storage.ADS_B_data_directory
+    original_result_cache_directory = result_cache.result_cache_directory
+    try:
+        for scale in scales:
+            with tempfile.TemporaryDirectory() as data_directory: #a fresh folder for each scale, with its own result cache
+                ADS_B_storage.ADS_B_data_directory = data_directory
+                result_cache.result_cache_directory = os.path.join(data_directory, "cache")
+                result_cache.cache_size_bytes = None
+                benchmark_results["results"] += run_scale(scale, dates_list)
+    finally:
+        ADS_B_storage.ADS_B_data_directory = original_data_directory
+        result_cache.result_cache_directory = original_result_cache_directory
+        result_cache.cache_size_bytes = None
+
+    if results_file_path == None:
+        os.makedirs(benchmark_results_directory, exist_ok=True)
+        results_file_path = os.path.join(benchmark_results_directory, "processing_" + run_time.strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(results_file_path, "w") as file:
+        json.dump(benchmark_results, file, indent=1)
+    print("Results saved to", results_file_path)
+    return benchmark_results
+
+'''
+Compare two benchmark runs step by step, to find the steps that got slower
+#INPUTS: baseline_file_path, string, json file of the earlier run
+        results_file_path, string, json file of the later run
+        tolerance (optional), float, a step is flagged when it takes this fraction longer than in the baseline (0.2 is 20 %)
+#OUTPUT: DataFrame with the time of each step in both runs and their ratio, and prints it
+'''
+def compare_benchmark_results(baseline_file_path, results_file_path, tolerance = 0.2):
+    runs_dfs = []
+    for file_path in [baseline_file_path, results_file_path]:
+        with open(file_path, "r") as file:
+            runs_dfs.append(pd.DataFrame(json.load(file)["results"]).set_index(["scale", "step"])["seconds"])
+    comparison_df = pd.concat(runs_dfs, axis=1, keys=["baseline s", "new s"]).dropna()
+    comparison_df["new / baseline"] = (comparison_df["new s"] / comparison_df["baseline s"]).round(2)
+    comparison_df["slower"] = comparison_df["new / baseline"] > 1 + tolerance
+    print(comparison_df.to_string())
+    return comparison_df
+
+
+if __name__ == "__main__":
+    run_benchmark()
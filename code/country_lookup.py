@@ -0,0 +1,323 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script finds the country that each ADS-B point is in. The country borders are loaded only once per process and
+#are shared by the downloading script and any script that reprocesses saved data
+#Each country also has a small integer code, its place in countries_list.pkl (see get_country_codes), that the day files keep
+#next to the country names, so the rows of a country can be found without comparing names
+
+import os
+import math
+import threading #the download threads all share the same borders
+import numpy as np
+import pandas as pd
+
+#geo data and maps
+import geopandas as gpd
+import shapely
+
+#Get the directory of this script and the one above it (the main folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#the Natural Earth admin 0 map that holds the borders of the 258 countries
+country_map_directory = os.path.join(parent_dir, "maps", "ne_10m_admin_0_countries", "ne_10m_admin_0_countries.shp")
+
+#these are filled in the first time they are needed, then reused for every time slice
+country_borders_gdf = None
+country_borders_tree = None
+country_borders_lock = threading.Lock() #makes sure only one thread loads the map
+#prepared geometries are not safe to use from several threads at once, so every thread prepares its own copy of the borders
+country_borders_thread_data = threading.local()
+
+#Optional lookup raster: a lat/long grid where every cell holds the country it is fully inside of. Only points in cells that cross a
+#border get the exact polygon test. The raster is built once from the country map and saved next to the other maps
+country_raster_cell_size = 0.25 #degrees
+country_raster_directory = os.path.join(parent_dir, "maps", "country_lookup_raster")
+country_raster = None #dictionary with the raster, filled in the first time it is needed
+country_raster_lock = threading.Lock()
+#codes in the raster for cells that are not inside one country
+RASTER_NO_COUNTRY = -1 #the cell does not touch any country (ocean)
+RASTER_BORDER = -2 #the cell crosses a border or coast, needs the exact test
+#points closer than this (as a fraction of a cell) to the edge of their cell also get the exact test, so floating point
+#rounding when finding the cell can never change the answer
+RASTER_EDGE_TOLERANCE = 1e-6
+#the 258 country names, in the order of their codes
+countries_list_file_path = os.path.join(script_dir, "countries_list.pkl")
+#code of the observations that are not over a country (or over a country that is not in countries_list.pkl)
+NO_COUNTRY_CODE = -1
+#these are filled in the first time they are needed (see get_country_names)
+country_names_by_code = None
+country_codes_by_name = None
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Load the country borders the first time this is called and keep them for the rest of the process.
+The borders are put in a STRtree (a spatial index of the polygon bounding boxes) so points only get compared against
+the few countries whose boxes they fall in
+#OUTPUT: the GeoDataFrame of countries with the "ADMIN" (country name) and geometry columns, and the STRtree of their geometries
+'''
+def get_country_borders():
+    global country_borders_gdf
+    global country_borders_tree
+
+    with country_borders_lock:
+        if country_borders_gdf is None: #only load the map once
+            borders_gdf = gpd.read_file(country_map_directory) # Load the shapefile - makes GeoDataFrame
+            borders_gdf = borders_gdf[["ADMIN", "geometry"]]
+            borders_gdf = borders_gdf.to_crs("EPSG:4326") #same CRS as the ADS-B data
+            borders_gdf = borders_gdf.reset_index(drop=True) #tree indeces are the row number, so make sure they line up
+
+            country_borders_tree = shapely.STRtree(np.asarray(borders_gdf.geometry.values)) #querying the tree is safe from any thread
+            country_borders_gdf = borders_gdf
+    return country_borders_gdf, country_borders_tree
+
+'''
+Get this thread's own copy of the country polygons, prepared. Prepared geometries make repeated containment tests much faster,
+but GEOS builds their internal index the first time they are used, which crashes if two threads do it at the same time
+#OUTPUT: numpy array of prepared shapely polygons, in the same order as the STRtree geometries
+'''
+def get_prepared_country_geometries():
+    if not hasattr(country_borders_thread_data, "geometries"): #first time this thread needs them
+        borders_gdf, borders_tree = get_country_borders()
+        thread_geometries = shapely.from_wkb(shapely.to_wkb(borders_tree.geometries)) #a copy not shared with any other thread
+        shapely.prepare(thread_geometries)
+        country_borders_thread_data.geometries = thread_geometries
+    return country_borders_thread_data.geometries
+
+'''
+Find the country each point falls in. Gives the same result as a left gpd.sjoin with predicate="within" against the
+country borders, without rebuilding the spatial index on every call.
+#INPUT: latitudes, list or array of latitudes in degrees
+        longitudes, list or array of longitudes in degrees, same length as latitudes
+        use_raster (optional), boolean, True to look most points up in the country raster (same result, faster for many points)
+#OUTPUT: numpy array (dtype object) with the country name of each point, or NaN if the point is not in any country (i.e. over the ocean)
+        if two countries overlap a point, the first country in the shapefile is kept
+'''
+def get_country_names_for_points(latitudes, longitudes, use_raster = False):
+    if use_raster:
+        return get_country_names_for_points_from_raster(latitudes, longitudes)
+    return get_country_names_for_points_exact(latitudes, longitudes)
+
+'''
+Find the country each point falls in with the exact point-in-polygon test against the borders
+#INPUT: latitudes, list or array of latitudes in degrees
+        longitudes, list or array of longitudes in degrees, same length as latitudes
+#OUTPUT: numpy array (dtype object) with the country name of each point, or NaN if the point is not in any country
+'''
+def get_country_names_for_points_exact(latitudes, longitudes):
+    borders_gdf, borders_tree = get_country_borders()
+    longitudes = np.asarray(longitudes, dtype=float)
+    latitudes = np.asarray(latitudes, dtype=float)
+    points = shapely.points(longitudes, latitudes) #(x, y) is (long, lat)
+
+    #every (point, country) pair where the point is in the bounding box of the country
+    point_indeces, country_indeces = borders_tree.query(points)
+    #keep the pairs where the point is really within the country. contains_xy uses the prepared polygons, which is much faster than
+    #a query with predicate="within" (that one prepares the points instead). A point within a polygon is the same as the polygon containing it
+    is_within = shapely.contains_xy(get_prepared_country_geometries()[country_indeces], longitudes[point_indeces], latitudes[point_indeces])
+    point_indeces = point_indeces[is_within]
+    country_indeces = country_indeces[is_within]
+
+    country_names = np.full(len(points), np.nan, dtype=object) #NaN for points not in any country, as sjoin does
+    if len(point_indeces) > 0:
+        #sort the pairs by point and then by country, and keep the first country for every point
+        sort_order = np.lexsort((country_indeces, point_indeces))
+        point_indeces = point_indeces[sort_order]
+        country_indeces = country_indeces[sort_order]
+        first_of_point = np.r_[True, point_indeces[1:] != point_indeces[:-1]]
+        country_names[point_indeces[first_of_point]] = borders_gdf["ADMIN"].values[country_indeces[first_of_point]]
+    return country_names
+
+
+#----------------------------Country lookup raster------------------------------------
+'''
+Get a stamp of the country map file, so a saved raster can be rebuilt if the map changes
+#OUTPUT: list of [file size in bytes, modification time] of the country shapefile
+'''
+def get_country_map_stamp():
+    file_stats = os.stat(country_map_directory)
+    return [file_stats.st_size, file_stats.st_mtime]
+
+'''
+Get the file path of the saved raster for a cell size
+#INPUT: cell_size, float, size of the raster cells in degrees
+#OUTPUT: file path as a string. Example: ".../maps/country_lookup_raster/country_raster_0.25deg.npz"
+'''
+def get_country_raster_file_path(cell_size):
+    return os.path.join(country_raster_directory, "country_raster_" + str(cell_size) + "deg.npz")
+
+'''
+Build the lookup raster from the country borders. Every cell gets the index of the country (in the shapefile) that contains the
+whole cell, RASTER_NO_COUNTRY if no country touches the cell, or RASTER_BORDER if the cell crosses a border or a coast.
+Built one row of latitude at a time to keep memory low.
+#INPUT: cell_size, float, size of the raster cells in degrees
+#OUTPUT: dictionary with the "codes" 2D array (rows are latitude from -90, columns longitude from -180), the country "names"
+        in the order of the codes, the "cell_size", and the "map_stamp" of the country map used to build it
+'''
+def build_country_raster(cell_size = country_raster_cell_size):
+    borders_gdf, borders_tree = get_country_borders()
+    border_geometries = get_prepared_country_geometries()
+
+    num_lat_cells = math.ceil(180 / cell_size)
+    num_long_cells = math.ceil(360 / cell_size)
+    raster_codes = np.full((num_lat_cells, num_long_cells), RASTER_NO_COUNTRY, dtype=np.int16)
+    long_edges = -180 + np.arange(num_long_cells) * cell_size #left edge of every column
+
+    for row in range(num_lat_cells):
+        lat_edge = -90 + row * cell_size #bottom edge of the row
+        cells = shapely.box(long_edges, lat_edge, long_edges + cell_size, lat_edge + cell_size)
+        cell_indeces, country_indeces = borders_tree.query(cells) #every country whose bounding box touches each cell
+        #keep the countries that really touch the cell (uses the prepared polygons, like get_country_names_for_points_exact)
+        touches_cell = shapely.intersects(border_geometries[country_indeces], cells[cell_indeces])
+        cell_indeces = cell_indeces[touches_cell]
+        country_indeces = country_indeces[touches_cell]
+        if len(cell_indeces) == 0: #whole row is ocean
+            continue
+        num_countries_touching = np.bincount(cell_indeces, minlength=num_long_cells)
+        #contains_properly means the whole cell (edges included) is in the inside of the country
+        inside_country = shapely.contains_properly(border_geometries[country_indeces], cells[cell_indeces])
+
+        raster_codes[row, num_countries_touching > 0] = RASTER_BORDER #anything touched by a country is a border cell ...
+        is_single_country_cell = inside_country & (num_countries_touching[cell_indeces] == 1)
+        raster_codes[row, cell_indeces[is_single_country_cell]] = country_indeces[is_single_country_cell] #... unless it is fully inside one
+
+    return {"codes": raster_codes, "names": borders_gdf["ADMIN"].to_numpy(dtype=object), "cell_size": cell_size,
+            "map_stamp": get_country_map_stamp()}
+
+'''
+Load the country raster, building and saving it first if there is no saved raster or the country map has changed since it was saved
+#INPUT: cell_size, float, size of the raster cells in degrees
+#OUTPUT: the raster dictionary (see build_country_raster)
+'''
+def get_country_raster(cell_size = country_raster_cell_size):
+    global country_raster
+
+    with country_raster_lock:
+        if country_raster is None or country_raster["cell_size"] != cell_size: #only load or build once
+            raster = None
+            raster_file_path = get_country_raster_file_path(cell_size)
+            if os.path.exists(raster_file_path):
+                saved_raster = np.load(raster_file_path)
+                if list(saved_raster["map_stamp"]) == get_country_map_stamp(): #only use it if the map is the same one it was built from
+                    raster = {"codes": saved_raster["codes"], "names": saved_raster["names"].astype(object), "cell_size": cell_size,
+                              "map_stamp": list(saved_raster["map_stamp"])}
+            if raster is None:
+                print("Building the country lookup raster. This only happens once.")
+                raster = build_country_raster(cell_size)
+                os.makedirs(country_raster_directory, exist_ok=True)
+                np.savez_compressed(raster_file_path, codes=raster["codes"], names=raster["names"].astype(str), map_stamp=np.array(raster["map_stamp"]))
+            country_raster = raster
+    return country_raster
+
+'''
+Find the country each point falls in using the country raster. The country of most points is found with a single array index
+into the raster; the points in border cells (or very near the edge of their cell) get the exact polygon test.
+The result is the same as get_country_names_for_points_exact (see validate_country_raster)
+#INPUT: latitudes, list or array of latitudes in degrees
+        longitudes, list or array of longitudes in degrees, same length as latitudes
+#OUTPUT: numpy array (dtype object) with the country name of each point, or NaN if the point is not in any country
+'''
+def get_country_names_for_points_from_raster(latitudes, longitudes):
+    raster = get_country_raster()
+    raster_codes = raster["codes"]
+    cell_size = raster["cell_size"]
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+
+    #position of each point in the raster in units of cells
+    lat_position = (latitudes + 90) / cell_size
+    long_position = (longitudes + 180) / cell_size
+    row_indeces = np.floor(lat_position)
+    col_indeces = np.floor(long_position)
+    #points near the edge of a cell, or off the raster (lat = 90, long = 180, or NaN), get the exact test
+    near_edge = ((lat_position - row_indeces < RASTER_EDGE_TOLERANCE) | (lat_position - row_indeces > 1 - RASTER_EDGE_TOLERANCE) |
+                 (long_position - col_indeces < RASTER_EDGE_TOLERANCE) | (long_position - col_indeces > 1 - RASTER_EDGE_TOLERANCE))
+    off_raster = ~((row_indeces >= 0) & (row_indeces < raster_codes.shape[0]) & (col_indeces >= 0) & (col_indeces < raster_codes.shape[1]))
+    row_indeces = np.where(off_raster, 0, row_indeces).astype(np.intp)
+    col_indeces = np.where(off_raster, 0, col_indeces).astype(np.intp)
+
+    point_codes = raster_codes[row_indeces, col_indeces]
+    #names array with two NaNs on the end, so code -1 (no country) and -2 (border) index to NaN
+    names_with_no_country = np.concatenate([raster["names"], np.array([np.nan, np.nan], dtype=object)])
+    country_names = names_with_no_country[point_codes]
+
+    needs_exact_test = (point_codes == RASTER_BORDER) | near_edge | off_raster
+    if needs_exact_test.any():
+        country_names[needs_exact_test] = get_country_names_for_points_exact(latitudes[needs_exact_test], longitudes[needs_exact_test])
+    return country_names
+
+'''
+Validation mode for the country raster. Looks up points with both the raster and the exact polygon test and checks they agree.
+By default it uses random points over the whole globe, points on the raster cell edges, and points on every country border vertex
+#INPUT: latitudes (optional), array of latitudes to check, for example a day of ADS-B data. None makes the test points described above
+        longitudes (optional), array of longitudes, same length as latitudes
+        num_random_points (optional), int, number of random points to add when no points are given
+#OUTPUT: the number of points where the raster and the exact test disagree (should be 0). Prints out a summary
+'''
+def validate_country_raster(latitudes = None, longitudes = None, num_random_points = 1000000):
+    if latitudes is None or longitudes is None:
+        random_generator = np.random.default_rng(0)
+        cell_size = get_country_raster()["cell_size"]
+        borders_gdf, borders_tree = get_country_borders()
+        border_vertices = shapely.get_coordinates(borders_tree.geometries) #(long, lat) of every border vertex
+        #points exactly on the edges of the raster cells
+        edge_lats = -90 + cell_size * random_generator.integers(0, math.ceil(180 / cell_size), num_random_points // 10)
+        edge_longs = -180 + cell_size * random_generator.integers(0, math.ceil(360 / cell_size), num_random_points // 10)
+        latitudes = np.concatenate([random_generator.uniform(-90, 90, num_random_points), edge_lats,
+                                    random_generator.uniform(-90, 90, len(edge_longs)), border_vertices[:, 1]])
+        longitudes = np.concatenate([random_generator.uniform(-180, 180, num_random_points), random_generator.uniform(-180, 180, len(edge_lats)),
+                                     edge_longs, border_vertices[:, 0]])
+
+    raster_names = get_country_names_for_points_from_raster(latitudes, longitudes)
+    exact_names = get_country_names_for_points_exact(latitudes, longitudes)
+    #NaN != NaN, so compare with the NaNs filled in
+    num_mismatches = int((pd.Series(raster_names).fillna("").to_numpy() != pd.Series(exact_names).fillna("").to_numpy()).sum())
+    print(f"Country raster validation: {len(latitudes)} points checked, {num_mismatches} mismatches.")
+    return num_mismatches
+
+
+#----------------------------Country codes------------------------------------
+'''
+Get the names of the countries in the order of their codes, loaded from countries_list.pkl the first time this is called.
+A few names in the list were saved with their accents garbled (Curacao and Sao Tome and Principe): they are given as in the
+country map, and the garbled names get the same codes, so both can be looked up
+#INPUT: none
+#OUTPUT: list of the 258 country names, the code of a country is its place in the list
+'''
+def get_country_names():
+    global country_names_by_code, country_codes_by_name
+    if country_names_by_code == None:
+        saved_country_names = pd.read_pickle(countries_list_file_path)
+        repaired_country_names = []
+        for country_name in saved_country_names:
+            try: #the garbled names are UTF-8 bytes that were read as cp437
+                repaired_country_names.append(country_name.encode("cp437").decode("utf-8"))
+            except (UnicodeEncodeError, UnicodeDecodeError): #already right
+                repaired_country_names.append(country_name)
+        country_codes_by_name = {country_name: code for code, country_name in enumerate(saved_country_names)}
+        country_codes_by_name.update({country_name: code for code, country_name in enumerate(repaired_country_names)})
+        country_names_by_code = repaired_country_names
+    return country_names_by_code
+
+'''
+Get the code of a country
+#INPUT: country_name, string
+#OUTPUT: the code as an int, or None if the country is not in countries_list.pkl
+'''
+def get_country_code(country_name):
+    get_country_names()
+    return country_codes_by_name.get(country_name)
+
+'''
+Get the codes of the countries of many observations at once
+#INPUT: country_names, pandas Categorical or Series of the country names (or any list of names, which is made into a Categorical first)
+#OUTPUT: int16 numpy array of the country codes, NO_COUNTRY_CODE for the observations with no country or a country not in the list
+'''
+def get_country_codes(country_names):
+    get_country_names()
+    country_names = pd.Categorical(country_names)
+    #look up each distinct name once. The last code is for the missing names (code -1 in the Categorical)
+    codes_of_names = np.array([country_codes_by_name.get(country_name, NO_COUNTRY_CODE) for country_name in country_names.categories]
+                              + [NO_COUNTRY_CODE], dtype=np.int16)
+    return codes_of_names[country_names.codes]
@@ -0,0 +1,129 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script keeps the custom polygons (the shape files in maps/custom_polygons) ready to check which observations fall inside them.
+#A polygon is read from its shape file only once, then kept in memory until one of its files changes (see get_custom_polygon).
+#Its shapes are "prepared" by shapely, so checking many points against them is quick.
+#Points are checked in two steps, both over whole arrays at once: first a cheap check against the lat/long bounding box of each
+#shape, which drops most of the world's observations, then the exact point-in-polygon check on the few that are left.
+#A point exactly on the edge of a shape is not inside it, like the "within" spatial join this replaces.
+#The downloaded days also keep which custom polygons each observation is in (see ADS_B_storage.get_custom_region_row_filter),
+#so most region queries don't check any point at all. The checksum of each polygon (see get_custom_polygon_sha256) tells
+#which of those are out of date after a polygon is added or changed.
+
+import os
+import hashlib
+import numpy as np
+import geopandas as gpd
+import shapely
+
+#Get the directory of this script and the one above it (the main folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#folder the custom polygons are saved in
+custom_polygons_directory = os.path.join(parent_dir, "maps", "custom_polygons")
+#polygons already read, by name: (stamp of their files, see get_custom_polygon_files_stamp, polygon dictionary, see read_custom_polygon)
+loaded_custom_polygons = {}
+#checksums of the polygons already computed, by name and stamp of their files
+custom_polygon_checksums = {}
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Get the path of a custom polygon's shape file
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: file path as a string
+'''
+def get_custom_polygon_path(custom_polygon):
+    return os.path.join(custom_polygons_directory, custom_polygon + ".shp")
+
+'''
+Get the files of a custom polygon: the .shp file and the files next to it with the same name (.shx, .dbf, .prj...)
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: list of file paths
+'''
+def get_custom_polygon_file_paths(custom_polygon):
+    polygon_directory, polygon_file_name = os.path.split(get_custom_polygon_path(custom_polygon))
+    polygon_name = os.path.splitext(polygon_file_name)[0]
+    return [os.path.join(polygon_directory, f) for f in os.listdir(polygon_directory) if os.path.splitext(f)[0] == polygon_name]
+
+'''
+Get the names of all the custom polygons saved in maps/custom_polygons
+#INPUT: none
+#OUTPUT: sorted list of names (the shp file names without .shp), i.e. ["Baltic", "Black Sea", "East Med"]
+'''
+def get_custom_polygon_names():
+    if not os.path.isdir(custom_polygons_directory):
+        return []
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(custom_polygons_directory) if f.endswith(".shp"))
+
+'''
+Get a stamp of a custom polygon's files that changes when any of them is changed, added or removed
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: tuple of (file name, size, modification time) of each file
+'''
+def get_custom_polygon_files_stamp(custom_polygon):
+    files_stamp = []
+    for file_path in sorted(get_custom_polygon_file_paths(custom_polygon)):
+        file_status = os.stat(file_path)
+        files_stamp.append((os.path.basename(file_path), file_status.st_size, file_status.st_mtime_ns))
+    return tuple(files_stamp)
+
+'''
+Get the checksum of the content of a custom polygon's files. It is only computed again when one of the files changes
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: SHA-256 checksum as a string, of the names and contents of the files together
+'''
+def get_custom_polygon_sha256(custom_polygon):
+    files_stamp = get_custom_polygon_files_stamp(custom_polygon)
+    if (custom_polygon, files_stamp) not in custom_polygon_checksums: #new or changed polygon
+        checksum = hashlib.sha256()
+        for file_name, _, _ in files_stamp:
+            with open(os.path.join(custom_polygons_directory, file_name), "rb") as file:
+                checksum.update(file_name.encode("utf-8") + b":" + hashlib.sha256(file.read()).digest() + b";")
+        custom_polygon_checksums[(custom_polygon, files_stamp)] = checksum.hexdigest()
+    return custom_polygon_checksums[(custom_polygon, files_stamp)]
+
+'''
+Read a custom polygon from its shape file and get it ready to check points against
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: dictionary: "shapes" (numpy array of the prepared shapely shapes of the file, in lat/long, EPSG:4326),
+        "bounding_boxes" (numpy array of the min long, min lat, max long, max lat of each shape)
+'''
+def read_custom_polygon(custom_polygon):
+    polygon_gdf = gpd.read_file(get_custom_polygon_path(custom_polygon)) # Load the shapefile - makes Geo Data Frame
+    polygon_gdf = polygon_gdf.to_crs("EPSG:4326") #same coordinates as the observations (see ADS_B_storage.add_geometry)
+    shapes = polygon_gdf.geometry.to_numpy()
+    shapes = shapes[~(shapely.is_missing(shapes) | shapely.is_empty(shapes))] #skip the empty shapes
+    shapely.prepare(shapes)
+    return {"shapes": shapes, "bounding_boxes": shapely.bounds(shapes).reshape(-1, 4)}
+
+'''
+Get a custom polygon ready to check points against. It is only read from its shape file the first time, or after its files change
+#INPUT: custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: polygon dictionary, see read_custom_polygon
+'''
+def get_custom_polygon(custom_polygon):
+    files_stamp = get_custom_polygon_files_stamp(custom_polygon)
+    if custom_polygon not in loaded_custom_polygons or loaded_custom_polygons[custom_polygon][0] != files_stamp: #new or changed polygon
+        loaded_custom_polygons[custom_polygon] = (files_stamp, read_custom_polygon(custom_polygon))
+    return loaded_custom_polygons[custom_polygon][1]
+
+'''
+Check which points are inside a custom polygon (inside any of the shapes of its file)
+#INPUTS: latitudes, longitudes, numpy arrays of the points, in degrees
+        custom_polygon, string, name of the shp file in maps/custom_polygons
+#OUTPUT: boolean numpy array, True for the points inside the polygon
+'''
+def get_points_in_custom_polygon(latitudes, longitudes, custom_polygon):
+    polygon = get_custom_polygon(custom_polygon)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    is_in_polygon = np.zeros(len(latitudes), dtype=bool)
+    for shape, (min_long, min_lat, max_long, max_lat) in zip(polygon["shapes"], polygon["bounding_boxes"]):
+        #only the points in the shape's bounding box (and not already found inside another shape) get the exact check
+        is_in_bounding_box = ((latitudes >= min_lat) & (latitudes <= max_lat) & (longitudes >= min_long) & (longitudes <= max_long)
+                              & ~is_in_polygon)
+        candidate_rows = np.flatnonzero(is_in_bounding_box)
+        is_in_polygon[candidate_rows] = shapely.contains_xy(shape, longitudes[candidate_rows], latitudes[candidate_rows])
+    return is_in_polygon
@@ -2,20 +2,37 @@
 #Written with occasional help from Chat GPT from OpenAI
 #This script helps download, clean, and save data form ADS_B exchange
 import pandas as pd
+import numpy as np
 import os
 
 #for file handling
 import json
+import gzip #some of the ADS-B files are compressed
+try: #optional, faster json parsing. The standard json package is used if it is not installed
+    import orjson
+except ImportError:
+    orjson = None
 import re #reject code
-import pickle as pkl
+import math
 
 #geo data and maps
-import geopandas as gpd
+import country_lookup #finds the country of each point, shared with the other scripts
+import ADS_B_storage #reads and writes the saved data, shared with the other scripts
+import ADS_B_fetch #downloads with timeouts, retries and a limit on the request rate
 
 #for online links
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
+#for concurrent downloads
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import threading
+import queue
+import time
+import collections
+
 #for dates
 from dateutil import parser
 from datetime import timedelta
@@ -27,6 +44,32 @@ os.chdir(script_dir) #doesn't get called unless you run this file as a stand alo
 #get the directory one above this one (the main folder)
 parent_dir = os.path.dirname(script_dir)
 
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#where the historical data is online: one folder per day (i.e. .../readsb-hist/2024/01/01/) with one file per time slice.
+#Change it to download from a mirror, or from the local stand-in server (see ADS_B_stand_in_server.py) to test offline
+online_data_url = "https://samples.adsbexchange.com/readsb-hist"
+#number of time slices downloaded at the same time. Set to 1 to download one slice after another
+num_download_workers = 8
+#True to find the country of each point with the precomputed country raster (see country_lookup.py). Same result, faster for busy slices
+use_country_raster = False
+#how the download runs: "threads" downloads and converts the slices with the same threads, over all the days at once.
+#"pipeline" downloads with threads and converts with one process per core, over all the days at once (see download_ADSB_data_pipelined)
+download_mode = "threads"
+#pipeline mode only: number of processes converting the downloaded slices, and the most downloaded slices waiting to be converted
+num_conversion_processes = os.cpu_count()
+pipeline_queue_size = 32
+#how the time slices of a day are found: "index" reads the day's page online (once, it is then kept in the day's folder),
+#"generate" makes the file names straight from the sampling rate without the page, and a slice that is not online (404) is skipped
+slice_listing_mode = "index"
+#name of the file, in each day's folder, that keeps the list of the day's time slice files online
+online_index_file_name = "ADS_B_online_index.json"
+
+#state of the download that is running, see DAY SCHEDULING below
+cancel_download_event = threading.Event()
+download_progress = {}
+download_progress_lock = threading.Lock()
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
 #---------------START WORKER FUNCTIONS---------------
 '''
 #Function that takes a date in non dateutil and converts it and returns it as a dateutil object
@@ -80,112 +123,161 @@ It is added the main directory.
 def local_directory_for_date(date):
     extension_string = os.path.join(str(date.year), "{:02}".format(date.month), "{:02}".format(date.day)) #will work for any system os
     return(extension_string)
+
+'''
+Make a requests session that keeps its connections to the server alive between downloads, so every time slice
+does not have to open a new connection. The session can be shared by all download threads.
+#INPUT: num_workers, int, the number of threads that will use the session at the same time
+#OUTPUT: requests.Session object with a connection pool big enough for all the workers
+'''
+def get_http_session(num_workers):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=num_workers, pool_maxsize=num_workers) #one kept-alive connection per worker
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 #---------------END WORKER FUNCTIONS---------------
 
 
 '''
-Translate the ADS-B .json file to a GeoDataFrame and keep the parameters we want
-#INPUTS: local_json_file_path - full file path to the .json file we want to convert on our system
-#OUTPUTS: returns the GeoDataFrame. Columns are hardcoded within this function. Geometry is also added after convertin to GDF.
+Parse the text of a json file. Uses the orjson package if it is installed (it is several times faster for the big
+time slice files), otherwise the json package from the standard library
+#INPUT: json_bytes, the bytes (or string) of the json file
+#OUTPUT: the loaded json, a dictionary for the ADS-B files
 '''
-def get_GeoDataFrame_from_json(local_json_file_path):
-    time_df_rows = []   # Create an empty list to store the data from each flight in the time slice
+def load_json(json_bytes):
+    if orjson != None:
+        return orjson.loads(json_bytes)
+    return json.loads(json_bytes)
 
-    with open(local_json_file_path, "r", encoding="utf-8") as file: #open the .json file
-        loaded_tracking_data = json.load(file) #returns a dictionary with the json objects within it
-        for aircraft in loaded_tracking_data.get("aircraft", []): #for each flight - these are saved under an "aircraft" key
-            #Sometimes the data is stored within a last position key. Try withouth, but if KeyError is thrown
-            #that means it is stored within a subkey. Try that next. 
-            try:
-                information_to_add= [
-                    aircraft["lat"], #lat
-                    aircraft["lon"], #long
-                    aircraft["nic"], # NIC
-                    aircraft["rc"], #rc
-                    aircraft["flight"] #get flight number
-                ]
-                time_df_rows.append(information_to_add) #add current data to saved rows
-            except KeyError: #if exception is thrown
-                try: #try last position key 
-                    information_to_add= [
-                        aircraft["lastPosition"]["lat"], #lat
-                        aircraft["lastPosition"]["lon"], #long
-                        aircraft["lastPosition"]["nic"], # NIC
-                        aircraft["lastPosition"]["rc"], #rc
-                        aircraft["lastPosition"]["flight"] #flight number
-                    ]
-                    time_df_rows.append(information_to_add)
-                except KeyError: #if no last position info or missing flight number, just move on
-                    continue   
-    #create DataFrame from the list we've gathered with specified headers
-    ADSB_data_headers= ["Latitude (deg)", "Longitude (deg)", "NIC", "R_C (m)", "Flight Number"] #in the order we added information above
-    ADSB_data_df = pd.DataFrame(time_df_rows, columns = ADSB_data_headers)
-
-    #create a geo data frame that adds a geometry column. Note that (x, y) are in the form of (long, lat)
-    #note that this will add fifth column named 'geometry'. Also set the CRS
-    ADSB_data_gdf = gpd.GeoDataFrame(ADSB_data_df, geometry=gpd.points_from_xy(ADSB_data_df[ADSB_data_headers[1]], ADSB_data_df[ADSB_data_headers[0]]), crs="EPSG:4326")
+#keys of the aircraft information we keep, in the order of the columns
+ADSB_json_keys = ("lat", "lon", "nic", "rc", "flight")
+ADSB_data_headers = ["Latitude (deg)", "Longitude (deg)", "NIC", "R_C (m)", "Flight Number"]
 
-    #Now let's add a column of the country that the point is in
-    country_map_directory = os.path.join(parent_dir, "maps", "ne_10m_admin_0_countries", "ne_10m_admin_0_countries.shp") #get country map directory 
-    countries_land_borders_gdf = gpd.read_file(country_map_directory) # Load the shapefile - makes GeoDataFrame
-    countries_land_borders_gdf = countries_land_borders_gdf[["ADMIN", "geometry"]]
-    countries_land_borders_gdf = countries_land_borders_gdf.to_crs(ADSB_data_gdf.crs) #ensure the country gdf has the same CRS as our data
+'''
+Check if an aircraft (or its lastPosition) dictionary has all the keys we keep
+#INPUT: dictionary of the aircraft from the json
+#OUTPUT: True if all of ADSB_json_keys are in the dictionary, False otherwise
+'''
+def has_all_ADSB_keys(dictionary):
+    #chained "in" checks are faster than a set comparison on the keys
+    return "lat" in dictionary and "lon" in dictionary and "nic" in dictionary and "rc" in dictionary and "flight" in dictionary
+
+'''
+Pull the columns we keep out of a loaded ADS-B time slice, straight into typed column arrays.
+Sometimes the data is stored within a "lastPosition" key. That is used when the aircraft itself does not have all the keys.
+Aircraft without all the keys in either place are skipped. This is checked on the keys directly instead of catching a
+KeyError for every aircraft, and the columns are made one at a time instead of going through a list of rows
+#INPUTS: loaded_tracking_data, the dictionary of the time slice json, with the flights under an "aircraft" key
+#OUTPUTS: dictionary of numpy arrays, one for each of ADSB_data_headers: float lat/long, int NIC and R_C, and flight number strings
+'''
+def get_ADSB_columns_from_json_data(loaded_tracking_data):
+    #for each aircraft, the dictionary that has all the keys: the aircraft itself or its lastPosition
+    position_sources = []
+    for aircraft in loaded_tracking_data.get("aircraft", []):
+        if has_all_ADSB_keys(aircraft):
+            position_sources.append(aircraft)
+        else:
+            last_position = aircraft.get("lastPosition")
+            if last_position is not None and has_all_ADSB_keys(last_position):
+                position_sources.append(last_position)
+
+    columns = {}
+    for key, header, dtype in zip(ADSB_json_keys, ADSB_data_headers, [np.float64, np.float64, np.int64, np.int64, object]):
+        values = [source[key] for source in position_sources]
+        try:
+            columns[header] = np.array(values, dtype=dtype)
+        except TypeError: #a null in the json for an integer column, keep as float so it becomes NaN
+            columns[header] = np.array(values, dtype=np.float64)
+    return columns
 
-    #let's compare and add country ot the gdf in the pickle
-    #Perform a spatial join to find which country each point falls into
-    joined_gdf = gpd.sjoin(ADSB_data_gdf, countries_land_borders_gdf, how="left", predicate="within")
-    #remove the index column that is added by only keeping original columns and the newly added ADMIN column with the names
-    ADSB_data_gdf = joined_gdf[ADSB_data_gdf.columns.tolist() + ["ADMIN"]]  
-    ADSB_data_gdf = ADSB_data_gdf.rename(columns={"ADMIN": "Country Name"}) #rename ADMIN column with country names
+'''
+ADS-B Exchange names its files .json.gz, but many of them are not actually compressed. Decompress the bytes of a time slice
+only if they really are gzip (gzip data always starts with the two bytes 1f 8b), otherwise return them as they are
+#INPUT: payload_bytes, bytes of the downloaded (or saved) time slice file
+#OUTPUT: bytes of the json text
+'''
+def decode_time_slice_payload(payload_bytes):
+    if payload_bytes[:2] == b"\x1f\x8b": #gzip magic number
+        return gzip.decompress(payload_bytes)
+    return payload_bytes
 
-    #return the geo data frame 
-    return ADSB_data_gdf
+'''
+Translate the bytes of an ADS-B time slice to a DataFrame and keep the parameters we want, including the country of each point.
+No geometry is made here; it is only needed when the data is processed (see ADS_B_storage.add_geometry)
+#INPUTS: payload_bytes, bytes of the time slice, either the json text or gzip compressed json
+#OUTPUTS: returns the DataFrame with the ADS-B data headers and a "Country Name" column
+'''
+def get_DataFrame_from_json_bytes(payload_bytes):
+    loaded_tracking_data = load_json(decode_time_slice_payload(payload_bytes)) #returns a dictionary with the json objects within it
+    #create DataFrame from the columns of the flights we kept
+    ADSB_data_df = pd.DataFrame(get_ADSB_columns_from_json_data(loaded_tracking_data), columns = ADSB_data_headers)
+
+    #Now let's add a column of the country that the point is in
+    #the country borders and their spatial index are loaded once and shared by every time slice (see country_lookup.py)
+    ADSB_data_df["Country Name"] = country_lookup.get_country_names_for_points(ADSB_data_df[ADSB_data_headers[0]], ADSB_data_df[ADSB_data_headers[1]],
+                                                                               use_raster = use_country_raster)
+    return ADSB_data_df
 
 '''
-Given a filepath to a .json ADSB file, convert to a geo data frame and save as a pkl
-#INPUT: local_json_file_path, full filepath of the .json file we want to convert on the system
-#OUTPUT: converst all json to pkl, also adds an extra folder to the directory for supp files
+Translate the bytes of an ADS-B time slice to a GeoDataFrame and keep the parameters we want
+#INPUTS: payload_bytes, bytes of the time slice, either the json text or gzip compressed json
+#OUTPUTS: returns the GeoDataFrame. Columns are hardcoded within this function. Geometry is also added after convertin to GDF.
 '''
-def convert_ADSB_json_to_pkl(local_json_file_path):
-    time_df = get_GeoDataFrame_from_json(local_json_file_path) #convert to dataframe and only keep relevant parameters for our analysis
-    
-    #save pkl in place of json
-    pkl_file_path = os.path.splitext(local_json_file_path)[0] + ".pkl"  #get rid of the .json ending and replace with pkl
-    time_df.to_pickle(pkl_file_path) #save data frame as pkl - I believe this overwrites if file exists
-    os.remove(local_json_file_path) #delete .json file #note this command is taking longer than expected - slowing processes down
+def get_GeoDataFrame_from_json_bytes(payload_bytes):
+    ADSB_data_gdf = ADS_B_storage.add_geometry(get_DataFrame_from_json_bytes(payload_bytes))
+    #keep the original column order: the ADS-B data, the geometry, then the country
+    return ADSB_data_gdf[ADSB_data_headers + ["geometry", "Country Name"]]
 
-    #print out that we have downloaded the file
-    #split and rejoin parts as they appear in directory with backslashes for just the directory that is deeper
-    print(f"Downloaded: ", "\\".join(pkl_file_path.split("\\")[-5:])) 
+'''
+Translate the ADS-B .json file to a GeoDataFrame and keep the parameters we want
+#INPUTS: local_json_file_path - full file path to the .json (or .json.gz) file we want to convert on our system
+#OUTPUTS: returns the GeoDataFrame. Columns are hardcoded within this function. Geometry is also added after convertin to GDF.
+'''
+def get_GeoDataFrame_from_json(local_json_file_path):
+    with open(local_json_file_path, "rb") as file: #open the .json file
+        return get_GeoDataFrame_from_json_bytes(file.read())
 
 '''
-Download a file to a given directory. The function will first download the file as a .json.gz file, get rid of the .gz ending so
-        so we can open the json file (it seems the ADS-B exchange files are not compressed into gz, anyways), keep the relevant data in a 
-        GeoDataFrame, and lastly save that GeoDataFrame to a pkl file in the place of the original json file
+Download the file of a time slice, as it is online
 #INPUTS: online_json_file_url, the url to the .json.gz file as a string. Example: "https://samples.adsbexchange.com/readsb-hist/2021/01/01/140000Z.json.gz"
-        local_save_dir, the local directory to save the file at (this should correspond to a specifc day's folder)
-#OUTPUTS: downloads pkl file of the file attached to the url with selected data
+        session (optional), a requests.Session to reuse open connections. If None, a one-off request is made
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py). If None, there is no limit
+#OUTPUTS: bytes of the downloaded file (it may or may not really be gzip compressed). Failed requests are retried.
+        When the slice names are generated (slice_listing_mode = "generate"), returns None if the file is not online
 '''
-def download_time_file(online_json_file_url, local_save_dir):
+def fetch_time_slice_payload(online_json_file_url, session = None, limiter = None):
+    #the whole file is in memory, a time slice is only a few MB
+    return ADS_B_fetch.fetch_with_retries(online_json_file_url, session = session, limiter = limiter, missing_ok = slice_listing_mode == "generate")
+
+'''
+Convert the downloaded file of a time slice and keep the relevant data, ready to be saved to the day's file
+#INPUTS: online_json_file_url, the url the file was downloaded from (the day and the time slice are taken from it)
+        payload_bytes, bytes of the downloaded file
+#OUTPUTS: the time slice name (i.e. "140000Z"), the pyarrow Table of the time slice data, and the size and checksum of the
+        downloaded file to record in the day's manifest
+'''
+def convert_time_slice_payload(online_json_file_url, payload_bytes):
     #split the online url by the / marker and take the last index which is the name of the file, i.e "140000Z.json.gz"
-    local_filepath_for_saving = os.path.join(local_save_dir, online_json_file_url.split("/")[-1]) 
-    #print("enter")
-    # If the .json.gz file already exists, overwrite it (delete it then write again)
-    if os.path.exists(local_filepath_for_saving):
-        os.remove(local_filepath_for_saving)
-    #open the file and write it to the filepath we've created
-    with requests.get(online_json_file_url, stream=True) as r: #get http request
-        r.raise_for_status() # raise eorr 
-        with open(local_filepath_for_saving, 'wb') as f: #open a new file at the filepath and prepare to write in binary
-            for chunk in r.iter_content(chunk_size=8192): #read the file in small chunks (8192 KB at a time) - minimizes RAM usage
-                f.write(chunk) #write to local file
-    
-    #get rid of the .gz ending
-    new_file_path = os.path.splitext(local_filepath_for_saving)[0]
-    os.rename(local_filepath_for_saving, new_file_path)
-    #print("go convert to pkl")
-    #open up and cleanup file to prepare for working with it and save as pkl
-    convert_ADSB_json_to_pkl(new_file_path)
+    time_slice_name = ADS_B_storage.get_time_slice_name(online_json_file_url.split("/")[-1])
+    time_df = get_DataFrame_from_json_bytes(payload_bytes)
+    time_slice_table = ADS_B_storage.make_time_slice_table(time_df, ADS_B_storage.get_time_slice_time(online_json_file_url))
+    return time_slice_name, time_slice_table, ADS_B_storage.get_download_information(payload_bytes)
+
+'''
+Download a time slice and keep the relevant data, ready to be saved to the day's file.
+The file is decoded in memory, so nothing is written to disk for a single time slice: the whole day is saved at once by
+save_day_if_done (see save_downloaded_day)
+#INPUTS: online_json_file_url, the url to the .json.gz file as a string. Example: "https://samples.adsbexchange.com/readsb-hist/2021/01/01/140000Z.json.gz"
+        session (optional), a requests.Session to reuse open connections. If None, a one-off request is made
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py)
+#OUTPUTS: same as convert_time_slice_payload, or None if the file is not online (see fetch_time_slice_payload)
+'''
+def download_time_file(online_json_file_url, session = None, limiter = None):
+    payload_bytes = fetch_time_slice_payload(online_json_file_url, session, limiter)
+    if payload_bytes == None:
+        return None
+    return convert_time_slice_payload(online_json_file_url, payload_bytes)
 
 '''
 Check if a particular file matches our sampling rate. If so return, True, otherwise False
@@ -205,52 +297,526 @@ def time_on_sampling_interval(online_json_file_name, delta_t_min):
     return False
 
 '''
-Download json files for a particular date
+Get the links to all the time slice files of a day, from the day's page online. The page of a past day does not change, so the
+links are kept in the day's folder the first time (online_index_file_name) and read from there after that
+#INPUTS: online_date_page_url, url to the directory with the .json.gz files. such as: "https://samples.adsbexchange.com/readsb-hist/2021/01/01/"
+        local_save_dir, String, the directory of the day
+        session, a requests.Session
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py)
+#OUTPUTS: list of the links (as they are on the page) of the .json.gz files. Raises a requests RequestException if the page
+        can't be downloaded, after retrying
+'''
+def get_online_index(online_date_page_url, local_save_dir, session, limiter = None):
+    online_index_file_path = os.path.join(local_save_dir, online_index_file_name)
+    if os.path.exists(online_index_file_path):
+        with open(online_index_file_path, "r") as file:
+            return json.load(file)
+
+    #ChatGPT helpful here, Get the HTML content of the page
+    page_content = ADS_B_fetch.fetch_with_retries(online_date_page_url, session = session, limiter = limiter)
+    soup = BeautifulSoup(page_content, 'html.parser') # Parse the HTML
+    # Find all <a> tags and keep the JSON file links
+    online_json_file_links = [link['href'] for link in soup.find_all('a', href=True) if link['href'].endswith(".json.gz")]
+
+    os.makedirs(local_save_dir, exist_ok=True)
+    with open(online_index_file_path + ".partial", "w") as file:
+        json.dump(online_json_file_links, file)
+    os.replace(online_index_file_path + ".partial", online_index_file_path)
+    return online_json_file_links
+
+'''
+Make the file names of the time slices on the sampling rate, without looking at the page online. Time slices are named
+after their time, so these are the names the files have if they are online
+#INPUT: delta_t_min, float or int, sampling rate in minutes
+#OUTPUT: list of file names. Example for 720 min: ["000000Z.json.gz", "120000Z.json.gz"]
+'''
+def generate_time_slice_file_names(delta_t_min):
+    online_json_file_names = []
+    num_time_slices = math.ceil(24 * 60 / delta_t_min)
+    for i in range(num_time_slices):
+        total_seconds = round(i * delta_t_min * 60, 6)
+        if total_seconds != int(total_seconds): #files are only every whole second
+            continue
+        total_seconds = int(total_seconds)
+        online_json_file_names.append("{:02d}{:02d}{:02d}Z.json.gz".format(total_seconds // 3600, total_seconds // 60 % 60, total_seconds % 60))
+    return online_json_file_names
+
+'''
+Get the urls of the time slices of a day that are on the sampling rate, either from the day's page online or generated
+(see slice_listing_mode at the top of this script)
 #INPUTS: online_date_page_url, url to the directory with the .json.gz files. such as: "https://samples.adsbexchange.com/readsb-hist/2021/01/01/"
-        local_save_dir, String, the directory to which to save the .json.gz files
+        local_save_dir, String, the directory of the day
         delta_t_min, float or int, sampling rate in minutes
+        session, a requests.Session
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py)
+#OUTPUTS: list of the urls of the time slices. Raises a requests RequestException if the page can't be downloaded, after retrying
 '''
-def download_json_files_for_date(online_date_page_url, local_save_dir, delta_t_min):
-    try:#ChatGPT helpful here, Get the HTML content of the page
-        response = requests.get(online_date_page_url)
-        response.raise_for_status()  # Ensure the request was successful
-        soup = BeautifulSoup(response.content, 'html.parser') # Parse the HTML
+def get_time_slice_urls_for_date(online_date_page_url, local_save_dir, delta_t_min, session, limiter = None):
+    if slice_listing_mode == "generate":
+        online_json_file_links = generate_time_slice_file_names(delta_t_min)
+    else:
+        online_json_file_links = get_online_index(online_date_page_url, local_save_dir, session, limiter)
+
+    online_json_file_urls = [] #urls of the time slices on our sampling rate
+    for online_json_file_url in online_json_file_links:
+        online_json_file_name = os.path.basename(online_json_file_url) # Extract the filename from the end (base) of the link
+        if time_on_sampling_interval(online_json_file_name, delta_t_min): # Check if the file is on sampling rate
+            if not online_json_file_url.startswith('http'): #If URL doesn't start with HTTP, make absolute
+                online_json_file_url = requests.compat.urljoin(online_date_page_url, online_json_file_url) #not sure what is going on here tbh
+            online_json_file_urls.append(online_json_file_url)
+    return online_json_file_urls
 
-        # Find all <a> tags and check for JSON file links
-        for link in soup.find_all('a', href=True):
-            online_json_file_url = link['href'] #get link name as a string of the json file online
-            online_json_file_name = os.path.basename(online_json_file_url) # Extract the filename from the end (base) of the link
-            if time_on_sampling_interval(online_json_file_name, delta_t_min): # Check if the file is on sampling rate
-                #print("got file on time interval")
-                if not online_json_file_url.startswith('http'): #If URL doesn't start with HTTP, make absolute
-                    online_json_file_url = requests.compat.urljoin(online_date_page_url, online_json_file_url) #not sure what is going on here tbh
-                download_time_file(online_json_file_url, local_save_dir)
-    except requests.exceptions.HTTPError as error:   #if the link does not exist
-        print(f"HTTP error occurred for {online_date_page_url}: {error}")
+'''
+Get the urls of the time slices of a day that still have to be downloaded. Only the time slices that are not saved yet are
+kept (see the day's manifest in ADS_B_storage.py), and a day already downloaded completely at the sampling rate is skipped
+without going online
+#INPUTS: online_date_page_url, url to the directory with the .json.gz files
+        local_save_dir, String, the directory of the day to which to save the data
+        delta_t_min, float or int, sampling rate in minutes
+        session, a requests.Session
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py)
+#OUTPUTS: list of the urls to download, empty if the day is complete. Raises a requests RequestException if the page can't be downloaded
+'''
+def get_time_slice_urls_to_download(online_date_page_url, local_save_dir, delta_t_min, session, limiter = None):
+    #check what an earlier (maybe interrupted) download already saved
+    saved_time_slice_names = set(ADS_B_storage.verify_day_file(local_save_dir))
+    if ADS_B_storage.is_day_complete(local_save_dir, delta_t_min):
+        print("Already downloaded: ", os.path.join(*local_save_dir.split(os.sep)[-3:]), "at a sampling rate of", delta_t_min, "minutes")
+        return []
+    online_json_file_urls = get_time_slice_urls_for_date(online_date_page_url, local_save_dir, delta_t_min, session, limiter)
+
+    #only download what is not saved yet
+    num_time_slices_on_sampling_rate = len(online_json_file_urls)
+    online_json_file_urls = [url for url in online_json_file_urls if ADS_B_storage.get_time_slice_name(url.split("/")[-1]) not in saved_time_slice_names]
+    if len(online_json_file_urls) < num_time_slices_on_sampling_rate:
+        print(f"{num_time_slices_on_sampling_rate - len(online_json_file_urls)} time slices already saved for",
+              os.path.join(*local_save_dir.split(os.sep)[-3:]), f"- downloading the other {len(online_json_file_urls)}")
+    return online_json_file_urls
 
+'''
+Save the downloaded time slices of a day to its file, and mark the day complete if nothing failed
+#INPUTS: local_save_dir, String, the directory of the day
+        delta_t_min, float or int, sampling rate in minutes
+        time_slice_tables, dictionary of time slice name to its pyarrow Table
+        time_slices_information, dictionary of time slice name to what the manifest records about its download
+        any_failed, boolean, True if some time slice (or the day's page) could not be downloaded
+#OUTPUTS: saves the day file and updates the manifest
+'''
+def save_downloaded_day(local_save_dir, delta_t_min, time_slice_tables, time_slices_information, any_failed):
+    #save the whole day at once, one file for the day (see ADS_B_storage.py)
+    if len(time_slice_tables) > 0:
+        ADS_B_storage.write_day_time_slices(local_save_dir, time_slice_tables, time_slices_information)
+    if not any_failed: #every time slice on the sampling rate is saved, a re-run can skip the day
+        ADS_B_storage.mark_day_complete(local_save_dir, delta_t_min)
 
 '''
-Download ADS-B date given dates; either one start date, or start and end date to complete range
+Get the url of the page online with all the time slices of a date
+#INPUT: a dateutil object
+#OUTPUT: url as a string. Example: "https://samples.adsbexchange.com/readsb-hist/2024/01/01/"
+'''
+def get_online_date_page_url(date):
+    return online_data_url + online_path_extension_for_historical_data(date)
+
+'''
+Make the directory a date is saved to, if it is not there yet
+#INPUT: a dateutil object
+#OUTPUT: the directory of the date as a string
+'''
+def make_local_directory_for_date(date):
+    #use date info to save to proper directory - first make directory (this is the ADS-B folder, one directory above)
+    local_saving_dir = ADS_B_storage.get_day_directory(date) #will work for any system os
+    if not os.path.exists(local_saving_dir): #make directory if not created yet
+        os.makedirs(local_saving_dir)
+        print(f"Directory '{local_saving_dir}' created!")
+    else:
+        print(f"Directory '{local_saving_dir}' already exists. Only the missing time slices will be downloaded.")
+    return local_saving_dir
+
+'''
+Get the time slices to download for a date, noting the failure instead of raising it if the date's page can't be downloaded
+#INPUTS: date, dateutil object of the day
+        delta_t_min, float or int, sampling rate in minutes
+        session, a requests.Session
+        limiter (optional), the fetch limiter shared by the download threads (see ADS_B_fetch.py)
+#OUTPUTS: list of the urls to download (see get_time_slice_urls_to_download), and None or the (url, error message) tuple of the failure
+'''
+def list_time_slices_for_date(date, delta_t_min, session, limiter = None):
+    page_url = get_online_date_page_url(date)
+    try:
+        return get_time_slice_urls_to_download(page_url, make_local_directory_for_date(date), delta_t_min, session, limiter), None
+    except Exception as error: #the page could not be downloaded (or the day could not be checked), note it and go on
+        return [], (page_url, str(error))
+
+
+#---------------DAY SCHEDULING---------------
+#Both download modes work on all the dates at once, with one budget of workers. The slices are handed out in date order,
+#so the oldest day is finished first and becomes usable, while the workers that are free already start on the next day.
+#A download can be stopped from another thread with cancel_download() (or with Ctrl+C): what was downloaded is saved,
+#and the next download picks up from there. get_download_progress() gives the progress of each day.
+
+'''
+Stop the download that is running. The time slices downloaded so far are saved (their days are not marked complete)
+#INPUT: none
+#OUTPUT: the download stops as soon as the slices being downloaded are done
+'''
+def cancel_download():
+    cancel_download_event.set()
+
+'''
+Get the progress of each day of the download that is running (or of the last one)
+#INPUT: none
+#OUTPUT: dictionary of date string (i.e. "2024-01-01") to a dictionary with the number of "slices" to download, and how many
+        were "downloaded", "not online" or "failed" so far, and "saved", True once the day's file is saved
+'''
+def get_download_progress():
+    with download_progress_lock:
+        return {date_string: dict(day_progress) for date_string, day_progress in download_progress.items()}
+
+'''
+Start keeping track of a day of the download
+#INPUTS: date, dateutil object of the day
+        online_json_file_urls, list of the urls to download for the day
+        page_failure, None or the (url, error message) tuple if the day's page could not be downloaded
+#OUTPUT: dictionary of what has been gathered for the day so far
+'''
+def start_day(date, online_json_file_urls, page_failure):
+    with download_progress_lock:
+        download_progress[get_date_util_string(date)] = {"slices": len(online_json_file_urls), "downloaded": 0, "not online": 0, "failed": 0, "saved": False}
+    return {"date": date, "directory": ADS_B_storage.get_day_directory(date), "remaining": len(online_json_file_urls),
+            "tables": {}, "information": {}, "any_failed": page_failure != None}
+
+'''
+Add the outcome of one time slice to its day
+#INPUTS: day, see start_day
+        delta_t_min, float or int, sampling rate in minutes
+        download_outputs, the outputs of convert_time_slice_payload, or None if the time slice is not online or failed
+        failed (optional), boolean, True if the time slice could not be downloaded or converted
+#OUTPUT: updates the day and its progress
+'''
+def add_time_slice_to_day(day, delta_t_min, download_outputs, failed = False):
+    day["remaining"] -= 1
+    date_string = get_date_util_string(day["date"])
+    with download_progress_lock:
+        day_progress = download_progress[date_string]
+        if failed:
+            day["any_failed"] = True
+            day_progress["failed"] += 1
+        elif download_outputs == None:
+            day_progress["not online"] += 1
+        else:
+            time_slice_name, time_slice_table, download_information = download_outputs[:3]
+            day["tables"][time_slice_name] = time_slice_table
+            day["information"][time_slice_name] = dict(download_information, sampling_rate_min = delta_t_min)
+            day_progress["downloaded"] += 1
+        num_done = day_progress["downloaded"] + day_progress["not online"] + day_progress["failed"]
+    if download_outputs != None:
+        print("Downloaded: ", download_outputs[0], "for", day["date"].strftime('%Y/%m/%d'), f"({num_done}/{day_progress['slices']})")
+
+'''
+Save a day once all its time slices are in
+#INPUTS: day, see start_day
+        delta_t_min, float or int, sampling rate in minutes
+        cancelled (optional), boolean, True to save what the day has so far because the download was stopped
+#OUTPUT: True if the day was saved (and can be let go), False if it is still waiting for time slices
+'''
+def save_day_if_done(day, delta_t_min, cancelled = False):
+    if day["remaining"] > 0 and not cancelled:
+        return False
+    save_downloaded_day(day["directory"], delta_t_min, day["tables"], day["information"], day["any_failed"] or day["remaining"] > 0)
+    with download_progress_lock:
+        download_progress[get_date_util_string(day["date"])]["saved"] = True
+    if len(day["tables"]) > 0:
+        print("Saved: ", len(day["tables"]), "time slices for", day["date"].strftime('%Y/%m/%d'))
+    return True
+
+'''
+Get ready for a new download: clear the progress and any earlier cancellation
+#INPUT: none
+#OUTPUT: resets the download state
+'''
+def reset_download_state():
+    cancel_download_event.clear()
+    with download_progress_lock:
+        download_progress.clear()
+
+'''
+Download ADS-B date given dates; either one start date, or start and end date to complete range.
+The dates are listed one after another in the background, and num_workers threads download the slices of all the dates,
+oldest day first (see DAY SCHEDULING above), so the workers never wait for a day to finish before starting on the next
 INPUTS: delta_t_min, sampling rate in minutes (float or int - but int makes more sense)
         dates_list, date util list of dates data is being downloaded for
-OUTPUTS: downloads ADS-B json files into directories for dates
+        num_workers (optional), int, number of time slices to download at the same time
+OUTPUTS: downloads ADS-B json files into directories for dates. Returns a list of (url, error message) tuples of failed downloads
 '''
-def download_ADSB_data(delta_t_min, dates_list):
-    #for each date, go through and scrape data from the proper link 
-    for date in dates_list: 
-        #Create the proper link for each date
-        page_url = "https://samples.adsbexchange.com/readsb-hist" + online_path_extension_for_historical_data(date)  
-        
-        #use date info to save to proper directory - first make directory (this is the ADS-B folder, one directory above)
-        local_saving_dir = os.path.join(parent_dir, "ADS_B_Data", local_directory_for_date(date)) #will work for any system os
-        if not os.path.exists(local_saving_dir): #make directory if not created yet
-            os.makedirs(local_saving_dir)
-            print(f"Directory '{local_saving_dir}' created!")
-        else:
-            print(f"Directory '{local_saving_dir}' already exists. Overwriting.")
+def download_ADSB_data(delta_t_min, dates_list, num_workers = num_download_workers):
+    reset_download_state()
+    session = get_http_session(num_workers + 1) #one connection pool for the whole download so connections stay open between dates
+    limiter = ADS_B_fetch.make_fetch_limiter(num_workers) #one request budget for the whole download
+    failed_downloads = []
+
+    #list the dates one after another, in the background. This runs ahead of the downloads, so the next date is always ready
+    list_executor = ThreadPoolExecutor(max_workers=1)
+    listing_futures = [list_executor.submit(list_time_slices_for_date, date, delta_t_min, session, limiter) for date in dates_list]
+    download_executor = ThreadPoolExecutor(max_workers=num_workers)
+    waiting_time_slices = collections.deque() #(day index, url) in date order, handed to the workers oldest day first
+    downloads = {} #download future to its (day index, url)
+    days = {} #day index to what has been gathered for the day so far
+    num_days_listed = 0
+    try:
+        while num_days_listed < len(dates_list) or len(waiting_time_slices) > 0 or len(downloads) > 0:
+            if cancel_download_event.is_set():
+                break
+            #take in the dates that are listed, in date order
+            while num_days_listed < len(dates_list) and listing_futures[num_days_listed].done():
+                online_json_file_urls, page_failure = listing_futures[num_days_listed].result()
+                days[num_days_listed] = start_day(dates_list[num_days_listed], online_json_file_urls, page_failure)
+                waiting_time_slices.extend((num_days_listed, url) for url in online_json_file_urls)
+                if page_failure != None:
+                    failed_downloads.append(page_failure)
+                if save_day_if_done(days[num_days_listed], delta_t_min): #nothing to download for the day
+                    del days[num_days_listed]
+                num_days_listed += 1
+
+            #keep every worker busy
+            while len(waiting_time_slices) > 0 and len(downloads) < num_workers:
+                day_index, online_json_file_url = waiting_time_slices.popleft()
+                downloads[download_executor.submit(download_time_file, online_json_file_url, session, limiter)] = (day_index, online_json_file_url)
+
+            #wait for a slice (or the next date's list) and gather what is done
+            futures_to_wait_for = list(downloads) + listing_futures[num_days_listed:num_days_listed + 1]
+            done_futures = wait(futures_to_wait_for, timeout = 0.5, return_when = FIRST_COMPLETED)[0]
+            for future in [future for future in done_futures if future in downloads]:
+                day_index, online_json_file_url = downloads.pop(future)
+                try:
+                    add_time_slice_to_day(days[day_index], delta_t_min, future.result()) #raises the exception from the worker if there was one
+                except Exception as error: #keep going with the other slices, just note the failure
+                    failed_downloads.append((online_json_file_url, str(error)))
+                    add_time_slice_to_day(days[day_index], delta_t_min, None, failed = True)
+                if save_day_if_done(days[day_index], delta_t_min):
+                    del days[day_index] #free the day's data
+    except KeyboardInterrupt:
+        cancel_download_event.set()
+    finally:
+        list_executor.shutdown(wait = True, cancel_futures = True)
+        download_executor.shutdown(wait = True, cancel_futures = True)
+        session.close()
+
+    if cancel_download_event.is_set(): #save what the unfinished days have, with the slices that finished while stopping
+        print("Download cancelled. Saving the time slices downloaded so far.")
+        for future, (day_index, online_json_file_url) in downloads.items():
+            if future.done() and not future.cancelled() and future.exception() == None:
+                add_time_slice_to_day(days[day_index], delta_t_min, future.result())
+        for day in days.values():
+            save_day_if_done(day, delta_t_min, cancelled = True)
+    print("Requests: " + ADS_B_fetch.get_fetch_summary(limiter))
+    return failed_downloads
+
+
+#---------------PIPELINE MODE---------------
+#The download is split in stages that run at the same time, each with its own workers:
+#   list: one thread gets the time slices to download for each day, one day after another
+#   fetch: num_workers threads download the slices (network bound) and put them in a queue of at most pipeline_queue_size slices.
+#          When the queue is full they wait, so downloads never get far ahead of the conversion and memory stays bounded
+#   convert: one process per core reads the json, finds the countries and makes the table of each slice (CPU bound)
+#   write: the main process saves each day to its file as soon as all its slices are converted
+#The slices are fetched oldest day first, like in the threads mode (see DAY SCHEDULING above)
 
-        #go online and get data using download function 
-        download_json_files_for_date(page_url, local_saving_dir, delta_t_min)
+'''
+Get a conversion process ready before the download starts, by loading what every slice needs (the country borders)
+#INPUT: none used, so it can be mapped over the processes
+#OUTPUT: the process id
+'''
+def preload_conversion_process(_ = None):
+    country_lookup.get_country_borders()
+    if use_country_raster:
+        country_lookup.get_country_raster()
+    return os.getpid()
+
+'''
+Convert a downloaded time slice in a conversion process, and time it
+#INPUTS: online_json_file_url, payload_bytes, see convert_time_slice_payload
+#OUTPUTS: the outputs of convert_time_slice_payload, and the time it took in seconds
+'''
+def convert_time_slice_payload_timed(online_json_file_url, payload_bytes):
+    start_time = time.perf_counter()
+    conversion_outputs = convert_time_slice_payload(online_json_file_url, payload_bytes)
+    return conversion_outputs + (time.perf_counter() - start_time,)
+
+'''
+Print how much work each stage of the pipeline did and how fast
+#INPUTS: stage_stats, dictionary of stage name to a dictionary with "slices", "bytes", "busy_s" (time its workers spent working,
+            added over the workers) and "workers"
+        wall_time_s, float, time the whole download took in seconds
+#OUTPUT: prints a table, one row per stage
+'''
+def print_pipeline_stats(stage_stats, wall_time_s):
+    stats_rows = []
+    for stage, stats in stage_stats.items():
+        stats_rows.append({"stage": stage, "workers": stats["workers"], "slices": stats["slices"], "MB": round(stats["bytes"] / 1e6, 1),
+                           "slices/s": round(stats["slices"] / wall_time_s, 2), "MB/s": round(stats["bytes"] / 1e6 / wall_time_s, 2),
+                           "busy %": round(100 * stats["busy_s"] / (wall_time_s * stats["workers"]), 1)})
+    print(f"\nPipeline throughput over {wall_time_s:.1f} s:")
+    print(pd.DataFrame(stats_rows).to_string(index=False))
+    print(f"Fetch workers waited {stage_stats['fetch']['queue_wait_s']:.1f} s in total for room in the queue (waiting on the conversion)")
+
+'''
+Download ADS-B data for a list of dates with the pipeline described above: the network and all the cores are kept busy at the
+same time, over all the dates. Like download_ADSB_data, only the time slices that are not saved yet are downloaded
+#INPUTS: delta_t_min, sampling rate in minutes (float or int)
+        dates_list, date util list of dates data is being downloaded for
+        num_workers (optional), int, number of time slices to download at the same time
+        num_processes (optional), int, number of processes converting the slices
+        queue_size (optional), int, most downloaded slices waiting to be converted
+#OUTPUTS: saves one Parquet file per day. Returns a list of (url, error message) tuples of failed downloads
+'''
+def download_ADSB_data_pipelined(delta_t_min, dates_list, num_workers = num_download_workers, num_processes = num_conversion_processes,
+                                 queue_size = pipeline_queue_size):
+    start_time = time.perf_counter()
+    reset_download_state()
+    session = get_http_session(num_workers + 1) #the fetch threads and the list thread
+    limiter = ADS_B_fetch.make_fetch_limiter(num_workers) #one request budget shared by the list and fetch threads
+    payload_queue = queue.Queue(maxsize = queue_size) #messages from the list and fetch stages to the main process
+    stats_lock = threading.Lock()
+    stage_stats = {"list": {"workers": 1, "slices": 0, "bytes": 0, "busy_s": 0.0},
+                   "fetch": {"workers": num_workers, "slices": 0, "bytes": 0, "busy_s": 0.0, "queue_wait_s": 0.0},
+                   "convert": {"workers": num_processes, "slices": 0, "bytes": 0, "busy_s": 0.0},
+                   "write": {"workers": 1, "slices": 0, "bytes": 0, "busy_s": 0.0}}
+
+    #processes are forked where possible: a new "spawn" process would run the script that started the download again
+    process_context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    process_pool = ProcessPoolExecutor(max_workers = num_processes, mp_context = process_context)
+    #start the processes before any thread is running, and load the country borders in each
+    list(process_pool.map(preload_conversion_process, range(num_processes)))
+    fetch_pool = ThreadPoolExecutor(max_workers = num_workers)
+    stop_event = threading.Event() #set if the main process stops early, so no thread is left waiting on the queue
+
+    #pass a message on to the main process, waiting while the queue is full. Returns False if the download was stopped
+    def put_message(message):
+        while not stop_event.is_set():
+            try:
+                payload_queue.put(message, timeout = 0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    #fetch stage: download one slice and pass it on
+    def fetch(day_index, online_json_file_url):
+        fetch_start_time = time.perf_counter()
+        try:
+            payload_bytes = fetch_time_slice_payload(online_json_file_url, session, limiter)
+            if payload_bytes == None: #not online (only when the slice names are generated)
+                payload_bytes = b""
+                message = ("missing", day_index, online_json_file_url, None)
+            else:
+                message = ("fetched", day_index, online_json_file_url, payload_bytes)
+        except Exception as error:
+            payload_bytes = b""
+            message = ("failed", day_index, online_json_file_url, str(error))
+        put_start_time = time.perf_counter()
+        put_message(message)
+        with stats_lock:
+            stage_stats["fetch"]["slices"] += len(payload_bytes) > 0
+            stage_stats["fetch"]["bytes"] += len(payload_bytes)
+            stage_stats["fetch"]["busy_s"] += put_start_time - fetch_start_time
+            stage_stats["fetch"]["queue_wait_s"] += time.perf_counter() - put_start_time
+
+    #list stage: find what to download for each day, and hand the slices to the fetch threads
+    def list_days():
+        for day_index, date in enumerate(dates_list):
+            list_start_time = time.perf_counter()
+            online_json_file_urls, page_failure = list_time_slices_for_date(date, delta_t_min, session, limiter)
+            message = ("listed", day_index, online_json_file_urls, page_failure)
+            stage_stats["list"]["slices"] += len(online_json_file_urls)
+            stage_stats["list"]["busy_s"] += time.perf_counter() - list_start_time
+            if not put_message(message): #always before the day's slices, so the main process knows how many to expect
+                return
+            for online_json_file_url in online_json_file_urls:
+                fetch_pool.submit(fetch, day_index, online_json_file_url)
+        put_message(("all listed",))
+
+    failed_downloads = []
+    days = {} #day index to what has been gathered for the day so far
+    conversions = {} #conversion future to its (day index, url)
+    all_listed = False
+
+    #write stage: save a day once all its slices are in
+    def write_day_if_done(day_index, cancelled = False):
+        day = days[day_index]
+        write_start_time = time.perf_counter()
+        if not save_day_if_done(day, delta_t_min, cancelled):
+            return
+        stage_stats["write"]["slices"] += len(day["tables"])
+        stage_stats["write"]["bytes"] += sum(table.nbytes for table in day["tables"].values())
+        stage_stats["write"]["busy_s"] += time.perf_counter() - write_start_time
+        del days[day_index] #free the day's data
+
+    def gather_conversion(future):
+        day_index, online_json_file_url = conversions.pop(future)
+        try:
+            conversion_outputs = future.result()
+            add_time_slice_to_day(days[day_index], delta_t_min, conversion_outputs)
+            stage_stats["convert"]["slices"] += 1
+            stage_stats["convert"]["bytes"] += conversion_outputs[2]["source_bytes"]
+            stage_stats["convert"]["busy_s"] += conversion_outputs[3]
+        except Exception as error: #keep going with the other slices, just note the failure
+            failed_downloads.append((online_json_file_url, str(error)))
+            add_time_slice_to_day(days[day_index], delta_t_min, None, failed = True)
+        write_day_if_done(day_index)
+
+    list_thread = threading.Thread(target = list_days, daemon = True)
+    list_thread.start()
+    try:
+        while not all_listed or len(days) > 0:
+            if cancel_download_event.is_set():
+                break
+            #gather the finished conversions, and wait for one if enough are already running (this keeps memory bounded too)
+            if len(conversions) >= 2 * num_processes:
+                wait(list(conversions), return_when = FIRST_COMPLETED)
+            for future in [future for future in conversions if future.done()]:
+                gather_conversion(future)
+            try:
+                message = payload_queue.get(timeout = 0.05)
+            except queue.Empty:
+                continue
+
+            if message[0] == "all listed":
+                all_listed = True
+            elif message[0] == "listed":
+                day_index, online_json_file_urls, page_failure = message[1:]
+                days[day_index] = start_day(dates_list[day_index], online_json_file_urls, page_failure)
+                if page_failure != None:
+                    failed_downloads.append(page_failure)
+                write_day_if_done(day_index) #nothing to download for the day
+            elif message[0] == "failed":
+                day_index, online_json_file_url, error = message[1:]
+                failed_downloads.append((online_json_file_url, error))
+                add_time_slice_to_day(days[day_index], delta_t_min, None, failed = True)
+                write_day_if_done(day_index)
+            elif message[0] == "missing": #not online, nothing to save
+                add_time_slice_to_day(days[message[1]], delta_t_min, None)
+                write_day_if_done(message[1])
+            else: #fetched, send to a conversion process
+                day_index, online_json_file_url, payload_bytes = message[1:]
+                conversions[process_pool.submit(convert_time_slice_payload_timed, online_json_file_url, payload_bytes)] = (day_index, online_json_file_url)
+    except KeyboardInterrupt:
+        cancel_download_event.set()
+    finally:
+        stop_event.set()
+        fetch_pool.shutdown(wait = True, cancel_futures = True)
+        process_pool.shutdown(wait = True, cancel_futures = True)
+        session.close()
+
+    if cancel_download_event.is_set(): #save what the unfinished days have
+        print("Download cancelled. Saving the time slices downloaded so far.")
+        for future in [future for future in conversions if future.done() and not future.cancelled()]:
+            gather_conversion(future)
+        for day_index in list(days):
+            write_day_if_done(day_index, cancelled = True)
+
+    print_pipeline_stats(stage_stats, time.perf_counter() - start_time)
+    print("Requests: " + ADS_B_fetch.get_fetch_summary(limiter))
+    return failed_downloads
 
 '''
 Main function to be called by other script with inputs to download data 
@@ -258,9 +824,11 @@ Main function to be called by other script with inputs to download data
         end, date util start date for data download or None
         series, a list of dates in date util objects for download or None
         sampling_rate, dampling rate (int or float) in minutes 
-#OUTPUT: downlaods data to directories as pkl files
+        num_workers (optional), int, number of time slices to download at the same time. 1 downloads one after another
+        mode (optional), string, "threads" or "pipeline" (see download_mode at the top of this script)
+#OUTPUT: downlaods data to directories as one Parquet file per day
 '''
-def main(start, end, series, sampling_rate):
+def main(start, end, series, sampling_rate, num_workers = num_download_workers, mode = download_mode):
     '''
     Run checks to ensure date inputs match format
     '''
@@ -294,13 +862,23 @@ def main(start, end, series, sampling_rate):
         #check sampling rate is given
         if sampling_rate ==None: #if no sampling rate
             raise ValueError("You need to input a sampling rate. None currently selected.")
+        if mode not in ["threads", "pipeline"]:
+            raise ValueError("Download mode must be either 'threads' or 'pipeline'.")
 
         return True, date_description, dates_to_process,  #send back result of checks, date. we get here if no exceptions raised
     
     check_bool, date_desciprition, dates_to_process = run_checks() 
     if(check_bool):
         print("Downloading ADS-B data for " + date_desciprition, " at a sampling rate of ", sampling_rate, " minutes. \n")    
-        download_ADSB_data(sampling_rate, dates_to_process)
+        if mode == "pipeline":
+            failed_downloads = download_ADSB_data_pipelined(sampling_rate, dates_to_process, num_workers = num_workers)
+        else:
+            failed_downloads = download_ADSB_data(sampling_rate, dates_to_process, num_workers = num_workers)
+        #report what went wrong all at once, instead of in between the download messages
+        if len(failed_downloads) > 0:
+            print(f"\n{len(failed_downloads)} download(s) failed:")
+            for url, error in failed_downloads:
+                print(f"    {url}: {error}")
         print("Download complete.")
 
 
@@ -321,17 +899,17 @@ def test_download():
 '''
 INPUTS: date_string, a string of a date to see contents for (make sure you have it downloaded - can use above function)
     this will check for 000000Z time on that day
-OUTPUTS: shows sample pkl file contents for a day
+OUTPUTS: shows sample time slice contents for a day
 '''
 def test_show_downloaded(date_string):
     #test final result 
     date = convert_to_datetime(date_string)
-    filepath = os.path.join(parent_dir, "ADS_B_Data", str(date.year), "{:02}".format(date.month), "{:02}".format(date.day), "000000Z.pkl")
-    with open(filepath, 'rb') as file:
-        data = pkl.load(file)
-        print("Let's show the final data store din the pkl file: \n", filepath)
-        print(data, "\n")
-        print("The type of the file stored in the pkl file is: ", type(data))
+    day_directory = ADS_B_storage.get_day_directory(date)
+    time_slice_tables = dict(ADS_B_storage.read_day_time_slice_tables(day_directory))
+    data = ADS_B_storage.add_geometry(time_slice_tables["000000Z"].to_pandas())
+    print("Let's show the final data stored for 000000Z in the day file: \n", ADS_B_storage.get_day_file_path(day_directory))
+    print(data, "\n")
+    print("The type of the data is: ", type(data))
 
 '''
 Can uncomment the next two lines to run test. Careful, though, because if you uncomment them they will try to run
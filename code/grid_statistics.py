@@ -0,0 +1,192 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script sums up ADS-B observations over a lat/long grid, for the averaged map and for analysis of where jamming happens.
+#Each cell is centered at a multiple of the bin size and holds the points up to half a bin on each side, INCLUSIVE ON THE RIGHT,
+#EXCLUSIVE ON THE LEFT (see round_right_inclusive_array).
+#The result is a "grid cube": for each cell with data, the number of observations at each NIC value (0 to 11) and the number
+#of distinct flights. NIC is always a whole number, so these counts give the exact count, min, mean, percentiles and the fraction
+#of jammed observations of the cell, for any threshold, without going back to the observations.
+#A cube is made in one pass over the observations (no sorting, no loop over the points or over the whole grid), takes
+#about 50 bytes per cell with data, and can be saved to a small Parquet file and read back (see write_grid_cube).
+#Cubes of the same grid add up (see merge_grid_cubes), so a date range is gridded one day at a time: only one day of
+#observations and one cube are in memory at once, however long the range. The distinct flights of a cell are those of each day,
+#summed over the days: a flight seen in a cell on 3 days counts 3 times (the "Daily Distinct Flights" of get_grid_cube_statistics).
+
+import json
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+#columnar storage
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#NIC values go from 0 to 11
+num_NIC_values = 12
+#observations at or below this NIC are counted as likely jammed (see the README)
+jamming_NIC_threshold = 6
+#percentiles of the NIC of each cell given by get_grid_cube_statistics
+grid_percentiles = [10, 50, 90]
+#key in the Parquet file metadata that keeps the bin sizes of a saved cube
+GRID_CUBE_METADATA_KEY = b"grid_cube"
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Round numbers to the nearest integer, rounding 0.5 down, for a whole array at once.
+The numbers are first rounded to 9 decimals, so a value that is a half in theory but not quite in floating point
+(i.e. 0.05/0.1 = 0.5000000000000001) still rounds down. This is what let the cells break for bin sizes below 0.25 deg
+#INPUT: nums, numpy array of floats
+#OUTPUT: numpy array of the rounded values, int64
+'''
+def round_right_inclusive_array(nums):
+    return np.ceil(np.round(nums, 9) - 0.5).astype(np.int64)
+
+'''
+Get the number of columns (cells along the longitude) of the grid. Cells are numbered row by row
+#INPUT: long_bin_size, float, width of the cells in degrees
+#OUTPUT: int
+'''
+def get_num_grid_columns(long_bin_size):
+    return int(round_right_inclusive_array(np.array([360 / long_bin_size]))[0]) + 1
+
+'''
+Find the cell of each point. Since a cell is centered at every multiple of the bin size and zero, dividing and rounding the
+degrees gives the INDEX of the cell: [row, column] = [lat, long]. The cell number is row * number of columns + column
+#INPUTS: latitudes, longitudes, numpy arrays of degrees
+        lat_bin_size, long_bin_size, floats, size of the cells in degrees
+#OUTPUT: numpy array of the cell number of each point, int64
+'''
+def get_cell_numbers(latitudes, longitudes, lat_bin_size, long_bin_size):
+    row_indexes = round_right_inclusive_array((np.asarray(latitudes, dtype=np.float64) + 90) / lat_bin_size)
+    column_indexes = round_right_inclusive_array((np.asarray(longitudes, dtype=np.float64) + 180) / long_bin_size)
+    return row_indexes * get_num_grid_columns(long_bin_size) + column_indexes
+
+'''
+Get the lat/long of the center of cells
+#INPUTS: cell_numbers, numpy array of cell numbers (see get_cell_numbers)
+        lat_bin_size, long_bin_size, floats, size of the cells in degrees
+#OUTPUTS: numpy arrays of the latitudes and longitudes of the cell centers
+'''
+def get_cell_centers(cell_numbers, lat_bin_size, long_bin_size):
+    num_columns = get_num_grid_columns(long_bin_size)
+    return (cell_numbers // num_columns) * lat_bin_size - 90, (cell_numbers % num_columns) * long_bin_size - 180
+
+'''
+Make the grid cube of a set of observations. Observations without a lat/long, or with a NIC outside 0 to 11 (i.e. missing), are
+left out, like in NIC_histograms.make_NIC_histogram, so both count the same observations
+#INPUTS: NIC_data_frame, DataFrame or GeoDataFrame with lat, long, NIC in its first three columns, and the flight numbers in its
+            fifth column (as saved, see ADS_B_storage.ADSB_data_headers)
+        lat_bin_size, long_bin_size, floats, size of the cells in degrees
+#OUTPUT: dictionary: "lat_bin_size", "long_bin_size", "cells" (int64 array of the cell numbers with data),
+        "NIC_counts" (uint32 array, one row per cell, the number of observations at each NIC 0 to 11),
+        "distinct_flights" (uint32 array, number of different flights seen in each cell. In a cube of several days, see
+            merge_grid_cubes, the number of each day summed over the days)
+'''
+def make_grid_cube(NIC_data_frame, lat_bin_size, long_bin_size):
+    headers = NIC_data_frame.columns
+    latitudes = NIC_data_frame[headers[0]].to_numpy(dtype=np.float64, na_value=np.nan)
+    longitudes = NIC_data_frame[headers[1]].to_numpy(dtype=np.float64, na_value=np.nan)
+    NIC_values = NIC_data_frame[headers[2]].to_numpy(dtype=np.float64, na_value=np.nan)
+    is_valid = np.isfinite(latitudes) & np.isfinite(longitudes) & (NIC_values >= 0) & (NIC_values < num_NIC_values) #NaN fails every comparison
+    cell_numbers = get_cell_numbers(latitudes[is_valid], longitudes[is_valid], lat_bin_size, long_bin_size)
+    NIC_values = NIC_values[is_valid].astype(np.int64)
+    #number the cells that have data 0, 1, 2... in the order they are seen. factorize hashes the values, it does not sort them
+    cell_of_each_point, cells = pd.factorize(cell_numbers, sort=False)
+    NIC_counts = np.bincount(cell_of_each_point * num_NIC_values + NIC_values, minlength=len(cells) * num_NIC_values)
+
+    #distinct flights: keep one observation per (cell, flight) pair, then count the pairs of each cell. Points without a flight number are not counted
+    if len(headers) > 4:
+        flight_codes = pd.factorize(NIC_data_frame[headers[4]].to_numpy()[is_valid], sort=False, use_na_sentinel=True)[0]
+    else: #no flight numbers
+        flight_codes = np.full(len(cell_numbers), -1)
+    has_flight = flight_codes >= 0
+    num_flight_codes = int(flight_codes.max()) + 1 if has_flight.any() else 1
+    cell_flight_pairs = pd.unique(cell_of_each_point[has_flight].astype(np.int64) * num_flight_codes + flight_codes[has_flight])
+    distinct_flights = np.bincount(cell_flight_pairs // num_flight_codes, minlength=len(cells))
+
+    #put the cells in order, row by row (there are far fewer cells than points, so this is quick)
+    cell_order = np.argsort(cells)
+    return {"lat_bin_size": lat_bin_size, "long_bin_size": long_bin_size, "cells": np.asarray(cells, dtype=np.int64)[cell_order],
+            "NIC_counts": NIC_counts.reshape(len(cells), num_NIC_values)[cell_order].astype(np.uint32),
+            "distinct_flights": distinct_flights[cell_order].astype(np.uint32)}
+
+'''
+Get the statistics of each cell of a grid cube
+#INPUTS: grid_cube, see make_grid_cube
+        NIC_threshold (optional), int, observations at or below this NIC are counted as jammed
+        percentiles (optional), list of the NIC percentiles to give (0 to 100). A percentile is the lowest NIC value that at least
+            that percent of the cell's observations are at or below
+#OUTPUT: GeoDataFrame, one row per cell: lat, long of the center, "Observations", "Daily Distinct Flights" (the distinct flights
+        of each day summed over the days of the cube, i.e. the distinct flights for a single day), "Min NIC", "Mean NIC",
+        "Fraction NIC <= threshold", one "NIC pXX" column per percentile, and the point geometry of the center
+'''
+def get_grid_cube_statistics(grid_cube, NIC_threshold = jamming_NIC_threshold, percentiles = grid_percentiles):
+    NIC_counts = grid_cube["NIC_counts"].astype(np.int64)
+    cumulative_counts = np.cumsum(NIC_counts, axis=1)
+    num_observations = cumulative_counts[:, -1]
+    NIC_values = np.arange(num_NIC_values)
+
+    latitudes, longitudes = get_cell_centers(grid_cube["cells"], grid_cube["lat_bin_size"], grid_cube["long_bin_size"])
+    statistics = {"Latitude (deg)": latitudes, "Longitude (deg)": longitudes, "Observations": num_observations,
+                  "Daily Distinct Flights": grid_cube["distinct_flights"].astype(np.int64),
+                  "Min NIC": np.argmax(NIC_counts > 0, axis=1), #first NIC value with observations
+                  "Mean NIC": NIC_counts @ NIC_values / np.maximum(num_observations, 1),
+                  f"Fraction NIC <= {NIC_threshold}": cumulative_counts[:, min(NIC_threshold, num_NIC_values - 1)] / np.maximum(num_observations, 1)}
+    for percentile in percentiles:
+        #first NIC value where the share of the observations at or below it reaches the percentile
+        statistics[f"NIC p{percentile}"] = np.argmax(cumulative_counts * 100 >= percentile * num_observations[:, None], axis=1)
+    statistics_df = pd.DataFrame(statistics)
+    return gpd.GeoDataFrame(statistics_df, geometry=gpd.points_from_xy(statistics_df["Longitude (deg)"], statistics_df["Latitude (deg)"]), crs="EPSG:4326")
+
+'''
+Add up grid cubes of the same grid, i.e. the cubes of several days into the cube of the date range. The NIC counts of a cell
+are summed, so its count, min, mean, percentiles and fraction jammed are exactly those of all the observations together.
+The distinct flights are summed too, so they are NOT the distinct flights of the whole range: a flight seen in a cell on several
+of the days is counted once for each of those days (the cubes do not keep which flights they saw)
+#INPUT: grid_cubes, list of grid cubes (see make_grid_cube), all with the same bin sizes
+#OUTPUT: the merged grid cube, cells in order
+'''
+def merge_grid_cubes(grid_cubes):
+    lat_bin_size, long_bin_size = grid_cubes[0]["lat_bin_size"], grid_cubes[0]["long_bin_size"]
+    for grid_cube in grid_cubes:
+        if grid_cube["lat_bin_size"] != lat_bin_size or grid_cube["long_bin_size"] != long_bin_size:
+            raise ValueError("Can't merge grid cubes of different bin sizes: " + str((lat_bin_size, long_bin_size)) + " and "
+                             + str((grid_cube["lat_bin_size"], grid_cube["long_bin_size"])))
+    #number the cells of all the cubes together (sorted, so the merged cube is in order), then add up the rows of each cell
+    cells, cell_of_each_row = np.unique(np.concatenate([grid_cube["cells"] for grid_cube in grid_cubes]), return_inverse=True)
+    #one bincount over (cell, NIC value) numbers, much quicker than adding the rows one at a time
+    NIC_counts = np.bincount((cell_of_each_row[:, None] * num_NIC_values + np.arange(num_NIC_values)).ravel(),
+                             weights=np.concatenate([grid_cube["NIC_counts"] for grid_cube in grid_cubes]).ravel(),
+                             minlength=len(cells) * num_NIC_values).reshape(len(cells), num_NIC_values).astype(np.uint32)
+    distinct_flights = np.bincount(cell_of_each_row, weights=np.concatenate([grid_cube["distinct_flights"] for grid_cube in grid_cubes]),
+                                   minlength=len(cells))
+    return {"lat_bin_size": lat_bin_size, "long_bin_size": long_bin_size, "cells": cells.astype(np.int64),
+            "NIC_counts": NIC_counts, "distinct_flights": distinct_flights.astype(np.uint32)}
+
+'''
+Save a grid cube to a Parquet file, with its bin sizes in the file's metadata
+#INPUTS: grid_cube, see make_grid_cube
+        file_path, string, where to save it
+#OUTPUT: saves the file
+'''
+def write_grid_cube(grid_cube, file_path):
+    columns = {"cell": pa.array(grid_cube["cells"], pa.int64())}
+    for NIC_value in range(num_NIC_values):
+        columns[f"NIC {NIC_value}"] = pa.array(grid_cube["NIC_counts"][:, NIC_value], pa.uint32())
+    columns["distinct flights"] = pa.array(grid_cube["distinct_flights"], pa.uint32())
+    table = pa.table(columns).replace_schema_metadata({GRID_CUBE_METADATA_KEY: json.dumps({"lat_bin_size": grid_cube["lat_bin_size"],
+                                                                                          "long_bin_size": grid_cube["long_bin_size"]})})
+    pq.write_table(table, file_path, compression="zstd")
+
+'''
+Read a grid cube saved with write_grid_cube
+#INPUT: file_path, string
+#OUTPUT: the grid cube dictionary (see make_grid_cube)
+'''
+def read_grid_cube(file_path):
+    table = pq.read_table(file_path)
+    bin_sizes = json.loads(table.schema.metadata[GRID_CUBE_METADATA_KEY])
+    NIC_counts = np.column_stack([table.column(f"NIC {NIC_value}").to_numpy() for NIC_value in range(num_NIC_values)]).astype(np.uint32)
+    return {"lat_bin_size": bin_sizes["lat_bin_size"], "long_bin_size": bin_sizes["long_bin_size"], "cells": table.column("cell").to_numpy(),
+            "NIC_counts": NIC_counts.reshape(table.num_rows, num_NIC_values), "distinct_flights": table.column("distinct flights").to_numpy()}
@@ -16,7 +16,9 @@ packages_list = ["tkcalendar",
  "numpy",
  "matplotlib",
  "folium", 
- "mplcursors"]
+ "mplcursors",
+ "pyarrow",
+ "shapely"]
 
 
 #run through and check if each package is installed or not
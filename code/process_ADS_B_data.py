@@ -5,8 +5,6 @@
 import os
 import pandas as pd
 import numpy as np
-import math
-from collections import Counter #to count distinct number of objects
 
 #for visualizations and maps
 import matplotlib.pyplot as plt
@@ -21,6 +19,13 @@ import mplcursors #cursor for plots
 from dateutil import parser
 from datetime import timedelta
 
+import ADS_B_storage #reads the saved data, shared with get_ADS_B_data.py
+import grid_statistics #sums up the observations over a lat/long grid
+import NIC_histograms #sums up the observations at each NIC value, for the statistics of any NIC bins
+import result_cache #keeps the results of each day on disk
+import custom_polygons #checks which observations are inside a custom polygon
+import country_lookup #codes of the countries, for the statistics of every country at once
+
 
 #Change working directory to that of the script
 script_dir = os.path.dirname(os.path.abspath(__file__)) 
@@ -34,38 +39,15 @@ parent_dir = os.path.dirname(script_dir)
 NIC_bin_edges_to_process = None
 NIC_colors = None
 NIC_labels = None
+#size of the cells the NIC is averaged over for the averaged map, in degrees (see get_NIC_data_boxed_averages)
+grid_lat_bin_size = 0.25
+grid_long_bin_size = 0.25
+#number of day grid cubes added up at once when gridding a date range. Fewer merges are quicker, but more day cubes are in memory at once
+grid_cube_merge_batch_size = 16
 #--------------------------END GLOBAL VARIABLES-----------------------------------
 
 
 #--------------------------START Worker Functions---------------------------------
-'''
-#Check if a division operation is a whole number or not
-#INPUT: degrees, the number of degrees we are dividing by binsize
-#OUTPUT: exact_multiple_bool, boolean that tells us if dividend is a multiple of the divisor
-        remainder, the reaminder of the division operation float or int depending on output
-        A list of information in the following form [exact_multiple_bool, remainder]
-'''
-def division_information(degrees, bin_size):
-    exact_multiple_bool = False #set as false, will be changed to true if condition met
-    remainder = degrees % bin_size
-    if bin_size == 0:
-        return "Division by zero is not allowed."
-    if degrees % bin_size == 0:
-        exact_multiple_bool = True
-    return [exact_multiple_bool, remainder]
-
-'''
-Round a number to the nearest integer, rounding 0.5 down
-#INPUT: num, int of float to be rounded
-#OUTPUT: rounded num, int
-'''
-def round_right_inclusive(num):
-    #With chatGPT - Check if the number ends in .5
-    if num - int(num) == 0.5: #int cuts the decimal component
-        return int(num) #Round down
-    else:
-        return round(num) #Use normal rounding for other cases
-
 '''
 #Function to take a date range and return dates we want to pull data from 
 #INPUT: Strings in any form, such as:
@@ -133,6 +115,19 @@ def plot_gdf_naturalworld_maps(gdf, date_util = None):
     ax.set_title("Level of Jamming: ", fontsize=16)
     plt.show()
 
+'''
+Get the statistics of a cell of the averaged map (see get_NIC_data_boxed_averages) to add to its popup
+#INPUT: row, a row of the gdf being mapped
+#OUTPUT: string, empty if the row is not a cell with statistics (i.e. a point of the raw map)
+'''
+def get_cell_statistics_popup_text(row):
+    if "Observations" not in row.index:
+        return ""
+    fraction_header = f"Fraction NIC <= {grid_statistics.jamming_NIC_threshold}"
+    #over several days, a flight is counted once for each day it was seen in the cell (see grid_statistics.merge_grid_cubes)
+    return (f"<br>Observations: {row['Observations']}, Flights (distinct per day, summed over the days): {row['Daily Distinct Flights']}, Min NIC: {row['Min NIC']}, "
+            f"NIC <= {grid_statistics.jamming_NIC_threshold}: {100 * row[fraction_header]:.0f}%")
+
 '''
 This plots on a folium map. Tutorial: https://geopandas.org/en/stable/gallery/plotting_with_folium.html
 Plot the NIC data from a gdf by plotting all counts and coloring based on bins
@@ -163,7 +158,7 @@ def plot_gdf_folium_map(gdf, key):
             fill_color=color,
             fill_opacity=1,
             tags = [row['Level of Jamming'], row[headers[2]]], #add tags that we can use to filer (level, NIC, and flight number)
-            popup=f"Level of Jamming: {row['Level of Jamming']}, NIC: {row[headers[2]]} " #What will pop up whnen you hover over the point
+            popup=f"Level of Jamming: {row['Level of Jamming']}, NIC: {row[headers[2]]} " + get_cell_statistics_popup_text(row) #What will pop up whnen you hover over the point
         ).add_to(folium_map)
 
     #let's add a filter so you can pick what points to show
@@ -181,126 +176,58 @@ def plot_gdf_folium_map(gdf, key):
         # webbrowser.open(os.path.join(parent_dir, "outputs", "map_averaged.html", "map", key, ".html")) #un-comment to open automatically in browser
     
 '''
-Take gdf with NIC values. Box them into cells of given lat and long dimensions and keep the average NIC value
+Take gdf with NIC values. Box them into cells of given lat and long dimensions and keep the average NIC value.
+A cell is centered at every multiple of the bin size, and includes the points up to half a bin on each side, INCLUSIVE ON THE
+RIGHT, EXCLUSIVE ON THE LEFT. The average NIC of a cell is rounded to the nearest integer, rounding 0.5 down.
+The cells are summed up in one pass with a grid cube (see grid_statistics.py), so any bin size works. A mean can hide a few
+jammed aircraft among many healthy ones, so the other statistics of each cell are kept too
 #INPUT: NIC_data_frame, a dataframe, or a gdf (gdf inherits from data frame)
-#OUTPUT: a Geo Data Frame of average NIC at center of boxes that were determined given the cell dimensions
+        lat_bin_size (optional), float, height of the cells in degrees of latitude
+        long_bin_size (optional), float, width of the cells in degrees of longitude
+#OUTPUT: a Geo Data Frame of average NIC at center of boxes that were determined given the cell dimensions, one row per cell with data.
+        Also has the statistics of get_grid_cube_statistics (number of observations and flights, min NIC, fraction jammed...)
 '''
-def get_NIC_data_boxed_averages(NIC_data_frame):
+def get_NIC_data_boxed_averages(NIC_data_frame, lat_bin_size = grid_lat_bin_size, long_bin_size = grid_long_bin_size):
     #get headers
     headers = NIC_data_frame.columns
-   
-    # Define bin sizes for latitude and longitude
-    #Effectively what we are doing is first deciding how big we want the bins to be
-    #Note that with small decimal degrees (less than 0.25) this breaks -- something with the rounding/floats
-    lat_bin_size = 0.25
-    long_bin_size = 0.25
-
-    # Calculate the number of bins needed for resolution. remember rows are first in index, then column
-    #this means that: [row, column] = [lat, long]
-    #initialize two properties to hold the number of bins. We will need these values are also the Number of indeces we will need in our grid
-    lat_grid_num_bins = None
-    long_grid_num_bins = None
-
-    #to catch the extra interval if the latt/long value does not divide perfectly into the degrees
-    #use round function to go to closest integer. this means everything centers at the closest integer of bin
-    #at end we plot in the middle of the bin
-
-    #looking to make intervals INCLUSIVE ON THE RIGHT, ESCLUSIVE ON THE LEFT
-    lat_division = division_information(180, lat_bin_size)
-    #first check if the number of degrees is a multiple of the bin size
-    if lat_division[0]: #0 index is boolean
-        lat_grid_num_bins = int(180 / lat_bin_size) + 1
-    elif lat_division[1] <= (lat_bin_size/2): #if remaining space is less than half of our bin
-        lat_grid_num_bins =  math.floor(180/lat_bin_size) + 1 #a bin centered at every multiple, and one extra at zero will suffice 
-    else: #this means we have remaining space and we will need an extra bin centered at 180
-        lat_grid_num_bins =  math.floor(180/lat_bin_size) + 2
-
-    long_division = division_information(360, long_bin_size)
-    #first check if the number of degrees is a multiple of the bin size
-    if long_division[0]: #0 index is boolean
-        long_grid_num_bins = int(360 / long_bin_size) + 1 #want bin centered at each multiple and zero
-    elif long_division[1] <= (long_bin_size/2): #if remaining space is less than half of our bin
-        long_grid_num_bins =  math.floor(360/long_bin_size) + 1 #a bin centered at every multiple, and one extra at zero will suffice 
-    else: #this means we have remaining space and we will need an extra bin centered at 180
-        long_grid_num_bins =  math.floor(180/long_bin_size) + 2
-
-    # Create a 2D array to represent the grid
-    lat_long_NIC_as_grid = np.full((lat_grid_num_bins, long_grid_num_bins), None)
-
-    #Go through each row in the NIC data and assign to at point in the discrete grid
-    for index, row in NIC_data_frame.iterrows():
-        #round means point is rounded down to the nearest integer,
-        #This means for the midpoint that it belongs to in the bin is half step higher 
-         #if bin lies at the every end of the range, i don't want to make another bin that exceeds 
-        #Since a bin is centered at every multiple of the bin size and zero, dividing and rounding the 
-        #degrees results in the INDEX of the associated bin
-        row_index_on_grid = round_right_inclusive((row[headers[0]] + 90) / lat_bin_size)
-        col_index_on_grid = round_right_inclusive((row[headers[1]] + 180) / long_bin_size)
-
-        #NOTICE - we throw out values that are 0, since those are unreliable points
-        #only add to be processed if the value is not equal to zero
-        if row[headers[2]] != 0:
-            if lat_long_NIC_as_grid[row_index_on_grid][col_index_on_grid] is None:  #If the cell is empty
-                lat_long_NIC_as_grid[row_index_on_grid][col_index_on_grid] = [row[headers[2]]]  #Initialize it with a new array containing the value
-            else:
-                lat_long_NIC_as_grid[row_index_on_grid][col_index_on_grid].append(row[headers[2]])  #Append the value to the existing array
-    
-    #now we need to go through and AVERAGE the points within the grid
-    #Loop through each row and column
-    for i in range(len(lat_long_NIC_as_grid)): #len() returns number of rows
-        for j in range(len(lat_long_NIC_as_grid[i])): #len(index) returns number of columns in row i
-            # Check if the cell contains a list (or array)
-            if isinstance(lat_long_NIC_as_grid[i][j], list):
-                # Calculate the average and replace the cell's value
-                #using custom rounding fucntion that rounds to nearest int, with 0.5 rounding down
-                lat_long_NIC_as_grid[i][j] = round_right_inclusive(np.mean(lat_long_NIC_as_grid[i][j]))
-
-    #now convert the grid into a data frame using the index of each position
-    #first just make a new array that we can convert to a dataframe as lat and long
-    holding_for_new_data_frame = []
-
-    #Loop through the 2D array and create (lat, long - IN NEW FRAME, value) tuples
-    #Again, the row index represents which multiple of the bin size a point corresponds to
-    for i in range(len(lat_long_NIC_as_grid)):  # oop through rows (latitude)
-        for j in range(len(lat_long_NIC_as_grid[i])):  #Loop through columns (longitude)
-            row_index = i  #Row index is latitude
-            column_index = j  #Column index is longitude
-            value = lat_long_NIC_as_grid[i][j]  #The value in the cell
-            transform_back_lat = None #empty values to hold transformed lat and long
-            transform_back_long = None
-            if value != None: #only procede if there is a value present 
-                transform_back_lat = row_index*lat_bin_size - 90
-                transform_back_long = column_index*long_bin_size - 180
-            holding_for_new_data_frame.append([transform_back_lat, transform_back_long, value]) #convert back to real frame
-    # Create a DataFrame from the data
-    final_NIC_boxed_data_frame = pd.DataFrame(holding_for_new_data_frame, columns=[headers[0], headers[1], headers[2]])
-
-    final_NIC_boxed_gdf = final_NIC_boxed_data_frame = gpd.GeoDataFrame(final_NIC_boxed_data_frame, geometry=gpd.points_from_xy(final_NIC_boxed_data_frame[headers[1]], final_NIC_boxed_data_frame[headers[0]]), crs="EPSG:4326")
+    grid_cube = grid_statistics.make_grid_cube(NIC_data_frame, lat_bin_size, long_bin_size)
+    return get_grid_cube_boxed_averages(grid_cube, headers = headers[0:3])
 
+'''
+Get the average NIC of each cell of a grid cube, as get_NIC_data_boxed_averages does for a data frame
+#INPUT: grid_cube, see grid_statistics.make_grid_cube (i.e. the cube of a date range from get_date_range_grid_cube)
+        headers (optional), names of the lat, long and NIC columns of the output
+#OUTPUT: a Geo Data Frame like the one of get_NIC_data_boxed_averages, one row per cell with an average
+'''
+def get_grid_cube_boxed_averages(grid_cube, headers = ADS_B_storage.ADSB_data_headers[0:3]):
+    cell_statistics_gdf = grid_statistics.get_grid_cube_statistics(grid_cube)
+
+    #NOTICE - we throw out values that are 0 from the average, since those are unreliable points
+    NIC_counts_without_0 = grid_cube["NIC_counts"][:, 1:].astype(np.int64)
+    num_without_0 = NIC_counts_without_0.sum(axis=1)
+    has_average = num_without_0 > 0
+    #using custom rounding that rounds to nearest int, with 0.5 rounding down
+    NIC_averages = grid_statistics.round_right_inclusive_array(NIC_counts_without_0[has_average] @ np.arange(1, grid_statistics.num_NIC_values)
+                                                               / num_without_0[has_average])
+
+    final_NIC_boxed_gdf = cell_statistics_gdf[has_average].reset_index(drop=True)
+    final_NIC_boxed_gdf.insert(2, headers[2], NIC_averages)
+    final_NIC_boxed_gdf = final_NIC_boxed_gdf.rename(columns={"Latitude (deg)": headers[0], "Longitude (deg)": headers[1]})
     return final_NIC_boxed_gdf
 
 '''
-Return a GeoDataFrame that has points only within the specifeid custom polygon region 
-#INPUTS: time_slice_gdf, the time slice GeoDataFrame
+Return a DataFrame or GeoDataFrame that has points only within the specifeid custom polygon region.
+The polygon is only read once (see custom_polygons.py), and only the points in its bounding box get the exact check
+#INPUTS: custom_polygon_df, a DataFrame or GeoDataFrame with lat/long columns (see ADS_B_storage.ADSB_data_headers)
         custom_polygon, a string of a custom region to be looked at
-#OUTPUT: within_polygon_gdf, a GeoDataFrame with points within the custom polygon region
+#OUTPUT: the rows of custom_polygon_df with points within the custom polygon region
 '''
-def get_gdf_in_custom_polygon(custom_polygon_gdf, custom_polygon):
-    #get the shape file gdf
-    polygon_directory = os.path.join(parent_dir, "maps", "custom_polygons", custom_polygon +".shp")
-    polygon_gdf = gpd.read_file(polygon_directory) # Load the shapefile - makes Geo Data Frame
-    polygon_gdf = polygon_gdf.to_crs(custom_polygon_gdf.crs)
-    polygon_gdf = polygon_gdf[["geometry"]] #just keep geometry - all we need to compare to
-
-    #now let"s join the time slice gdf with the region
-    gdf_in_polygon = gpd.sjoin(custom_polygon_gdf, polygon_gdf, how="left", predicate="within")
-    gdf_in_polygon["is_within_polygon"] = gdf_in_polygon["index_right"].notna() #only keep the the rows that are not na, i.e. in the polygon
-    #only keep rows that are in polygon, i.e. the ones that have true in the is_wihin_polygon column
-    time_slice_in_polygon_gdf = gdf_in_polygon[gdf_in_polygon["is_within_polygon"] == True] 
-    time_slice_in_polygon_gdf = time_slice_in_polygon_gdf.drop(["index_right", "is_within_polygon"], axis=1)
-
-    #return the geo data frame 
-    return time_slice_in_polygon_gdf
+def get_gdf_in_custom_polygon(custom_polygon_df, custom_polygon):
+    headers = ADS_B_storage.ADSB_data_headers
+    is_within_polygon = custom_polygons.get_points_in_custom_polygon(custom_polygon_df[headers[0]].to_numpy(), custom_polygon_df[headers[1]].to_numpy(),
+                                                                     custom_polygon)
+    #only keep rows that are in polygon
+    return custom_polygon_df[is_within_polygon]
 
 '''
 Put together a full day's worth of data into one big gdf. Filter out for chosen regions if necessary
@@ -310,29 +237,219 @@ Put together a full day's worth of data into one big gdf. Filter out for chosen
 #OUTPUTS: all the days data in one GeoDataFrame
 '''
 def get_full_day_gdf(date_util, specified_country = None, custom_polygon = None):
-    #get teh directory path for the day's data. use the date information to get the folder path (year/month/day)
-    date_directory = os.path.join(parent_dir, "ADS_B_Data", str(date_util.year), "{:02}".format(date_util.month), "{:02}".format(date_util.day)) #will work for any system os
-    #get the file names within the day's folder. only keep files ending in .pkl - these are the times slice gdfs
-    date_pkl_file_names = [f for f in os.listdir(date_directory) if f.endswith('.pkl')]    
-    
-    #create emtpy data to fill with day's data
-    full_date_gdf = gpd.GeoDataFrame()
-
-    #loop through every time slice file for the date and add to the full day gdf
-    for time_slice_pkl_file_name in date_pkl_file_names:
-        time_slice_pkl_file_path = os.path.join(date_directory, time_slice_pkl_file_name) #will work for any system os
-        time_slice_gdf = pd.read_pickle(time_slice_pkl_file_path) #get's a copy of the gdf we have saved in the pkl file
-        if specified_country != None: #check if known region given
-            time_slice_gdf = time_slice_gdf[time_slice_gdf["Country Name"] == specified_country] #only keep rows that fall in country
-        elif custom_polygon != None: 
-            #filter out parameters only inside polygon - call a copy of the time slice to avoid any unwanted memory saving
-            time_slice_gdf = get_gdf_in_custom_polygon(time_slice_gdf.copy(), custom_polygon) #get gdf in custom pplygon 
-        #at end add time slice to the full date gdf
-        full_date_gdf = pd.concat([full_date_gdf, time_slice_gdf], ignore_index=True)
-
+    #read the whole day at once from the day's file (see ADS_B_storage.py). This is a plain DataFrame with lat/long columns
+    #if known region given, only the rows of the country are read, from the index of the countries of the day file
+    row_filter = None
+    partition_filters = None
+    #for a custom polygon, only the tiles and the rows in the region, from the bit of the region saved with each observation, if the day is up to date for the polygon
+    custom_region_bit = ADS_B_storage.get_saved_custom_region_bit(ADS_B_storage.get_day_directory(date_util), custom_polygon) if custom_polygon != None else None
+    if custom_region_bit != None:
+        row_filter = ADS_B_storage.get_custom_region_row_filter(custom_region_bit)
+        partition_filters = [ADS_B_storage.get_custom_region_partition_filter(custom_region_bit)]
+    elif custom_polygon != None: #only the tiles that overlap the polygon's shapes
+        partition_filters = [ADS_B_storage.get_bounding_box_partition_filter(custom_polygons.get_custom_polygon(custom_polygon)["bounding_boxes"])]
+    full_date_df = ADS_B_storage.read_day(date_util, row_filter = row_filter, partition_filters = partition_filters, country_name = specified_country)
+    if custom_polygon != None and custom_region_bit == None: 
+        #filter out parameters only inside polygon, from the lat/long columns (day saved before the polygon was added or changed)
+        full_date_df = get_gdf_in_custom_polygon(full_date_df, custom_polygon) #get df in custom pplygon 
+
+    #only make the point geometry for the rows we kept
+    full_date_gdf = ADS_B_storage.add_geometry(full_date_df.reset_index(drop=True))
     return full_date_gdf
 
+#----------------------------Cached day results------------------------------------
+'''
+Get what the results of a day over a region depend on, for their keys in the cache (see result_cache.make_cache_key).
+If the day's data or the polygon's files change, so do the keys, and the results are made again
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon, the region (see get_full_day_gdf)
+#OUTPUT: dictionary of the date, the stamp of the day's data (see ADS_B_storage.get_day_data_stamp, None if the day has no data),
+        the region and the checksum of the polygon's files (see custom_polygons.get_custom_polygon_sha256, the same checksum the day
+        files record for the custom regions they were checked against)
+'''
+def get_day_cache_key_fields(date_util, specified_country, custom_polygon):
+    return {"date": date_util.strftime('%Y-%m-%d'), "day data": ADS_B_storage.get_day_data_stamp(ADS_B_storage.get_day_directory(date_util)),
+            "country": specified_country, "custom polygon": custom_polygon,
+            "custom polygon sha256": custom_polygons.get_custom_polygon_sha256(custom_polygon) if custom_polygon != None else None}
+
+'''
+Get the cache key of a day's grid cube (see result_cache.make_cache_key)
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon, the region (see get_full_day_gdf)
+        lat_bin_size, long_bin_size, floats, size of the cells in degrees
+#OUTPUT: the key, a string
+'''
+def get_day_grid_cube_cache_key(date_util, specified_country, custom_polygon, lat_bin_size, long_bin_size):
+    return result_cache.make_cache_key("grid cube", lat_bin_size = lat_bin_size, long_bin_size = long_bin_size,
+                                       **get_day_cache_key_fields(date_util, specified_country, custom_polygon))
+
+'''
+Get the grid cube of one day over a region. The cube is cached the first time (see result_cache.py), and read back after that
+as long as the day's data and the polygon have not changed, so a day is only gridded once for each region and cell size
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon (optional), the region (see get_full_day_gdf)
+        lat_bin_size, long_bin_size (optional), floats, size of the cells in degrees
+        full_day_gdf (optional), the day's data over the region if it was already read, so it is not read again
+#OUTPUT: the grid cube of the day (see grid_statistics.make_grid_cube)
+'''
+def get_day_grid_cube(date_util, specified_country = None, custom_polygon = None, lat_bin_size = grid_lat_bin_size, long_bin_size = grid_long_bin_size,
+                      full_day_gdf = None):
+    def make_day_grid_cube():
+        day_gdf = full_day_gdf if full_day_gdf is not None else get_full_day_gdf(date_util, specified_country = specified_country, custom_polygon = custom_polygon)
+        return grid_statistics.make_grid_cube(day_gdf, lat_bin_size, long_bin_size)
+    return result_cache.get_cache_entry(get_day_grid_cube_cache_key(date_util, specified_country, custom_polygon, lat_bin_size, long_bin_size),
+                                        make_day_grid_cube, grid_statistics.read_grid_cube, grid_statistics.write_grid_cube)
+
+'''
+Get the NIC histogram of one day over a region (see NIC_histograms.py), which gives the statistics of any NIC bins. Like the grid cube,
+it is cached the first time and read back after that while the day's data and the polygon are the same
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon (optional), the region (see get_full_day_gdf)
+        full_day_gdf (optional), the day's data over the region if it was already read, so it is not read again
+#OUTPUT: the NIC histogram of the day (see NIC_histograms.make_NIC_histogram)
+'''
+def get_day_NIC_histogram(date_util, specified_country = None, custom_polygon = None, full_day_gdf = None):
+    def make_day_NIC_histogram():
+        day_gdf = full_day_gdf if full_day_gdf is not None else get_full_day_gdf(date_util, specified_country = specified_country, custom_polygon = custom_polygon)
+        return NIC_histograms.make_NIC_histogram(day_gdf)
+    cache_key = result_cache.make_cache_key("NIC histogram", **get_day_cache_key_fields(date_util, specified_country, custom_polygon))
+    return result_cache.get_cache_entry(cache_key, make_day_NIC_histogram, NIC_histograms.read_NIC_histogram, NIC_histograms.write_NIC_histogram)
+
+'''
+Save the statistics of the NIC bins of a day (see get_day_bin_statistics) to a Parquet file
+#INPUTS: bin_statistics_df, data frame with one row per bin
+        file_path, string, where to save it
+#OUTPUT: saves the file
+'''
+def write_bin_statistics(bin_statistics_df, file_path):
+    bin_statistics_df.to_parquet(file_path, index=False)
+
+'''
+Get the cache key of the statistics of a day's NIC bins, for the current NIC bins (see result_cache.make_cache_key)
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon, the region (see get_full_day_gdf)
+#OUTPUT: the key, a string
+'''
+def get_day_bin_statistics_cache_key(date_util, specified_country, custom_polygon):
+    return result_cache.make_cache_key("bin statistics", NIC_bin_edges = list(NIC_bin_edges_to_process),
+                                       **get_day_cache_key_fields(date_util, specified_country, custom_polygon))
+
+'''
+Get the observation counts and the UNIQUE flights in each NIC bin of one day over a region, for the current NIC bins.
+They come from the day's NIC histogram, and are cached for each set of bin edges
+#INPUTS: date_util, date util object of the day
+        specified_country, custom_polygon (optional), the region (see get_full_day_gdf)
+        full_day_gdf (optional), the day's data over the region if it was already read, so it is not read again
+#OUTPUT: data frame with one row per NIC bin and the columns "counts" and "flights"
+'''
+def get_day_bin_statistics(date_util, specified_country = None, custom_polygon = None, full_day_gdf = None):
+    def make_day_bin_statistics():
+        day_NIC_histogram = get_day_NIC_histogram(date_util, specified_country = specified_country, custom_polygon = custom_polygon, full_day_gdf = full_day_gdf)
+        return pd.DataFrame({"counts": NIC_histograms.get_bin_counts(day_NIC_histogram, NIC_bin_edges_to_process),
+                             "flights": NIC_histograms.get_bin_flights(day_NIC_histogram, NIC_bin_edges_to_process)})
+    return result_cache.get_cache_entry(get_day_bin_statistics_cache_key(date_util, specified_country, custom_polygon),
+                                        make_day_bin_statistics, pd.read_parquet, write_bin_statistics)
+
+'''
+Get the NIC histograms of every country for one day, in one pass over the day's data (see NIC_histograms.make_NIC_histograms_by_group).
+They are cached like the NIC histogram of a region, so the statistics of all the countries with any bins only read the day once
+#INPUT: date_util, date util object of the day
+#OUTPUT: the NIC histograms of the countries, one group per country code (see country_lookup.get_country_codes)
+'''
+def get_day_country_NIC_histograms(date_util):
+    def make_day_country_NIC_histograms():
+        full_day_df = ADS_B_storage.read_day(date_util)
+        return NIC_histograms.make_NIC_histograms_by_group(full_day_df, country_lookup.get_country_codes(full_day_df[ADS_B_storage.ADSB_data_headers[5]]),
+                                                           len(country_lookup.get_country_names()))
+    cache_key = result_cache.make_cache_key("country NIC histograms", **get_day_cache_key_fields(date_util, None, None))
+    return result_cache.get_cache_entry(cache_key, make_day_country_NIC_histograms, NIC_histograms.read_NIC_histograms_by_group,
+                                        NIC_histograms.write_NIC_histograms_by_group)
+
+#----------------------------Grid over a date range------------------------------------
+'''
+Get the cache key of the grid cube of a date range (see result_cache.make_cache_key). It depends on the data of every day of the range
+#INPUTS: dates, list of date util objects
+        specified_country, custom_polygon, the region (see get_full_day_gdf)
+        lat_bin_size, long_bin_size, floats, size of the cells in degrees
+#OUTPUT: the key, a string
+'''
+def get_date_range_grid_cube_cache_key(dates, specified_country, custom_polygon, lat_bin_size, long_bin_size):
+    return result_cache.make_cache_key("date range grid cube", lat_bin_size = lat_bin_size, long_bin_size = long_bin_size,
+                                       days = [get_day_cache_key_fields(date_util, specified_country, custom_polygon) for date_util in dates])
+
+'''
+Get the grid cube of a date range over a region, one day at a time: each day's cube (cached, or made and cached, see get_day_grid_cube)
+is added to the total (grid_cube_merge_batch_size days at a time), so only one day of data is in memory at once and adding days to a
+range only grids the new days. The total is cached too, so the same range is not added up again
+#INPUTS: dates, list of date util objects
+        specified_country, custom_polygon (optional), the region (see get_full_day_gdf)
+        lat_bin_size, long_bin_size (optional), floats, size of the cells in degrees
+#OUTPUT: the grid cube of all the dates (see grid_statistics.merge_grid_cubes on how the distinct flights add up)
+'''
+def get_date_range_grid_cube(dates, specified_country = None, custom_polygon = None, lat_bin_size = grid_lat_bin_size, long_bin_size = grid_long_bin_size):
+    def make_date_range_grid_cube():
+        grid_cubes_to_merge = []
+        for date_util in dates:
+            grid_cubes_to_merge.append(get_day_grid_cube(date_util, specified_country = specified_country, custom_polygon = custom_polygon,
+                                                         lat_bin_size = lat_bin_size, long_bin_size = long_bin_size))
+            if len(grid_cubes_to_merge) >= grid_cube_merge_batch_size: #add up the cubes so far into one
+                grid_cubes_to_merge = [grid_statistics.merge_grid_cubes(grid_cubes_to_merge)]
+        return grid_statistics.merge_grid_cubes(grid_cubes_to_merge)
+    return result_cache.get_cache_entry(get_date_range_grid_cube_cache_key(dates, specified_country, custom_polygon, lat_bin_size, long_bin_size),
+                                        make_date_range_grid_cube, grid_statistics.read_grid_cube, grid_statistics.write_grid_cube)
+
 #----------------------------Flight number Stats------------------------------------
+'''
+Get the headers of the statistics data frames: the NIC labels, then the percentage of each bin
+#INPUT: key, a string of either "flights" or "counts", used in the headers of the percentages
+#OUTPUT: list of the headers
+'''
+def get_stats_headers(key):
+    stats_headers_list = NIC_labels.copy() #we'll add on to the original ones
+    for i in range(len(NIC_labels)): #make a new bin holder for each bin
+        stats_headers_list.append(key + " % Jam: " + NIC_labels[i])
+    return stats_headers_list
+
+'''
+Make the one-row data frame of a statistic for ONE DATE from the value of each bin: the values, then the percentage of each bin
+#INPUTS: key, a string of either "flights" or "counts", used in the headers of the percentages
+        bin_values, array of the value of each NIC bin
+        date_util, date util object for the day
+#OUTPUT: a one-row data frame, index is the date. first n_bins columns are the values, next set are percentages of their total
+'''
+def make_stats_day_df(key, bin_values, date_util):
+    stats_headers_list = get_stats_headers(key)
+    bin_values = np.asarray(bin_values, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"): #no observations in any bin gives NaN percentages
+        percents = bin_values / bin_values.sum() * 100
+    stats_day_df = pd.DataFrame([np.concatenate([bin_values, percents])], columns = stats_headers_list)
+    stats_day_df.index = [date_util.strftime('%Y-%m-%d')]
+    return stats_day_df
+
+'''
+Get the observation counts and the UNIQUE flights in each NIC bin for ONE DATE from the day's NIC histogram, for any bins and
+without going back to the data (see NIC_histograms.py)
+#INPUTS: NIC_histogram, the NIC histogram of the day (see get_day_NIC_histogram)
+        date_util, the date in question as a date util object
+#OUTPUTS: counts_and_percents_df, one-row data frame of the number of observations in each bin and their percentages
+        flight_counts_and_percents_df, one-row data frame of the number of flights in each bin and their percentages
+        (a flight is counted in every bin it has observations in, as before)
+'''
+def get_counts_and_flights_from_NIC_histogram(NIC_histogram, date_util):
+    bin_counts = NIC_histograms.get_bin_counts(NIC_histogram, NIC_bin_edges_to_process)
+    bin_flights = NIC_histograms.get_bin_flights(NIC_histogram, NIC_bin_edges_to_process)
+    return make_stats_day_df("counts", bin_counts, date_util), make_stats_day_df("flights", bin_flights, date_util)
+
+'''
+Count the observations and the UNIQUE flights in each NIC bin for ONE DATE, in one pass over the day's data (its NIC histogram
+is made, then the bins are counted from it)
+#INPUTS: full_day_gdf, the gdf of the day to process
+        date_util, the date in question as a date util object
+#OUTPUTS: see get_counts_and_flights_from_NIC_histogram
+'''
+def get_counts_and_flights_day(full_day_gdf, date_util):
+    return get_counts_and_flights_from_NIC_histogram(NIC_histograms.make_NIC_histogram(full_day_gdf), date_util)
+
 '''
 Count the number of UNIQUE flights and the percentage that are within the selected jamming ranges for ONE DATE
 #INPUTS: full_day_gdf, the gdf of the day to process
@@ -340,39 +457,7 @@ Count the number of UNIQUE flights and the percentage that are within the select
 #OUTPUTS: a one-row data frame with the number of flights in each NIC bin and the percentage of each type, index is the date in date_util form
 '''
 def get_flight_counts_and_percents_day(full_day_gdf, date_util):
-    data_headers = full_day_gdf.columns #this also has the geometry from the gdf
-
-    #lets count how many instances of each bin of Nic we have
-    #create an array to hold the corresponding counts for each bin 
-    #the 0th index corresponds to the 1st bin, 1st index to the 2nd, etc.
-    num_bins = len(NIC_bin_edges_to_process) - 1 
-    #lets add new columns to hold the percentages
-    flight_counts_and_percents_headers_list = NIC_labels.copy() #we'll add on to the original ones
-    for i in range(num_bins): #make a new bin holder for each bin in num bins
-        flight_counts_and_percents_headers_list.append("flights % Jam: " + NIC_labels[i])    
-    #print("Headers: ", counts_and_percents_headers_list, ". Type: ", type(counts_and_percents_headers_list), ". Shape: ", np.shape(counts_and_percents_headers_list))
-
-    #now let's calculate the actual number of unique flights in each bin
-    flight_counts_and_percents_array = np.zeros( (1, num_bins*2) ) #1 x 2*numbins array to hold - i.e a 1-dimensional array
-    for i in range(num_bins): #for each bin - index 0 refers to the first bin 
-        #use logic to get either false (0) or true (1) on wheter value in data frame falls in the bin for each bin
-        #then only take the rows of the full_day_gdf that have true in the inside of the next line
-        gdf_in_bin = full_day_gdf[ (full_day_gdf[data_headers[2]] > NIC_bin_edges_to_process[i]) & (full_day_gdf[data_headers[2]] <= NIC_bin_edges_to_process[i + 1]) ]
-        flight_num_list = gdf_in_bin[data_headers[4]]#get list of the flight numbers
-        num_unique_flights = len(Counter(flight_num_list)) #get the number of unique flight numbers
-        flight_counts_and_percents_array[0, i]= num_unique_flights #append the number of flights to the storage array
-    #now lets do the percentages for the flights
-    total_num_flights = flight_counts_and_percents_array.sum()#first get total number of flights in observation period
-    #print("The array is ", np.round(flight_counts_and_percents_array, 2), " ---- Total flights: ", total_num_flights, "for", date_util)
-    for i in range(num_bins): #for each index in our counting array, starting at 0
-        percent_flights_jam = ( flight_counts_and_percents_array[0, i]/total_num_flights )*100 #calc percent
-        flight_counts_and_percents_array[0, i+num_bins] = percent_flights_jam #add percent to spot in storage array
-
-    #convert date into a data frame
-    flight_counts_and_percents_df = pd.DataFrame(flight_counts_and_percents_array, columns = flight_counts_and_percents_headers_list)
-    flight_counts_and_percents_df.index = [date_util.strftime('%Y-%m-%d')]
-    
-    return(flight_counts_and_percents_df)
+    return get_counts_and_flights_day(full_day_gdf, date_util)[1]
 
 
 '''
@@ -383,41 +468,62 @@ Returns a one-row data frame that stores the counts and percentages of each jamm
         and stores the percentage of each of those instances with respect to the total sum in the second set of n/2 columns
 '''
 def get_jamming_counts_and_percents_day(full_day_gdf, date_util):
-    data_headers = full_day_gdf.columns #this also has the geometry from the gdf
-
-    #lets count how many instances of each bin of Nic we have
-    #create an array to hold the corresponding counts for each bin 
-    #the 0th index corresponds to the 1st bin, 1st index to the 2nd, etc.
-    num_bins = len(NIC_bin_edges_to_process) - 1 
-    #lets add new columns to hold the percentages
-    counts_and_percents_headers_list = NIC_labels.copy() 
-    for i in range(num_bins): #make a new bin holder for each bin in num bins
-         counts_and_percents_headers_list.append("counts % Jam: " + NIC_labels[i])    
-    #print("Headers: ", counts_and_percents_headers_list, ". Type: ", type(counts_and_percents_headers_list), ". Shape: ", np.shape(counts_and_percents_headers_list))
-    
-    #calculate counts and add to a storage list
-    counts_and_percents_array = np.empty( (1, num_bins*2) ) #1 x 2*numbins array to hold 
-    for i in range(num_bins): #for each index in our counting array, starting at 0
-        #use logic to get either false (0) or true (1) on whether value in data frame falls in the bin for each bin
-        bin_count = ( (full_day_gdf[data_headers[2]] > NIC_bin_edges_to_process[i]) & (full_day_gdf[data_headers[2]] <= NIC_bin_edges_to_process[i + 1]) ).sum()
-        counts_and_percents_array[0, i]= bin_count
-    total_counts = counts_and_percents_array.sum() #only counts in so far, total counts is just sum of array
-    #calculate percentage for each count and add to storage list
-    for i in range(num_bins): #for each index in our counting array, starting at 0
-        percent_jam = ( counts_and_percents_array[0, i]/total_counts )*100
-        counts_and_percents_array[0, i+num_bins] = percent_jam #percents are next set so add numbins to index
-    print("Array: ", counts_and_percents_array, ". Array shape: ", counts_and_percents_array.shape)
-    
-    #convert date into a data frame
-    counts_and_percents_df = pd.DataFrame(counts_and_percents_array, columns = counts_and_percents_headers_list)
-    counts_and_percents_df.index = [date_util.strftime('%Y-%m-%d')]
-    
-    return(counts_and_percents_df)
+    return get_counts_and_flights_day(full_day_gdf, date_util)[0]
+
+'''
+Get everything the processing shows for a DATE RANGE (at least one date), reading each day at most once: the counts and the flights
+statistics of each day, the grid cube of all the days for the averaged map, and the first day's data for the raw map.
+The statistics and the grid come from the results of each day, which are cached the first time a day is read (see result_cache.py,
+get_day_bin_statistics and get_day_grid_cube). After that, the only day read again is the first one, for the raw map: processing
+the same dates again, with the same or other NIC bins, or dates that overlap, only reads the days that are not cached
+#INPUTS: dates, a list of dates to process
+        specified_country, either None or a string of the specified country from the pre-made list
+        custom_polygon, either None or a string of the custom polygon from the saved shp files
+        lat_bin_size, long_bin_size (optional), floats, size of the cells of the grid in degrees
+#OUTPUT: dictionary with
+            "counts" and "flights": data frames like the ones of get_stats_date_range, dates as the indexes
+            "grid_cube": grid cube of all the dates (see get_date_range_grid_cube)
+            "first_day_gdf": the gdf of the first date
+'''
+def get_date_range_statistics(dates, specified_country = None, custom_polygon = None, lat_bin_size = grid_lat_bin_size, long_bin_size = grid_long_bin_size):
+    counts_dfs = []
+    flights_dfs = []
+    first_day_gdf = None
+    #the grid of the whole range may be cached already, if not it is added up from the days'
+    date_range_grid_cube_cache_key = get_date_range_grid_cube_cache_key(dates, specified_country, custom_polygon, lat_bin_size, long_bin_size)
+    date_range_grid_cube = result_cache.read_cache_entry(date_range_grid_cube_cache_key, grid_statistics.read_grid_cube)
+    grid_cubes_to_merge = []
+    for date_util in dates:
+        #only read the day if one of its results has to be made (or it is the first day, for the raw map)
+        full_day_gdf = None
+        if (date_util == dates[0] or not result_cache.has_cache_entry(get_day_bin_statistics_cache_key(date_util, specified_country, custom_polygon))
+            or (date_range_grid_cube is None and not result_cache.has_cache_entry(get_day_grid_cube_cache_key(date_util, specified_country, custom_polygon,
+                                                                                                              lat_bin_size, long_bin_size)))):
+            #get the full gdf for the date - pass parameters and gdf will take care of regions if selected
+            full_day_gdf = get_full_day_gdf(date_util, specified_country = specified_country, custom_polygon = custom_polygon)
+            if date_util == dates[0]:
+                first_day_gdf = full_day_gdf
+
+        bin_statistics_df = get_day_bin_statistics(date_util, specified_country = specified_country, custom_polygon = custom_polygon, full_day_gdf = full_day_gdf)
+        counts_dfs.append(make_stats_day_df("counts", bin_statistics_df["counts"], date_util))
+        flights_dfs.append(make_stats_day_df("flights", bin_statistics_df["flights"], date_util))
+        if date_range_grid_cube is None:
+            grid_cubes_to_merge.append(get_day_grid_cube(date_util, specified_country = specified_country, custom_polygon = custom_polygon,
+                                                         lat_bin_size = lat_bin_size, long_bin_size = long_bin_size, full_day_gdf = full_day_gdf))
+            if len(grid_cubes_to_merge) >= grid_cube_merge_batch_size: #add up the cubes so far into one
+                grid_cubes_to_merge = [grid_statistics.merge_grid_cubes(grid_cubes_to_merge)]
+        del full_day_gdf #let go of the day before the next one is read (the first day is still kept for the raw map)
+
+    if date_range_grid_cube is None:
+        date_range_grid_cube = grid_statistics.merge_grid_cubes(grid_cubes_to_merge)
+        result_cache.write_cache_entry(date_range_grid_cube_cache_key, date_range_grid_cube, grid_statistics.write_grid_cube)
+    return {"counts": pd.concat(counts_dfs), "flights": pd.concat(flights_dfs), "grid_cube": date_range_grid_cube, "first_day_gdf": first_day_gdf}
 
 '''
 Returns a data frame of the statistics foe either instances of jamming or flight number counts over a DATE RANGE (at least one date)
 The first n_bins/2 columns represent the instances of the metric, and the second set of n_bins/2 columns represent the perecntages of each 
 bin with respect to the total observed - the total is only that of all the bins entered, not the original sample of ADS-B data
+The statistics of each day are cached (see get_day_bin_statistics), so only days that are new or changed are read
 #INPUT: key, a string of either "flights" or "counts" to specify which stats to gather
         dates, a list of dates to process
         specified_country, either None or a string of the specified country from the pre-made list
@@ -425,45 +531,42 @@ bin with respect to the total observed - the total is only that of all the bins
 #OUTPUT: Data frame with dates as the indeces, and stats in the columns. first n_bins/2 columns are instances, next set are percentages
 '''
 def get_stats_date_range(key, dates, specified_country=None, custom_polygon = None):
-    #make headers. for both counts and percents
-    #lets count how many instances of each bin of Nic we have
-    #create an array to hold the corresponding counts for each bin 
-    #the 0th index corresponds to the 1st bin, 1st index to the 2nd, etc.
-    num_bins = len(NIC_bin_edges_to_process) - 1 
-    #lets add new columns to hold the percentages
-    stats_headers_list = NIC_labels.copy() 
-    for i in range(num_bins): #make a new bin holder for each bin in num bins
-         stats_headers_list.append(key + " % Jam: " + NIC_labels[i])
-    stats_range_df = pd.DataFrame(columns=stats_headers_list) #data frame to hold the counts
-
-   
-    #go through dates and get statistic depending on entry, append to the range count df
-    if key == "flights":
-        for date_util in dates:
-            #get the full gdf for the date - pass parameters and gdf will take care of regions if selected
-            full_day_gdf = get_full_day_gdf(date_util, specified_country = specified_country, custom_polygon = custom_polygon) 
-            #print("Got full day gdf for ", get_date_util_string(date_util))
-            flight_counts_and_percents_date_df = get_flight_counts_and_percents_day(full_day_gdf, date_util)
-            if stats_range_df.empty: #if the stats are empty, i.e. this is the first frame to add
-                flight_counts_and_percents_date_df.columns = stats_headers_list #set column names to match our stats and set stats equal to it
-                stats_range_df = flight_counts_and_percents_date_df
-            else:
-                stats_range_df = pd.concat([stats_range_df, flight_counts_and_percents_date_df])     
-    elif key == "counts":
-        for date_util in dates:
-            #get the full gdf for the date - pass parameters and gdf will take care of regions if selected
-            full_day_gdf = get_full_day_gdf(date_util, specified_country = specified_country, custom_polygon = custom_polygon) 
-            #print("Got full day gdf for ", get_date_util_string(date_util))
-            jamming_counts_and_percents_date_df = get_jamming_counts_and_percents_day(full_day_gdf, date_util)
-            if stats_range_df.empty: #if the stats are empty, i.e. this is the first frame to add
-                jamming_counts_and_percents_date_df.columns = stats_headers_list #set column names to match our stats and set stats equal to it
-                stats_range_df = jamming_counts_and_percents_date_df
-            else:
-                stats_range_df = pd.concat([stats_range_df, jamming_counts_and_percents_date_df])        
-    else:
+    if key not in ["flights", "counts"]:
+        print("INVALID KEY")#if key not either of preset options, alert user and stop
+        return
+    stats_dfs = []
+    for date_util in dates:
+        bin_statistics_df = get_day_bin_statistics(date_util, specified_country = specified_country, custom_polygon = custom_polygon)
+        stats_dfs.append(make_stats_day_df(key, bin_statistics_df[key], date_util))
+    return pd.concat(stats_dfs)
+
+'''
+Returns a data frame of the statistics (like get_stats_date_range) of EVERY country over a DATE RANGE, in one pass over each day's data
+instead of one pass per country (see get_day_country_NIC_histograms). Only the countries with observations on a date have a row for it
+#INPUT: key, a string of either "flights" or "counts" to specify which stats to gather
+        dates, a list of dates to process
+#OUTPUT: Data frame with dates as the indeces, one row per date and country: the "Country" column, then the columns of get_stats_date_range
+'''
+def get_all_countries_stats_date_range(key, dates):
+    if key not in ["flights", "counts"]:
         print("INVALID KEY")#if key not either of preset options, alert user and stop
         return
-    return stats_range_df
+    country_names = country_lookup.get_country_names()
+    stats_dfs = []
+    for date_util in dates:
+        country_NIC_histograms = get_day_country_NIC_histograms(date_util)
+        if key == "counts":
+            bin_values = NIC_histograms.get_bin_counts_by_group(country_NIC_histograms, NIC_bin_edges_to_process)
+        else:
+            bin_values = NIC_histograms.get_bin_flights_by_group(country_NIC_histograms, NIC_bin_edges_to_process)
+        country_codes = np.flatnonzero(country_NIC_histograms["NIC_counts"].sum(axis=1) > 0) #the countries with observations
+        bin_values = bin_values[country_codes].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"): #no observations in any bin gives NaN percentages
+            percents = bin_values / bin_values.sum(axis=1, keepdims=True) * 100
+        stats_day_df = pd.DataFrame(np.hstack([bin_values, percents]), columns = get_stats_headers(key), index = [date_util.strftime('%Y-%m-%d')] * len(country_codes))
+        stats_day_df.insert(0, "Country", [country_names[country_code] for country_code in country_codes])
+        stats_dfs.append(stats_day_df)
+    return pd.concat(stats_dfs)
 
 
 #-----------------------------------------Plot Statistics------------------------------
@@ -575,7 +678,7 @@ Main function to run script based on inputs given from the GUI
         custom, string, name of shp file from custom polygons or None
         NIC_bin_edges, edges of the bins in a list
         NIC_colors_hex_list, list of hex code for each bin
-#OUTPUT: Display statistics graphs - also makes map of the first date that is inputted
+#OUTPUT: Display statistics graphs - also makes a raw map of the first date that is inputted and an averaged map of all the dates
 '''
 def main(start, end, series, world, region, custom, NIC_bin_edges, NIC_colors_hex_list):
     
@@ -659,17 +762,31 @@ def main(start, end, series, world, region, custom, NIC_bin_edges, NIC_colors_he
     check_bool, date_description, region_description, dates_to_process = run_checks()   #call the run checks function 
     if(check_bool): #if checks successful
         print("Processing data for " + date_description + " over ", region_description, " with the following bins ", NIC_labels)
-
-        #get first date, and its gdf and averaged gdf over the grid
-        first_date = dates_to_process[0]
-        gdf = get_full_day_gdf(first_date, specified_country = region, custom_polygon = custom)
-        averaged_gdf = get_NIC_data_boxed_averages(gdf.copy())
+        #check the download manifests, so missing or partly downloaded days are known before the processing starts
+        incomplete_dates = ADS_B_storage.get_incomplete_dates(dates_to_process)
+        if len(incomplete_dates) > 0:
+            print("Warning: these dates are not completely downloaded, their statistics only use the data that is there: ",
+                  ", ".join(get_date_util_string(date) for date in incomplete_dates))
+
+        #the dates saved before the custom polygon was added or changed are checked against it point by point, which is slower.
+        #The processing does not change the saved data, so only say how to save the polygon's bits in those days once
+        if custom != None:
+            unchecked_dates = [date for date in dates_to_process if os.path.exists(ADS_B_storage.get_day_file_path(ADS_B_storage.get_day_directory(date)))
+                               and ADS_B_storage.get_saved_custom_region_bit(ADS_B_storage.get_day_directory(date), custom) == None]
+            if len(unchecked_dates) > 0:
+                print("Note: " + str(len(unchecked_dates)) + " dates have not been checked against " + custom + " yet, run "
+                      "ADS_B_storage.backfill_custom_regions() to make the next runs over it faster")
+
+        #read each date once, for the statistics of every date, the averaged map of all the dates and the raw map of the first date
+        date_range_statistics = get_date_range_statistics(dates_to_process, specified_country = region, custom_polygon = custom)
+        gdf = date_range_statistics["first_day_gdf"]
+        averaged_gdf = get_grid_cube_boxed_averages(date_range_statistics["grid_cube"])
         #show maps
         plot_gdf_folium_map(gdf, key = "raw") #can change these keys to what you would like
         plot_gdf_folium_map(averaged_gdf, key = "averaged")
         
-        #CALL PROCESSING FUNCTIONS AND DISPLAY RESULTS
-        flight_stats = get_stats_date_range("flights", dates_to_process, specified_country=region, custom_polygon = custom)
-        counts_stats = get_stats_date_range("counts", dates_to_process, specified_country=region, custom_polygon = custom)
+        #DISPLAY RESULTS
+        flight_stats = date_range_statistics["flights"]
+        counts_stats = date_range_statistics["counts"]
         bar_plot_stats(counts_stats, flight_stats, region_description)
 
@@ -0,0 +1,157 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script keeps the results of the processing on disk (the grid cubes, NIC histograms and statistics of each day over a region),
+#so the same or overlapping analyses only compute what is not there yet.
+#Each result is saved under a key made from everything it depends on (see make_cache_key): the date and a stamp of the day's data,
+#the region and the checksum of the custom polygon files, the NIC bin edges, the cell size... When the data or a polygon changes,
+#its key changes too, so an old result is never used again (it is deleted once it is the least recently used).
+#The cache is kept under max_result_cache_bytes: when it gets bigger, the results used longest ago are deleted first.
+#Deleting the cache folder is always safe, the results are made again when needed.
+
+import os
+import json
+import hashlib
+
+#Get the directory of this script and the one above it (the main folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+#--------------------------GLOBAL VARIABLES---------------------------------------
+#folder the results are saved in
+result_cache_directory = os.path.join(parent_dir, "cache")
+#most bytes the cache takes on disk, the results used longest ago are deleted past this
+max_result_cache_bytes = 2 * 1024**3
+#part of every key. Change it when the format of the results changes, so results saved by older code are not used
+cache_format_version = 2 #2: grid cubes leave out the observations without a lat/long or a valid NIC
+#bytes in the cache, counted when the first result is saved, then kept up to date. None until then
+cache_size_bytes = None
+#--------------------------END GLOBAL VARIABLES-----------------------------------
+
+
+'''
+Make the key of a result from everything it depends on
+#INPUTS: kind, string, what the result is (i.e. "grid cube")
+        key_fields, anything json can save the result depends on (i.e. date = "2024-01-01", NIC_bin_edges = [-1, 0, 3, 6, 11])
+#OUTPUT: the key, a SHA-256 checksum as a string
+'''
+def make_cache_key(kind, **key_fields):
+    key_fields.update({"kind": kind, "cache format version": cache_format_version})
+    return hashlib.sha256(json.dumps(key_fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+'''
+Get the path of a result in the cache. The results are spread over folders named after the first two characters of their keys
+#INPUTS: cache_key, string, see make_cache_key
+        file_extension (optional), string
+#OUTPUT: file path as a string
+'''
+def get_cache_entry_path(cache_key, file_extension = ".parquet"):
+    return os.path.join(result_cache_directory, cache_key[:2], cache_key + file_extension)
+
+'''
+Read a result from the cache, and mark it as just used
+#INPUTS: cache_key, string, see make_cache_key
+        read_function, function that reads the file of the result (i.e. grid_statistics.read_grid_cube)
+        file_extension (optional), string
+#OUTPUT: the result, or None if it is not in the cache (or can't be read)
+'''
+def read_cache_entry(cache_key, read_function, file_extension = ".parquet"):
+    cache_entry_path = get_cache_entry_path(cache_key, file_extension)
+    if not os.path.exists(cache_entry_path):
+        return None
+    try:
+        cache_entry = read_function(cache_entry_path)
+        os.utime(cache_entry_path) #the modification time is the last time the result was used
+    except Exception as e: #a broken file is made again
+        print("Could not read the cached result", cache_entry_path, ":", e)
+        return None
+    return cache_entry
+
+'''
+Check if a result is in the cache, without reading it
+#INPUTS: cache_key, string, see make_cache_key
+        file_extension (optional), string
+#OUTPUT: boolean
+'''
+def has_cache_entry(cache_key, file_extension = ".parquet"):
+    return os.path.exists(get_cache_entry_path(cache_key, file_extension))
+
+'''
+Get a result from the cache, or make it and save it to the cache if it is not there
+#INPUTS: cache_key, string, see make_cache_key
+        make_function, function with no inputs that makes the result
+        read_function, write_function, functions that read and save the result's file (see read_cache_entry and write_cache_entry)
+        file_extension (optional), string
+#OUTPUT: the result
+'''
+def get_cache_entry(cache_key, make_function, read_function, write_function, file_extension = ".parquet"):
+    cache_entry = read_cache_entry(cache_key, read_function, file_extension)
+    if cache_entry is None:
+        cache_entry = make_function()
+        write_cache_entry(cache_key, cache_entry, write_function, file_extension)
+    return cache_entry
+
+'''
+Save a result to the cache, then delete the results used longest ago if the cache is over max_result_cache_bytes
+#INPUTS: cache_key, string, see make_cache_key
+        cache_entry, the result
+        write_function, function that saves the result, called with the result and a file path (i.e. grid_statistics.write_grid_cube).
+            It only writes the file: the swap into the cache is done here
+        file_extension (optional), string
+#OUTPUT: saves the file (written next to it first, then swapped in)
+'''
+def write_cache_entry(cache_key, cache_entry, write_function, file_extension = ".parquet"):
+    global cache_size_bytes
+    if cache_size_bytes == None:
+        cache_size_bytes = sum(os.path.getsize(file_path) for file_path, _ in get_cache_entries())
+    cache_entry_path = get_cache_entry_path(cache_key, file_extension)
+    os.makedirs(os.path.dirname(cache_entry_path), exist_ok=True)
+    write_function(cache_entry, cache_entry_path + ".partial")
+    os.replace(cache_entry_path + ".partial", cache_entry_path)
+    cache_size_bytes += os.path.getsize(cache_entry_path)
+    if cache_size_bytes > max_result_cache_bytes:
+        evict_cache_entries(max_result_cache_bytes)
+
+'''
+List the results in the cache
+#INPUT: none
+#OUTPUT: list of (file path, time last used) of each result
+'''
+def get_cache_entries():
+    cache_entries = []
+    if not os.path.isdir(result_cache_directory):
+        return cache_entries
+    for directory_entry in os.scandir(result_cache_directory):
+        if directory_entry.is_dir():
+            for file_entry in os.scandir(directory_entry.path):
+                if file_entry.is_file() and not file_entry.name.endswith(".partial"):
+                    cache_entries.append((file_entry.path, file_entry.stat().st_mtime_ns))
+    return cache_entries
+
+'''
+Delete the results used longest ago until the cache is no bigger than a size
+#INPUT: max_bytes, int, size to bring the cache down to
+#OUTPUT: number of results deleted
+'''
+def evict_cache_entries(max_bytes):
+    global cache_size_bytes
+    cache_entries = sorted(get_cache_entries(), key=lambda cache_entry: cache_entry[1]) #used longest ago first
+    entry_sizes = [os.path.getsize(file_path) for file_path, _ in cache_entries]
+    cache_size_bytes = sum(entry_sizes)
+    num_deleted = 0
+    for (file_path, _), entry_size in zip(cache_entries, entry_sizes):
+        if cache_size_bytes <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+        except OSError: #already gone
+            pass
+        cache_size_bytes -= entry_size
+        num_deleted += 1
+    return num_deleted
+
+'''
+Delete every result in the cache
+#INPUT: none
+#OUTPUT: number of results deleted
+'''
+def clear_result_cache():
+    return evict_cache_entries(0)
@@ -0,0 +1,173 @@
+#For the Aerospace Security Project at CSIS in Washington, D.C.
+#This script makes synthetic ADS-B data in the same format as the ADS-B Exchange readsb-hist files.
+#It is used to test and benchmark the tool without downloading real data, one time slice at a time (as downloaded) or as
+#whole days saved in ADS_B_Data (as stored)
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+import ADS_B_storage
+import country_lookup
+
+
+'''
+Make one synthetic time slice in the ADS-B Exchange readsb-hist format: a dictionary with a "now" time stamp and a list of
+"aircraft", each a dictionary with the same keys as the real files. Like the real data, some aircraft only have a
+"lastPosition" sub-dictionary and some have no position or flight number at all
+#INPUTS: num_aircraft, int, number of aircraft in the slice
+        seed (optional), int, seed of the random generator so the same slice can be made again
+        now (optional), float, unix time stamp of the slice
+        fraction_last_position (optional), float, fraction of aircraft whose position is only under "lastPosition"
+        fraction_no_position (optional), float, fraction of aircraft with no position (these are skipped by the tool)
+#OUTPUT: dictionary of the time slice, ready for json.dumps
+'''
+def make_synthetic_time_slice(num_aircraft, seed = 0, now = 1704067200.0, fraction_last_position = 0.1, fraction_no_position = 0.05):
+    random_generator = np.random.default_rng(seed)
+    latitudes = np.round(random_generator.uniform(-70, 75, num_aircraft), 6)
+    longitudes = np.round(random_generator.uniform(-180, 180, num_aircraft), 6)
+    NIC_values = random_generator.choice([0, 5, 6, 7, 8, 9, 10, 11], size=num_aircraft, p=[0.03, 0.02, 0.05, 0.2, 0.5, 0.05, 0.05, 0.1])
+    RC_values = np.array([37040, 1852, 1111, 926, 370, 185, 75, 25, 8])[np.clip(NIC_values - 3, 0, 8)] #containment radius for the NIC
+    position_type = random_generator.uniform(0, 1, num_aircraft)
+
+    aircraft_list = []
+    for i in range(num_aircraft):
+        aircraft = {"hex": "{:06x}".format(random_generator.integers(0, 16**6)), "type": "adsb_icao",
+                    "flight": "SYN{:04d}  ".format(i % 9000), "alt_baro": int(random_generator.integers(0, 41000)),
+                    "gs": round(float(random_generator.uniform(100, 500)), 1), "squawk": "{:04d}".format(random_generator.integers(0, 7777)),
+                    "version": 2, "nac_p": 9, "sil": 3, "messages": int(random_generator.integers(10, 10000)), "seen": 0.1, "rssi": -20.5}
+        position = {"lat": float(latitudes[i]), "lon": float(longitudes[i]), "nic": int(NIC_values[i]), "rc": int(RC_values[i])}
+        if position_type[i] < fraction_no_position: #no position at all
+            pass
+        elif position_type[i] < fraction_no_position + fraction_last_position: #position only kept in lastPosition, as in the real data
+            aircraft["lastPosition"] = dict(position, seen_pos=12.3)
+            if i % 2 == 0: #only some of these also carry the flight number
+                aircraft["lastPosition"]["flight"] = aircraft["flight"]
+        else:
+            aircraft.update(position)
+            aircraft["seen_pos"] = 0.2
+        aircraft_list.append(aircraft)
+
+    return {"now": now, "messages": int(num_aircraft * 1000), "aircraft": aircraft_list}
+
+'''
+Make a synthetic time slice as the bytes of its json file, like the body of an ADS-B Exchange download
+#INPUTS: same as make_synthetic_time_slice
+#OUTPUT: bytes of the json text
+'''
+def make_synthetic_time_slice_json(num_aircraft, **kwargs):
+    return json.dumps(make_synthetic_time_slice(num_aircraft, **kwargs)).encode("utf-8")
+
+
+#---------------SYNTHETIC DAYS---------------
+#Whole synthetic days, saved in ADS_B_Data like downloaded days, to test and benchmark the processing (see benchmark_processing.py).
+#Each flight flies a straight track between two of the hub airports below, at airliner speed. The NIC of each point is drawn
+#from a normal distribution, or from a jammed one (low NIC) when the point is inside one of the jamming regions
+
+#airports the flights fly between (lat, long), weighted towards the busy and jammed areas like the real traffic
+hub_airports = [(51.47, -0.45), (49.01, 2.55), (50.04, 8.56), (52.31, 4.76), (40.47, -3.56), (41.80, 12.25), (48.35, 11.79),
+                (55.62, 12.65), (59.65, 17.92), (60.32, 24.96), (56.92, 23.97), (54.63, 25.29), (52.17, 20.97), (54.38, 18.47),
+                (41.26, 28.74), (37.94, 23.94), (34.88, 33.63), (32.01, 34.89), (33.82, 35.49), (25.25, 55.36), (25.27, 51.61),
+                (24.43, 54.65), (30.12, 31.41), (40.64, -73.78), (33.94, -118.41), (41.98, -87.90), (35.55, 139.78), (1.36, 103.99),
+                (22.31, 113.91), (28.56, 77.10), (-33.94, 151.18), (-23.43, -46.47)]
+#areas with jamming: center (lat, long), radius in degrees, and the fraction of the points inside that are jammed
+default_jamming_regions = [{"name": "Baltic", "lat": 55.5, "lon": 21.0, "radius_deg": 4.0, "strength": 0.7},
+                           {"name": "East Med", "lat": 34.0, "lon": 34.5, "radius_deg": 3.0, "strength": 0.6},
+                           {"name": "Black Sea", "lat": 44.5, "lon": 34.0, "radius_deg": 3.0, "strength": 0.5}]
+#NIC values and their probabilities, for normal and jammed points
+normal_NIC_distribution = ([0, 5, 6, 7, 8, 9, 10, 11], [0.01, 0.01, 0.02, 0.16, 0.55, 0.05, 0.05, 0.15])
+jammed_NIC_distribution = ([0, 1, 2, 3, 4, 5, 6, 7], [0.35, 0.05, 0.05, 0.05, 0.1, 0.15, 0.15, 0.1])
+#containment radius (m) of each NIC (0 to 11), as in Table 1 of the README
+NIC_containment_radii_m = np.array([0, 37040, 14816, 7408, 3704, 1852, 1111, 370, 185, 75, 25, 8])
+#cruise speed of the flights, in degrees of latitude per hour (about 800 km/h)
+flight_speed_deg_per_h = 7.2
+
+'''
+Make the flight plans of a synthetic day: where each flight flies from and to, and when
+#INPUTS: num_flights, int, number of flights in the day
+        random_generator, a numpy random generator
+#OUTPUT: dictionary of arrays, one value per flight: "start lat", "start lon", "end lat", "end lon", "departure s" (seconds into
+        the day, the first flights are already flying at midnight), "duration s", and "flight number"
+'''
+def make_flight_plans(num_flights, random_generator):
+    hubs = np.array(hub_airports)
+    start_hubs = random_generator.integers(0, len(hubs), num_flights)
+    end_hubs = (start_hubs + random_generator.integers(1, len(hubs), num_flights)) % len(hubs) #never the same hub twice
+    start_points = hubs[start_hubs] + random_generator.normal(0, 0.05, (num_flights, 2))
+    end_points = hubs[end_hubs] + random_generator.normal(0, 0.05, (num_flights, 2))
+    distances_deg = np.hypot(end_points[:, 0] - start_points[:, 0], end_points[:, 1] - start_points[:, 1])
+    durations_s = np.maximum(distances_deg / flight_speed_deg_per_h * 3600, 1800)
+    departures_s = random_generator.uniform(-durations_s, 24 * 3600)
+    return {"start lat": start_points[:, 0], "start lon": start_points[:, 1], "end lat": end_points[:, 0], "end lon": end_points[:, 1],
+            "departure s": departures_s, "duration s": durations_s,
+            "flight number": np.array(["SYN{:05d}".format(i) for i in range(num_flights)], dtype=object)}
+
+'''
+Make one time slice of a synthetic day, from the flights in the air at its time
+#INPUTS: flight_plans, see make_flight_plans
+        time_s, float, seconds into the day of the time slice
+        jamming_regions, list of jamming regions (see default_jamming_regions)
+        random_generator, a numpy random generator
+#OUTPUT: DataFrame of the time slice with the columns the downloader keeps (see get_ADS_B_data.ADSB_data_headers)
+'''
+def make_synthetic_time_slice_df(flight_plans, time_s, jamming_regions, random_generator):
+    progress = (time_s - flight_plans["departure s"]) / flight_plans["duration s"]
+    in_the_air = (progress >= 0) & (progress <= 1)
+    progress = progress[in_the_air]
+    latitudes = flight_plans["start lat"][in_the_air] + progress * (flight_plans["end lat"][in_the_air] - flight_plans["start lat"][in_the_air])
+    longitudes = flight_plans["start lon"][in_the_air] + progress * (flight_plans["end lon"][in_the_air] - flight_plans["start lon"][in_the_air])
+
+    NIC_values = random_generator.choice(normal_NIC_distribution[0], size=len(latitudes), p=normal_NIC_distribution[1])
+    for jamming_region in jamming_regions:
+        jammed = (np.hypot(latitudes - jamming_region["lat"], longitudes - jamming_region["lon"]) <= jamming_region["radius_deg"]) \
+                 & (random_generator.uniform(0, 1, len(latitudes)) < jamming_region["strength"])
+        NIC_values[jammed] = random_generator.choice(jammed_NIC_distribution[0], size=jammed.sum(), p=jammed_NIC_distribution[1])
+
+    return pd.DataFrame({"Latitude (deg)": latitudes, "Longitude (deg)": longitudes, "NIC": NIC_values,
+                         "R_C (m)": NIC_containment_radii_m[NIC_values], "Flight Number": flight_plans["flight number"][in_the_air]})
+
+'''
+Make the time slices of a synthetic day, in the stored format
+#INPUTS: date_util, date util object of the day (it seeds the random generator with seed, so a day is always made the same)
+        num_flights (optional), int, number of flights in the day. About a sixth of them are in the air at any time
+        delta_t_min (optional), int or float, sampling rate in minutes
+        jamming_regions (optional), list of jamming regions (see default_jamming_regions)
+        use_country_raster (optional), boolean, True to find the countries with the country raster (see country_lookup.py)
+        seed (optional), int
+#OUTPUT: dictionary of time slice name (i.e. "001500Z") to the pyarrow Table of the slice (see ADS_B_storage.make_time_slice_table)
+'''
+def make_synthetic_day_time_slices(date_util, num_flights = 3000, delta_t_min = 30, jamming_regions = default_jamming_regions,
+                                   use_country_raster = False, seed = 0):
+    random_generator = np.random.default_rng([seed, date_util.year, date_util.month, date_util.day])
+    flight_plans = make_flight_plans(num_flights, random_generator)
+    day_directory = ADS_B_storage.get_day_directory(date_util)
+    time_slice_tables = {}
+    for i in range(int(24 * 60 // delta_t_min)):
+        time_s = i * delta_t_min * 60
+        time_slice_name = "{:02d}{:02d}{:02d}Z".format(int(time_s // 3600), int(time_s // 60 % 60), int(time_s % 60))
+        time_slice_df = make_synthetic_time_slice_df(flight_plans, time_s, jamming_regions, random_generator)
+        time_slice_df["Country Name"] = country_lookup.get_country_names_for_points(time_slice_df["Latitude (deg)"], time_slice_df["Longitude (deg)"],
+                                                                                    use_raster = use_country_raster)
+        time_slice_time = ADS_B_storage.get_time_slice_time(os.path.join(day_directory, time_slice_name))
+        time_slice_tables[time_slice_name] = ADS_B_storage.make_time_slice_table(time_slice_df, time_slice_time)
+    return time_slice_tables
+
+'''
+Make synthetic days and save them in ADS_B_Data (or wherever ADS_B_storage.ADS_B_data_directory points), like downloaded days.
+The days are marked as completely downloaded at the sampling rate, and as synthetic in their manifests.
+!! A synthetic day replaces the time slices of a real day at the same date, so pick dates that were not downloaded !!
+#INPUTS: dates_list, list of date util objects of the days to make
+        settings, see make_synthetic_day_time_slices (num_flights, delta_t_min, jamming_regions, use_country_raster, seed)
+#OUTPUT: saves the days. Returns the total number of rows saved
+'''
+def write_synthetic_days(dates_list, delta_t_min = 30, **settings):
+    num_rows = 0
+    for date_util in dates_list:
+        time_slice_tables = make_synthetic_day_time_slices(date_util, delta_t_min = delta_t_min, **settings)
+        day_directory = ADS_B_storage.get_day_directory(date_util)
+        ADS_B_storage.write_day_time_slices(day_directory, time_slice_tables,
+                                            {name: {"sampling_rate_min": delta_t_min, "synthetic": True} for name in time_slice_tables})
+        ADS_B_storage.mark_day_complete(day_directory, delta_t_min)
+        num_rows += sum(table.num_rows for table in time_slice_tables.values())
+    return num_rows